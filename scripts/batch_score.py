@@ -0,0 +1,10 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.cli import score as main
+
+if __name__ == '__main__':
+    main()
+
+# python scripts/batch_score.py --input-file=data/processed/X_test.csv --output-file=results/tables/knn_test_scores.csv --trained_knn_model=results/models/imb_knn_pipeline.pickle --chunksize=100
@@ -0,0 +1,25 @@
+import os
+import sys
+import click
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.model_artifact import load_model
+from src.fast_predictor import FastKNNPredictor
+
+@click.command()
+@click.option('--trained_knn_model', default='results/models/imb_knn_pipeline.pickle', type=str, help="Path to the trained knn model pipeline")
+@click.option('--predictor-to', default='results/models/fast_knn_predictor.pickle', type=str, help="Path the compiled predictor will be written to")
+
+def main(trained_knn_model, predictor_to):
+    '''Compiles the trained kNN pipeline into a NumPy-only predictor for scoring one patient at a time.'''
+    fast = FastKNNPredictor.from_pipeline(load_model(trained_knn_model))
+    directory = os.path.dirname(predictor_to)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fast.save(predictor_to)
+    print(f'Fast predictor with {len(fast.fit_X)} distinct training rows saved to {predictor_to}')
+
+if __name__ == '__main__':
+    main()
+
+# python scripts/export_fast_predictor.py --trained_knn_model=results/models/imb_knn_pipeline.pickle --predictor-to=results/models/fast_knn_predictor.pickle
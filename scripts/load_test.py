@@ -0,0 +1,62 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import click
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.scoring_service import FEATURES, request_json
+from src.data_cache import load_frame
+from src.schema import FRAMINGHAM_SCHEMA
+
+async def run_load_test(host, port, records, n_requests, concurrency):
+    '''Sends `n_requests` single-patient requests over `concurrency` keep-alive connections.'''
+    latencies = []
+    counter = iter(range(n_requests))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in counter:
+                started = time.perf_counter()
+                status, _ = await request_json(reader, writer, 'POST', '/predict', records[i % len(records)])
+                if status != 200:
+                    raise RuntimeError(f'Request failed with status {status}')
+                latencies.append(time.perf_counter() - started)
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, metrics = await request_json(reader, writer, 'GET', '/metrics')
+    writer.close()
+    return elapsed, np.array(latencies) * 1000, metrics
+
+@click.command()
+@click.option('--x_test', default='data/processed/X_test.csv', type=str, help="Path to the patient records sent to the service")
+@click.option('--host', default='127.0.0.1', type=str, help="Host of the running scoring service")
+@click.option('--port', default=8000, type=int, help="Port of the running scoring service")
+@click.option('--requests', 'n_requests', default=2000, type=int, help="Total number of requests")
+@click.option('--concurrency', default=32, type=int, help="Number of concurrent connections")
+
+def main(x_test, host, port, n_requests, concurrency):
+    '''Measures throughput and latency of a scoring service running on localhost.'''
+    frame = load_frame(x_test, schema=FRAMINGHAM_SCHEMA)[FEATURES]
+    records = [{k: (None if pd.isna(v) else v) for k, v in record.items()} for record in frame.to_dict('records')]
+    elapsed, latencies, metrics = asyncio.run(run_load_test(host, port, records, n_requests, concurrency))
+
+    print(f'{n_requests} requests in {elapsed:.2f} s ({n_requests / elapsed:.0f} requests/s)')
+    print(f'latency ms: p50={np.percentile(latencies, 50):.2f} p95={np.percentile(latencies, 95):.2f} '
+          f'p99={np.percentile(latencies, 99):.2f}')
+    print('service metrics:', json.dumps(metrics, indent=2))
+
+if __name__ == '__main__':
+    main()
+
+# python scripts/load_test.py --x_test=data/processed/X_test.csv --port=8000 --requests=2000 --concurrency=32
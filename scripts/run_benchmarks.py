@@ -0,0 +1,57 @@
+import os
+import sys
+import click
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.benchmark import (BENCHMARKS, DEFAULT_SIZES, compare_results, load_results, run_benchmarks,
+                           run_startup_benchmarks, save_results)
+from src.synthetic_data import write_cohort_csv
+
+@click.command()
+@click.option('--output', default='results/benchmarks/benchmarks.json', type=str, help="Path of the JSON file the results will be written to")
+@click.option('--size', 'sizes', multiple=True, type=int, default=DEFAULT_SIZES, help="Number of rows of a synthetic cohort; repeat for several sizes")
+@click.option('--benchmark', 'names', multiple=True, type=click.Choice(list(BENCHMARKS)), help="Benchmark to run; repeat for several (default: all)")
+@click.option('--repeats', default=3, type=int, help="Number of timed runs per benchmark and size")
+@click.option('--memory/--no-memory', default=True, help="Also measure the peak memory of each benchmark")
+@click.option('--seed', default=0, type=int, help="Random seed of the synthetic cohorts")
+@click.option('--baseline', default=None, type=click.Path(exists=True), help="Results of an earlier run to compare with")
+@click.option('--tolerance', default=0.25, type=float, help="Relative slowdown or memory growth over the baseline counted as a regression")
+@click.option('--fail-on-regression', is_flag=True, help="Exit with status 1 if any benchmark regressed against the baseline or exceeded its start-up budget")
+@click.option('--cohort-to', default=None, type=str, help="Only write a synthetic cohort of the first --size rows to this CSV")
+@click.option('--startup', is_flag=True, help="Time the cold start of the cardiopredict commands against their budgets instead")
+
+def main(output, sizes, names, repeats, memory, seed, baseline, tolerance, fail_on_regression, cohort_to, startup):
+    '''Times and memory-profiles the pipeline steps on synthetic Framingham cohorts of growing size
+    and optionally compares the results with a saved baseline.'''
+    if cohort_to:
+        write_cohort_csv(cohort_to, sizes[0], random_state=seed)
+        print(f"{sizes[0]} synthetic records saved to {cohort_to}")
+        return
+
+    if startup:
+        results = run_startup_benchmarks(repeats=repeats, random_state=seed, verbose=True)
+    else:
+        results = run_benchmarks(sizes, names or None, repeats=repeats, memory=memory, random_state=seed, verbose=True)
+    save_results(results, output)
+    print(f"Benchmark results saved to {output}")
+
+    if baseline:
+        comparison = compare_results(results, load_results(baseline), tolerance=tolerance)
+        print(comparison.to_string(index=False))
+        regressions = comparison[comparison['regression']]
+        if len(regressions):
+            print(f"{len(regressions)} benchmark(s) regressed by more than {tolerance:.0%}")
+            if fail_on_regression:
+                sys.exit(1)
+
+    over_budget = [entry['benchmark'] for entry in results['results'] if not entry.get('within_budget', True)]
+    if over_budget:
+        print(f"Over their start-up budget: {', '.join(over_budget)}")
+        if fail_on_regression:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
+
+# python scripts/run_benchmarks.py --output results/benchmarks/benchmarks.json --size 1000 --size 10000 --size 100000 --baseline results/benchmarks/baseline.json
+# python scripts/run_benchmarks.py --startup --output results/benchmarks/startup.json --fail-on-regression
@@ -0,0 +1,42 @@
+import os
+import sys
+import click
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.pipeline_runner import pipeline_stages, run_pipeline
+from src.run_full_pipeline import run_full_pipeline
+from src.instrumentation import instrumented
+
+STAGE_NAMES = [stage.name for stage in pipeline_stages()]
+
+@click.command()
+@click.option('--stage', 'targets', multiple=True, type=click.Choice(STAGE_NAMES), help="Stage to bring up to date with the stages it depends on; repeat for several (default: all)")
+@click.option('--jobs', default=3, type=int, help="Number of stages run at the same time")
+@click.option('--force', is_flag=True, help="Run the selected stages even if their inputs, arguments and code are unchanged")
+@click.option('--dry-run', is_flag=True, help="Only list the stages that would run")
+@click.option('--state', default='.pipeline_state.json', type=str, help="JSON file of the content hashes of the last runs")
+@click.option('--in-process', is_flag=True, help="Run every stage in this process, passing the data between stages in memory")
+@click.option('--plots/--no-plots', default=True, help="Draw the figures when running in process")
+@instrumented('run_pipeline')
+
+def main(targets, jobs, force, dry_run, state, in_process, plots):
+    '''Runs the pipeline stages of the Makefile whose inputs, arguments or code changed,
+    independent stages concurrently, or every stage in this process.'''
+    if in_process:
+        if targets or dry_run:
+            raise click.UsageError("--in-process runs every stage; it cannot be combined with --stage or --dry-run.")
+        results = run_full_pipeline(plots=plots)
+        print(results.evaluation.report.to_string())
+        return
+
+    report = run_pipeline(targets=targets or None, max_workers=jobs, force=force, dry_run=dry_run, state_path=state,
+                          verbose=True)
+    print(report.to_string(index=False))
+    if (report['status'] == 'failed').any():
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
+
+# python scripts/run_pipeline.py --jobs 3
+# python scripts/run_pipeline.py --in-process
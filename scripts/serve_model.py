@@ -0,0 +1,30 @@
+import asyncio
+import os
+import sys
+import click
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.model_artifact import load_model
+from src.scoring_service import ScoringService
+
+@click.command()
+@click.option('--trained_knn_model', default='results/models/imb_knn_pipeline.pickle', type=str, help="Path to the trained knn model pipeline")
+@click.option('--host', default='127.0.0.1', type=str, help="Interface to listen on")
+@click.option('--port', default=8000, type=int, help="Port to listen on")
+@click.option('--max-batch-size', default=64, type=int, help="Largest number of records scored in one batch")
+@click.option('--max-wait-ms', default=5.0, type=float, help="Longest time in milliseconds a request waits for its batch to fill")
+
+def main(trained_knn_model, host, port, max_batch_size, max_wait_ms):
+    '''Serves the trained kNN pipeline over HTTP, micro-batching concurrent requests.'''
+    service = ScoringService(load_model(trained_knn_model), host=host, port=port,
+                             max_batch_size=max_batch_size, max_wait=max_wait_ms / 1000)
+    print(f'Scoring service listening on http://{host}:{port} (POST /predict, GET /metrics)')
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print('Scoring service stopped.')
+
+if __name__ == '__main__':
+    main()
+
+# python scripts/serve_model.py --trained_knn_model=results/models/imb_knn_pipeline.pickle --port=8000 --max-batch-size=64 --max-wait-ms=5
@@ -0,0 +1,56 @@
+import click
+import os
+import sys
+import pickle
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.run_split import stream_split
+from src.preprocessor import build_preprocessor, fit_in_chunks, transform_csv
+
+@click.command()
+@click.option('--input-file', required=True, type=click.Path(exists=True), help="The path to the raw data CSV file.")
+@click.option('--split-dir', required=True, type=click.Path(), help="The directory where the splitted data should be saved.")
+@click.option('--preprocess-dir', required=True, type=click.Path(), help="The directory where the transformed data should be saved.")
+@click.option('--preprocessor-to', required=True, type=str, help="Path to directory where the fitted preprocessor will be written to")
+@click.option('--seed', type=int, help="Random seed", default=123)
+@click.option('--chunksize', type=int, default=100000, help="Number of rows read at a time")
+@click.option('--stratify/--no-stratify', default=True, help="Keep the share of disease cases equal in train and test")
+
+def main(input_file, split_dir, preprocess_dir, preprocessor_to, seed, chunksize, stratify):
+    '''Out-of-core counterpart of split_preprocess_data.py for files larger than memory:
+    splits the raw data, fits the preprocessor and writes the transformed data, all chunk by chunk.'''
+    for directory in (split_dir, preprocess_dir, preprocessor_to):
+        os.makedirs(directory, exist_ok=True)
+
+    # Split the raw data into train and test sets
+    paths = {part: os.path.join(split_dir, f'{part}_data.csv') for part in ('train', 'test')}
+    n_train, n_test = stream_split(input_file, paths['train'], paths['test'], test_size=0.2, random_state=seed,
+                                   stratify='disease' if stratify else None, chunksize=chunksize)
+    print(f"{n_train} training and {n_test} test rows saved to {split_dir}")
+
+    # Separate the target from the features
+    for part, path in paths.items():
+        for number, chunk in enumerate(pd.read_csv(path, chunksize=chunksize)):
+            mode, header = ('w', True) if number == 0 else ('a', False)
+            chunk.drop(columns='disease').to_csv(os.path.join(split_dir, f'X_{part}.csv'), mode=mode, header=header, index=False)
+            chunk['disease'].to_csv(os.path.join(split_dir, f'y_{part}.csv'), mode=mode, header=header, index=False)
+
+    # Fit the preprocessor on the training features, one chunk at a time
+    X_train_file = os.path.join(split_dir, 'X_train.csv')
+    first_chunk = next(pd.read_csv(X_train_file, chunksize=chunksize))
+    numeric_features = first_chunk.select_dtypes(include='number').columns.tolist()
+    preprocessor = fit_in_chunks(build_preprocessor(numeric_features, ["sex"]),
+                                 lambda: pd.read_csv(X_train_file, chunksize=chunksize))
+    with open(os.path.join(preprocessor_to, "preprocessor.pickle"), 'wb') as f:
+        pickle.dump(preprocessor, f)
+
+    for part in ('train', 'test'):
+        transform_csv(preprocessor, os.path.join(split_dir, f'X_{part}.csv'),
+                      os.path.join(preprocess_dir, f"X_{part}_transformed.csv"), chunksize=chunksize)
+    print(f"Preprocessor saved to {preprocessor_to} and transformed data to {preprocess_dir}")
+
+if __name__ == '__main__':
+    main()
+
+# python scripts/split_preprocess_streaming.py --input-file data/raw/framingham.csv --split-dir data/processed/ --preprocess-dir data/processed/ --preprocessor-to results/models/ --chunksize 100000
@@ -0,0 +1,249 @@
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.utils import check_random_state
+from sklearn.utils.validation import check_array, check_is_fitted, check_X_y
+
+
+class RandomProjectionTree:
+    """
+    Binary space partition of the training rows by random hyperplanes, with leaves of at most `leaf_size` rows.
+
+    Each node splits its rows at the median of their projection on the
+    difference of two of its rows, as in Annoy, so the tree stays balanced and
+    a query descends `log2(n / leaf_size)` levels. The nodes are stored as flat
+    arrays, so a whole batch of queries descends one level per NumPy operation.
+    """
+
+    def __init__(self, X, leaf_size, rng):
+        n_rows, n_features = X.shape
+        normals, thresholds, children, leaf_of, leaves = [None], [0.0], [(-1, -1)], [-1], []
+        stack = [(0, np.arange(n_rows))]
+        while stack:
+            node, rows = stack.pop()
+            if len(rows) <= leaf_size:
+                normals[node] = np.zeros(n_features)
+                leaf_of[node] = len(leaves)
+                leaves.append(rows)
+                continue
+            first, second = X[rng.choice(rows, 2, replace=False)]
+            normal = first - second
+            # Identical rows, e.g. oversampled copies, give no direction of their own
+            if not normal.any():
+                normal = rng.standard_normal(n_features)
+            projection = X[rows] @ normal
+            order = np.argsort(projection, kind='stable')
+            half = len(rows) // 2
+            normals[node] = normal
+            thresholds[node] = (projection[order[half - 1]] + projection[order[half]]) / 2
+            children[node] = (len(normals), len(normals) + 1)
+            for child, child_rows in zip(children[node], (rows[order[:half]], rows[order[half:]])):
+                normals.append(None)
+                thresholds.append(0.0)
+                children.append((-1, -1))
+                leaf_of.append(-1)
+                stack.append((child, child_rows))
+
+        self.normals = np.array(normals)
+        self.thresholds = np.array(thresholds)
+        self.children = np.array(children, dtype=np.intp)
+        self.leaf_of = np.array(leaf_of, dtype=np.intp)
+        # Leaves padded with -1 to `leaf_size` columns, so the candidates of a batch form one array
+        self.leaves = np.full((len(leaves), leaf_size), -1, dtype=np.intp)
+        for i, rows in enumerate(leaves):
+            self.leaves[i, :len(rows)] = rows
+
+    def leaf_rows(self, X):
+        """Training rows in the leaf each query row falls into, of shape (n_queries, leaf_size)."""
+        node = np.zeros(len(X), dtype=np.intp)
+        inner = np.flatnonzero(self.leaf_of[node] < 0)
+        while len(inner):
+            current = node[inner]
+            side = np.einsum('ij,ij->i', X[inner], self.normals[current]) > self.thresholds[current]
+            node[inner] = self.children[current, side.astype(np.intp)]
+            inner = inner[self.leaf_of[node[inner]] < 0]
+        return self.leaves[self.leaf_of[node]]
+
+
+class ApproximateKNeighborsClassifier(ClassifierMixin, BaseEstimator):
+    """
+    k-nearest neighbours classifier that searches a random projection forest instead of all training rows.
+
+    Each query is compared with the rows sharing its leaf in any of the
+    `n_trees` trees only, at most `n_trees * leaf_size` rows, so the cost of a
+    prediction grows with the depth of the trees, i.e. logarithmically with the
+    training size, instead of linearly as in an exact search. More trees or
+    larger leaves find more of the true neighbours (higher recall) at the cost
+    of more distance computations; `compare_to_exact` measures how often the
+    predictions then differ from an exact `KNeighborsClassifier`.
+
+    The votes are uniform and ties go to the first class, as in
+    `KNeighborsClassifier`, so the class can replace it in a pipeline. Queries
+    whose leaves hold fewer than `n_neighbors` distinct rows are answered by an
+    exact search.
+
+    Parameters
+    ----------
+    n_neighbors : int, optional
+        Number of neighbours used for voting. Defaults to 5.
+    n_trees : int, optional
+        Number of random projection trees. Defaults to 10.
+    leaf_size : int, optional
+        Maximum number of training rows in a leaf. Defaults to 64.
+    batch_size : int, optional
+        Number of queries whose candidate distances are computed at once, which bounds the memory of a query.
+        Defaults to 1024.
+    random_state : int, RandomState or None, optional
+        Seed of the hyperplanes. Defaults to None.
+
+    Example
+    -------
+    >>> knn = ApproximateKNeighborsClassifier(n_neighbors=9, n_trees=10, random_state=123)
+    >>> pipe = make_imb_pipeline(RandomOverSampler(sampling_strategy='minority'), preprocessor, knn)
+    >>> pipe.fit(X_train, y_train).predict(X_test)
+    """
+
+    def __init__(self, n_neighbors=5, n_trees=10, leaf_size=64, batch_size=1024, random_state=None):
+        self.n_neighbors = n_neighbors
+        self.n_trees = n_trees
+        self.leaf_size = leaf_size
+        self.batch_size = batch_size
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        X, y = check_X_y(X, y, dtype=np.float64)
+        if self.n_neighbors > len(X):
+            raise ValueError(f"Expected n_neighbors <= n_samples_fit, but n_neighbors = {self.n_neighbors}, "
+                             f"n_samples_fit = {len(X)}")
+        self.classes_, self._y = np.unique(y, return_inverse=True)
+        self.n_features_in_ = X.shape[1]
+        self._fit_X = np.ascontiguousarray(X)
+        rng = check_random_state(self.random_state)
+        self.trees_ = [RandomProjectionTree(self._fit_X, self.leaf_size, rng) for _ in range(self.n_trees)]
+        return self
+
+    def _exact_kneighbors(self, X, n_neighbors):
+        distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ self._fit_X.T + (self._fit_X ** 2).sum(axis=1)
+        distances = np.maximum(distances, 0)
+        ind = np.argsort(distances, axis=1, kind='stable')[:, :n_neighbors]
+        return np.take_along_axis(distances, ind, axis=1), ind
+
+    def _kneighbors_batch(self, X, n_neighbors):
+        candidates = np.concatenate([tree.leaf_rows(X) for tree in self.trees_], axis=1)
+        if candidates.shape[1] < n_neighbors:
+            return self._exact_kneighbors(X, n_neighbors)
+        # A row found in several trees is a candidate once: after sorting, repeats are masked out
+        candidates.sort(axis=1)
+        repeated = np.zeros(candidates.shape, dtype=bool)
+        repeated[:, 1:] = candidates[:, 1:] == candidates[:, :-1]
+        valid = (candidates >= 0) & ~repeated
+        differences = self._fit_X[np.where(valid, candidates, 0)] - X[:, None, :]
+        distances = np.where(valid, np.einsum('ijk,ijk->ij', differences, differences), np.inf)
+
+        # Ordered by distance, then by row position, so tied neighbours come in a fixed order
+        order = np.lexsort((candidates, distances), axis=1)[:, :n_neighbors]
+        ind = np.take_along_axis(candidates, order, axis=1)
+        distances = np.take_along_axis(distances, order, axis=1)
+
+        short = np.flatnonzero(valid.sum(axis=1) < n_neighbors)
+        if len(short):
+            distances[short], ind[short] = self._exact_kneighbors(X[short], n_neighbors)
+        return distances, ind
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        """
+        Approximate nearest training rows of each query row, closest first.
+
+        Parameters
+        ----------
+        X : array-like of shape (n_queries, n_features)
+            Query rows.
+        n_neighbors : int, optional
+            Number of neighbours; defaults to the fitted `n_neighbors`.
+        return_distance : bool, optional
+            Also return the Euclidean distances. Defaults to True.
+
+        Returns
+        -------
+        np.ndarray or tuple of np.ndarray
+            The row positions of shape (n_queries, n_neighbors), preceded by their distances if requested.
+        """
+        check_is_fitted(self, "trees_")
+        X = check_array(X, dtype=np.float64)
+        n_neighbors = self.n_neighbors if n_neighbors is None else n_neighbors
+        distances = np.empty((len(X), n_neighbors))
+        ind = np.empty((len(X), n_neighbors), dtype=np.intp)
+        for start in range(0, len(X), self.batch_size):
+            stop = start + self.batch_size
+            distances[start:stop], ind[start:stop] = self._kneighbors_batch(X[start:stop], n_neighbors)
+        return (np.sqrt(distances), ind) if return_distance else ind
+
+    def predict_proba(self, X):
+        neigh_labels = self._y[self.kneighbors(X, return_distance=False)]
+        votes = np.stack([(neigh_labels == c).sum(axis=1) for c in range(len(self.classes_))], axis=1)
+        return votes / self.n_neighbors
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def exact_estimator(self):
+        """A `KNeighborsClassifier` fitted on the same training rows, as the exact reference of this model."""
+        check_is_fitted(self, "trees_")
+        return KNeighborsClassifier(n_neighbors=self.n_neighbors).fit(self._fit_X, self.classes_[self._y])
+
+
+def compare_to_exact(model, X, y=None):
+    """
+    How far the predictions of an approximate kNN model are from the exact search on the same training rows.
+
+    Parameters
+    ----------
+    model : ApproximateKNeighborsClassifier or Pipeline
+        Fitted model, or a fitted pipeline ending in one; the preceding steps transform `X`.
+    X : pd.DataFrame or array-like
+        Query data, e.g. the test set.
+    y : array-like, optional
+        True labels; adds the accuracy of both models.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row with the share of differing predictions (`disagreement`), the
+        share of the exact k nearest distances matched by the approximate
+        neighbours (`neighbour_recall`) and the query time per row of both models.
+
+    Example
+    -------
+    >>> compare_to_exact(load_model('results/models/imb_knn_pipeline.pickle'), X_test, y_test)
+    """
+    if hasattr(model, 'steps'):
+        X = model[:-1].transform(X)
+        model = model[-1]
+    X = check_array(X, dtype=np.float64)
+    exact = model.exact_estimator()
+
+    start = time.perf_counter()
+    distances, ind = model.kneighbors(X)
+    y_approx = model.predict(X)
+    approx_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    exact_distances, _ = exact.kneighbors(X)
+    y_exact = exact.predict(X)
+    exact_seconds = time.perf_counter() - start
+
+    # Compared by distance, so that tied neighbours found in another order still count as found
+    tolerance = 1e-9 * np.maximum(1.0, exact_distances[:, -1:])
+    found = (distances <= exact_distances[:, -1:] + tolerance).sum(axis=1)
+    report = {'n_queries': len(X), 'n_neighbors': model.n_neighbors, 'n_trees': model.n_trees,
+              'leaf_size': model.leaf_size, 'disagreement': np.mean(y_approx != y_exact),
+              'neighbour_recall': np.mean(np.minimum(found, model.n_neighbors) / model.n_neighbors),
+              'approx_ms_per_query': 1000 * approx_seconds / len(X),
+              'exact_ms_per_query': 1000 * exact_seconds / len(X)}
+    if y is not None:
+        y = np.asarray(y)
+        report['approx_accuracy'] = np.mean(y_approx == y)
+        report['exact_accuracy'] = np.mean(y_exact == y)
+    return pd.DataFrame([report])
@@ -0,0 +1,124 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from src.model_artifact import load_model
+
+# Model loaded once per worker process by `_init_worker`
+_worker_model = None
+
+
+def _init_worker(model_path):
+    global _worker_model
+    _worker_model = load_model(model_path)
+
+
+def _score_in_worker(chunk, id_column):
+    return score_chunk(_worker_model, chunk, id_column)
+
+
+def score_chunk(model, chunk, id_column=None):
+    """
+    Predict one chunk of patient records.
+
+    Parameters
+    ----------
+    model : fitted classifier or pipeline
+        Model with `predict_proba` and `classes_`.
+    chunk : pd.DataFrame
+        Patient records with the columns the model was trained on.
+    id_column : str, optional
+        Column copied unchanged to the output to identify the rows.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per record with the predicted class and one `probability_<class>`
+        column per class.
+    """
+    features = chunk.drop(columns=[id_column]) if id_column else chunk
+    proba = model.predict_proba(features)
+    classes = model.classes_
+    scored = pd.DataFrame(proba, columns=[f"probability_{c}" for c in classes], index=chunk.index)
+    # Same decision rule as predict(): the first class with the highest probability
+    scored.insert(0, "prediction", classes[np.argmax(proba, axis=1)])
+    if id_column:
+        scored.insert(0, id_column, chunk[id_column].values)
+    return scored
+
+
+def _write_chunk(scored, output_file, first):
+    scored.to_csv(output_file, mode='w' if first else 'a', header=first, index=False)
+
+
+def score_csv(model_path, input_file, output_file, chunksize=10000, n_jobs=None, id_column=None):
+    """
+    Score a CSV of patient records in fixed-size chunks, writing the predictions as they are produced.
+
+    Only a bounded number of chunks is held in memory at any time (one without
+    workers, two per worker otherwise), so peak memory depends on `chunksize`
+    and not on the size of the input. The output rows are written in input order.
+
+    Parameters
+    ----------
+    model_path : str
+        Path to the pickled model pipeline or to a model artifact directory.
+    input_file : str
+        CSV with the features the model was trained on.
+    output_file : str
+        CSV the predictions and class probabilities are written to.
+    chunksize : int, optional
+        Number of rows read and scored at a time. Defaults to 10000.
+    n_jobs : int, optional
+        Number of worker processes, each loading its own copy of the model.
+        Defaults to None (score in this process).
+    id_column : str, optional
+        Column copied to the output to identify the rows.
+
+    Returns
+    -------
+    int
+        Number of rows scored.
+
+    Example
+    -------
+    >>> score_csv('results/models/imb_knn_pipeline.pickle', 'data/processed/X_test.csv',
+    ...           'results/tables/knn_test_scores.csv', chunksize=500)
+    """
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    chunks = (chunk for chunk in pd.read_csv(input_file, chunksize=chunksize) if not chunk.empty)
+    n_rows = 0
+    first = True
+
+    if not n_jobs:
+        model = load_model(model_path)
+        for chunk in chunks:
+            _write_chunk(score_chunk(model, chunk, id_column), output_file, first)
+            n_rows += len(chunk)
+            first = False
+    else:
+        n_workers = os.cpu_count() if n_jobs < 0 else n_jobs
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(_score_in_worker, chunk, id_column))
+                # Keep at most two chunks per worker in flight and write in submission order
+                while len(pending) >= 2 * n_workers:
+                    scored = pending.popleft().result()
+                    _write_chunk(scored, output_file, first)
+                    n_rows += len(scored)
+                    first = False
+            while pending:
+                scored = pending.popleft().result()
+                _write_chunk(scored, output_file, first)
+                n_rows += len(scored)
+                first = False
+
+    if first:
+        raise ValueError("The input file contains no rows to score.")
+    return n_rows
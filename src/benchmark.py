@@ -0,0 +1,355 @@
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import sklearn
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import make_pipeline as make_imb_pipeline
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from src.batch_score import score_csv
+from src.model_artifact import save_artifact
+from src.cv_metrics import ConfusionMatrixScorer
+from src.fold_cache import FoldTransformCache
+from src.logistic_regression_evaluation import evaluate_logistic_regression
+from src.preprocessor import build_preprocessor
+from src.run_hyperparameter_knn import run_hyperparameter_knn
+from src.run_knn_analysis import run_knn_analysis
+from src.run_split import split_data
+from src.schema import CATEGORICAL_FEATURES, NUMERIC_FEATURES, TARGET
+from src.synthetic_data import generate_cohort, write_cohort_csv
+
+RESULTS_FORMAT = "cardiopredict-benchmarks/1"
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5]
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cold-start budgets in seconds of the `cardiopredict` commands, from starting Python to exiting
+STARTUP_BUDGETS = {'help': 0.3, 'score': 1.0}
+
+Benchmark = namedtuple('Benchmark', ['setup', 'run', 'max_rows'])
+Benchmark.__doc__ = """
+One benchmarked step of the pipeline.
+
+`setup(n_rows, workdir, random_state)` prepares the inputs and is not timed;
+`run(inputs)` is the timed call. Sizes above `max_rows` are skipped, since
+the cost of the cross-validated searches grows faster than linearly.
+"""
+
+
+def _features_and_target(n_rows, random_state):
+    cohort = generate_cohort(n_rows, random_state)
+    return cohort.drop(columns=TARGET), cohort[TARGET]
+
+
+def _setup_split(n_rows, workdir, random_state):
+    input_file = write_cohort_csv(os.path.join(workdir, 'cohort.csv'), n_rows, random_state)
+    return input_file, os.path.join(workdir, 'train.csv'), os.path.join(workdir, 'test.csv')
+
+
+def _run_split(inputs):
+    split_data(*inputs)
+
+
+def _setup_preprocessing(n_rows, workdir, random_state):
+    return _features_and_target(n_rows, random_state)[0]
+
+
+def _run_preprocessing(X):
+    build_preprocessor().fit_transform(X)
+
+
+def _fit_pipeline(random_state):
+    X_train, y_train = _features_and_target(2000, random_state + 1)
+    pipe = make_imb_pipeline(RandomOverSampler(sampling_strategy='minority', random_state=random_state),
+                             build_preprocessor(), KNeighborsClassifier(n_neighbors=9))
+    return pipe.fit(X_train, y_train)
+
+
+def _setup_batch_scoring(n_rows, workdir, random_state):
+    # The model is trained on a fixed-size cohort, so only the number of scored rows grows
+    model_path = os.path.join(workdir, 'knn_pipeline.pickle')
+    with open(model_path, 'wb') as f:
+        pickle.dump(_fit_pipeline(random_state), f)
+    input_file = os.path.join(workdir, 'X.csv')
+    _features_and_target(n_rows, random_state)[0].to_csv(input_file, index=False)
+    return model_path, input_file, os.path.join(workdir, 'scores.csv')
+
+
+def _run_batch_scoring(inputs):
+    score_csv(*inputs)
+
+
+def _setup_xy(n_rows, workdir, random_state):
+    return _features_and_target(n_rows, random_state)
+
+
+def _run_knn_analysis(inputs):
+    X, y = inputs
+    scoring = ConfusionMatrixScorer({'accuracy': 'accuracy', 'precision': 'precision', 'recall': 'recall',
+                                     'f1_score': 'f1'}, pos_label=1)
+    run_knn_analysis(X, y, {"n_neighbors": np.arange(1, 40, 2)}, preprocessor=build_preprocessor(),
+                     scoring=scoring, sweep=True, cache=FoldTransformCache())
+
+
+def _run_hyperparameter_knn(inputs):
+    X, y = inputs
+    run_hyperparameter_knn(X, y, {"n_neighbors": np.arange(1, 10, 2)}, preprocessor=build_preprocessor())
+
+
+def _setup_logistic_regression(n_rows, workdir, random_state):
+    X, y = _features_and_target(n_rows, random_state)
+    return train_test_split(X, y, test_size=0.2, random_state=random_state)
+
+
+def _run_logistic_regression(inputs):
+    X_train, X_test, y_train, y_test = inputs
+    evaluate_logistic_regression(X_train, y_train, X_test, y_test, NUMERIC_FEATURES, CATEGORICAL_FEATURES)
+
+
+BENCHMARKS = {
+    'split_data': Benchmark(_setup_split, _run_split, 10 ** 7),
+    'preprocessing': Benchmark(_setup_preprocessing, _run_preprocessing, 10 ** 7),
+    'batch_scoring': Benchmark(_setup_batch_scoring, _run_batch_scoring, 10 ** 7),
+    'run_knn_analysis': Benchmark(_setup_xy, _run_knn_analysis, 10 ** 5),
+    'run_hyperparameter_knn': Benchmark(_setup_xy, _run_hyperparameter_knn, 10 ** 5),
+    'evaluate_logistic_regression': Benchmark(_setup_logistic_regression, _run_logistic_regression, 10 ** 5),
+}
+
+
+def environment():
+    """Versions and hardware the timings depend on."""
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "sklearn": sklearn.__version__, "machine": platform.machine(), "system": platform.system(),
+            "cpu_count": os.cpu_count()}
+
+
+def measure(run, inputs, repeats=3, memory=True):
+    """
+    Wall time of `run(inputs)` over `repeats` calls and, if `memory`, the peak traced memory of one more call.
+
+    The memory is measured in a separate call because tracing every
+    allocation slows the code down; it counts the memory allocated through
+    Python and NumPy, not that of the inputs.
+    """
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run(inputs)
+        seconds.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run(inputs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, names=None, repeats=3, memory=True, random_state=0, workdir=None,
+                   verbose=False):
+    """
+    Time and memory-profile pipeline steps on synthetic cohorts of each size.
+
+    Parameters
+    ----------
+    sizes : list of int, optional
+        Numbers of rows of the cohorts. Defaults to 10^3, 10^4 and 10^5.
+    names : list of str, optional
+        Benchmarks to run, from `BENCHMARKS`. Defaults to all.
+    repeats : int, optional
+        Number of timed calls per benchmark and size. Defaults to 3.
+    memory : bool, optional
+        Also measure the peak memory with `tracemalloc`. Defaults to True.
+    random_state : int, optional
+        Seed of the cohorts. Defaults to 0.
+    workdir : str, optional
+        Directory for the files the benchmarks read and write. Defaults to a temporary directory.
+    verbose : bool, optional
+        Print each result as it is measured. Defaults to False.
+
+    Returns
+    -------
+    dict
+        JSON-serialisable results: the environment, and one entry per benchmark
+        and size with the timings (`seconds`, `best_seconds`) and the peak
+        memory (`peak_memory_mb`), or `status: "skipped"` above its `max_rows`.
+
+    Example
+    -------
+    >>> results = run_benchmarks([10 ** 3, 10 ** 4], names=['split_data', 'preprocessing'])
+    >>> save_results(results, 'results/benchmarks/benchmarks.json')
+    """
+    names = list(BENCHMARKS) if names is None else list(names)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks {unknown}; choose from {list(BENCHMARKS)}.")
+
+    entries = []
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        for n_rows in sizes:
+            for name in names:
+                benchmark = BENCHMARKS[name]
+                entry = {"benchmark": name, "n_rows": int(n_rows)}
+                if n_rows > benchmark.max_rows:
+                    entry["status"] = "skipped"
+                else:
+                    seconds, peak = measure(benchmark.run, benchmark.setup(n_rows, directory, random_state),
+                                            repeats, memory)
+                    entry.update(status="ok", seconds=seconds, best_seconds=min(seconds),
+                                 peak_memory_mb=None if peak is None else peak / 1024 ** 2)
+                if verbose:
+                    print(_describe(entry))
+                entries.append(entry)
+    return {"format": RESULTS_FORMAT, "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "environment": environment(), "random_state": random_state, "repeats": repeats, "results": entries}
+
+
+def _describe(entry):
+    if entry["status"] != "ok":
+        return f"{entry['benchmark']:<30} {entry['n_rows']:>10}  {entry['status']}"
+    memory = '' if entry["peak_memory_mb"] is None else f"  {entry['peak_memory_mb']:10.1f} MB"
+    return f"{entry['benchmark']:<30} {entry['n_rows']:>10}  {entry['best_seconds']:10.3f} s{memory}"
+
+
+def _startup_commands(workdir, random_state):
+    # The score command scores a single record with a model artifact, the fastest model format to load
+    workdir = os.path.abspath(workdir)
+    artifact = os.path.join(workdir, 'knn_artifact')
+    save_artifact(_fit_pipeline(random_state), artifact)
+    input_file = os.path.join(workdir, 'record.csv')
+    _features_and_target(1, random_state)[0].to_csv(input_file, index=False)
+    return {'help': ['--help'],
+            'score': ['score', '--input-file', input_file, '--output-file', os.path.join(workdir, 'score.csv'),
+                      '--trained_knn_model', artifact]}
+
+
+def run_startup_benchmarks(budgets=STARTUP_BUDGETS, repeats=5, random_state=0, workdir=None, verbose=False):
+    """
+    Time the cold start of `cardiopredict` commands and check them against their budgets.
+
+    Each run starts a new Python process (`python -m src.cli ...`), so the
+    timings include the interpreter start-up and every import of the command;
+    `help` prints the list of commands and `score` scores one record with a
+    model artifact.
+
+    Parameters
+    ----------
+    budgets : dict, optional
+        Seconds allowed per command, by name. Defaults to `STARTUP_BUDGETS`.
+    repeats : int, optional
+        Number of timed runs per command; the best one is compared with the budget. Defaults to 5.
+    random_state : int, optional
+        Seed of the cohort the scored model is trained on. Defaults to 0.
+    workdir : str, optional
+        Directory for the model and records scored. Defaults to a temporary directory.
+    verbose : bool, optional
+        Print each result as it is measured. Defaults to False.
+
+    Returns
+    -------
+    dict
+        Results in the format of `run_benchmarks`, one entry per command
+        (`startup.<command>`, one row) with its `budget_seconds` and whether
+        it is `within_budget`.
+
+    Example
+    -------
+    >>> results = run_startup_benchmarks()
+    >>> [entry['benchmark'] for entry in results['results'] if not entry['within_budget']]
+    """
+    entries = []
+    with tempfile.TemporaryDirectory(dir=workdir) as directory:
+        commands = _startup_commands(directory, random_state)
+        unknown = [name for name in budgets if name not in commands]
+        if unknown:
+            raise ValueError(f"Unknown commands {unknown}; choose from {list(commands)}.")
+        for name, budget in budgets.items():
+            seconds = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, '-m', 'src.cli', *commands[name]], cwd=REPO_ROOT, check=True,
+                               stdout=subprocess.DEVNULL)
+                seconds.append(time.perf_counter() - start)
+            entry = {"benchmark": f"startup.{name}", "n_rows": 1, "status": "ok", "seconds": seconds,
+                     "best_seconds": min(seconds), "peak_memory_mb": None, "budget_seconds": budget,
+                     "within_budget": min(seconds) <= budget}
+            if verbose:
+                print(f"{_describe(entry)}  (budget {budget:.3f} s)")
+            entries.append(entry)
+    return {"format": RESULTS_FORMAT, "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "environment": environment(), "random_state": random_state, "repeats": repeats, "results": entries}
+
+
+def save_results(results, path):
+    """Write benchmark results to a JSON file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def load_results(path):
+    """Read benchmark results written by `save_results`."""
+    with open(path) as f:
+        results = json.load(f)
+    if results.get("format") != RESULTS_FORMAT:
+        raise ValueError(f"Unsupported benchmark results format {results.get('format')!r}.")
+    return results
+
+
+def compare_results(results, baseline, tolerance=0.25):
+    """
+    Compare benchmark results with a baseline run, benchmark by benchmark and size by size.
+
+    Parameters
+    ----------
+    results, baseline : dict
+        Results of `run_benchmarks` or `load_results`.
+    tolerance : float, optional
+        Allowed relative increase of the best time or the peak memory before a
+        step counts as a regression. Defaults to 0.25 (25%).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per benchmark and size measured in both runs, with the time
+        and memory of each run, their ratio and a `regression` flag.
+
+    Example
+    -------
+    >>> comparison = compare_results(results, load_results('results/benchmarks/baseline.json'))
+    >>> comparison[comparison['regression']]
+    """
+    columns = ['benchmark', 'n_rows', 'baseline_seconds', 'seconds', 'time_ratio', 'baseline_peak_memory_mb',
+               'peak_memory_mb', 'memory_ratio', 'regression']
+
+    def measured(run):
+        return {(entry["benchmark"], entry["n_rows"]): entry for entry in run["results"] if entry["status"] == "ok"}
+
+    current, reference = measured(results), measured(baseline)
+    rows = []
+    for key in current:
+        if key not in reference:
+            continue
+        entry, base = current[key], reference[key]
+        time_ratio = entry["best_seconds"] / base["best_seconds"]
+        memory_ratio = np.nan
+        if entry.get("peak_memory_mb") is not None and base.get("peak_memory_mb"):
+            memory_ratio = entry["peak_memory_mb"] / base["peak_memory_mb"]
+        regression = time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance
+        rows.append([*key, base["best_seconds"], entry["best_seconds"], time_ratio, base.get("peak_memory_mb"),
+                     entry.get("peak_memory_mb"), memory_ratio, bool(regression)])
+    return pd.DataFrame(rows, columns=columns)
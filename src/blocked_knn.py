@@ -0,0 +1,211 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.utils.validation import check_array, check_is_fitted, check_X_y
+from threadpoolctl import threadpool_limits
+
+
+def _scan(fit_X, fit_norms, X, n_keep, block_size):
+    """Running nearest squared distances of the rows of `X` to all rows of `fit_X`, one training block at a time."""
+    n_queries = len(X)
+    best = np.full((n_queries, n_keep), np.inf, dtype=X.dtype)
+    best_ind = np.full((n_queries, n_keep), -1, dtype=np.intp)
+    for start in range(0, len(fit_X), block_size):
+        block = fit_X[start:start + block_size]
+        # |x - t|^2 = |x|^2 - 2 x.t + |t|^2; |x|^2 does not change the order, so it is added at the end
+        distances = X @ block.T
+        distances *= -2
+        distances += fit_norms[None, start:start + block_size]
+        # Only the rows closer than the current k-th candidate can enter the running list; after the
+        # first blocks these are few, so they are packed to the left of a narrow matrix
+        closer = np.flatnonzero(distances < best.max(axis=1)[:, None])
+        if not len(closer):
+            continue
+        rows, columns = np.divmod(closer, distances.shape[1])
+        counts = np.bincount(rows, minlength=n_queries)
+        positions = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        new = np.full((n_queries, counts.max()), np.inf, dtype=X.dtype)
+        new_ind = np.full(new.shape, -1, dtype=np.intp)
+        new[rows, positions] = distances.ravel()[closer]
+        new_ind[rows, positions] = columns + start
+
+        merged = np.concatenate([best, new], axis=1)
+        keep = np.argpartition(merged, n_keep - 1, axis=1)[:, :n_keep]
+        best = np.take_along_axis(merged, keep, axis=1)
+        best_ind = np.take_along_axis(np.concatenate([best_ind, new_ind], axis=1), keep, axis=1)
+    return best + np.einsum('ij,ij->i', X, X)[:, None], best_ind
+
+
+def _exact_order(fit_X, X, ind, n_neighbors):
+    """Recompute the distances to the candidate rows `ind` in float64 and keep the nearest, closest first."""
+    differences = fit_X[ind] - X[:, None, :]
+    distances = np.einsum('ijk,ijk->ij', differences, differences)
+    # Ordered by distance, then by row position, so tied neighbours come in a fixed order
+    order = np.lexsort((ind, distances), axis=1)[:, :n_neighbors]
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(ind, order, axis=1)
+
+
+def _kneighbors_block(fit_X, fit_X_search, fit_norms, X, n_neighbors, block_size):
+    """Exact nearest neighbours of one block of query rows."""
+    n_fit, n_features = fit_X.shape
+    low_precision = fit_X_search.dtype != np.float64
+    # In low precision a pool of 2k candidates is searched, and the k nearest are chosen in float64
+    n_keep = min(2 * n_neighbors if low_precision else n_neighbors, n_fit)
+    pool_distances, pool_ind = _scan(fit_X_search, fit_norms, X.astype(fit_X_search.dtype), n_keep, block_size)
+    distances, ind = _exact_order(fit_X, X, pool_ind, n_neighbors)
+    if not low_precision or n_keep == n_fit:
+        return distances, ind
+
+    # Rounding error bound of the low-precision distances; a row outside the pool is at least
+    # `pool_distances.max() - error` away, so the float64 k nearest are exact unless they come closer
+    eps = np.finfo(fit_X_search.dtype).eps
+    error = 2 * (n_features + 8) * eps * (np.einsum('ij,ij->i', X, X) + fit_norms.max())
+    unsure = np.flatnonzero(distances[:, -1] > pool_distances.max(axis=1) - error)
+    if len(unsure):
+        _, rescan_ind = _scan(fit_X, np.einsum('ij,ij->i', fit_X, fit_X), X[unsure], n_keep, block_size)
+        distances[unsure], ind[unsure] = _exact_order(fit_X, X[unsure], rescan_ind, n_neighbors)
+    return distances, ind
+
+
+def blocked_kneighbors(fit_X, X, n_neighbors, block_size=1024, dtype=np.float32, n_threads=None, fit_X_search=None):
+    """
+    Exact k nearest rows of `fit_X` for every row of `X`, computed in query x training blocks.
+
+    Each block of `block_size` query rows is compared with one block of
+    `block_size` training rows at a time, and only a running list of the
+    nearest rows per query is kept, so memory depends on the block size and
+    never on the size of `X` or `fit_X`. With `dtype=np.float32` the blocks are
+    computed in single precision, which halves the memory traffic, and the 2k
+    nearest candidates are re-ranked in float64; queries whose float32 rounding
+    error could have left a true neighbour out of the candidates are searched
+    again in float64, so the result is exact.
+
+    Parameters
+    ----------
+    fit_X : np.ndarray of shape (n_samples, n_features)
+        Training rows, in float64.
+    X : np.ndarray of shape (n_queries, n_features)
+        Query rows, in float64.
+    n_neighbors : int
+        Number of neighbours k.
+    block_size : int, optional
+        Number of query and of training rows in a block. Defaults to 1024.
+    dtype : np.dtype, optional
+        Precision of the block distances: np.float32 or np.float64. Defaults to np.float32.
+    n_threads : int, optional
+        Number of threads the query blocks are spread over; each then uses a
+        single BLAS thread. Defaults to None (one thread, BLAS as configured).
+    fit_X_search : np.ndarray, optional
+        `fit_X` already converted to `dtype`, to avoid converting it on every call.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        Squared Euclidean distances and row positions of shape (n_queries, n_neighbors), closest first.
+
+    Example
+    -------
+    >>> distances, ind = blocked_kneighbors(Xt_train, Xt_test, n_neighbors=9, block_size=512, n_threads=4)
+    """
+    if n_neighbors > len(fit_X):
+        raise ValueError(f"Expected n_neighbors <= n_samples_fit, but n_neighbors = {n_neighbors}, "
+                         f"n_samples_fit = {len(fit_X)}")
+    if fit_X_search is None:
+        fit_X_search = fit_X.astype(dtype)
+    fit_norms = np.einsum('ij,ij->i', fit_X_search, fit_X_search)
+    starts = range(0, len(X), block_size)
+
+    def search(start):
+        return _kneighbors_block(fit_X, fit_X_search, fit_norms, X[start:start + block_size], n_neighbors, block_size)
+
+    if n_threads is None or n_threads == 1:
+        results = [search(start) for start in starts]
+    else:
+        # NumPy releases the GIL in the matrix products and partitions, so the threads run in parallel
+        with threadpool_limits(limits=1, user_api='blas'), ThreadPoolExecutor(n_threads) as executor:
+            results = list(executor.map(search, starts))
+    if not results:
+        return np.empty((0, n_neighbors)), np.empty((0, n_neighbors), dtype=np.intp)
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+class BlockedKNeighborsClassifier(ClassifierMixin, BaseEstimator):
+    """
+    k-nearest neighbours classifier whose neighbour search is `blocked_kneighbors`.
+
+    Uniform votes over the exact Euclidean neighbours, with ties going to the
+    first class, as in `KNeighborsClassifier`, so it can replace it in a
+    pipeline or be built from a fitted one with `from_estimator`. Neighbours
+    tied in distance at the k-th position may be broken in a different order
+    than in sklearn.
+
+    Parameters
+    ----------
+    n_neighbors : int, optional
+        Number of neighbours used for voting. Defaults to 5.
+    block_size : int, optional
+        Number of query and of training rows in a block. Defaults to 1024.
+    dtype : {'float32', 'float64'}, optional
+        Precision of the block distances. Defaults to 'float32'.
+    n_threads : int, optional
+        Number of threads the query blocks are spread over. Defaults to None (one).
+
+    Example
+    -------
+    >>> knn = BlockedKNeighborsClassifier(n_neighbors=9, block_size=512, n_threads=4)
+    >>> make_pipeline(preprocessor, knn).fit(X_train, y_train).predict(X_test)
+    """
+
+    def __init__(self, n_neighbors=5, block_size=1024, dtype='float32', n_threads=None):
+        self.n_neighbors = n_neighbors
+        self.block_size = block_size
+        self.dtype = dtype
+        self.n_threads = n_threads
+
+    def fit(self, X, y):
+        X, y = check_X_y(X, y, dtype=np.float64)
+        self.classes_, self._y = np.unique(y, return_inverse=True)
+        self.n_features_in_ = X.shape[1]
+        self._fit_X = np.ascontiguousarray(X)
+        self._fit_X_search = self._fit_X.astype(self.dtype)
+        return self
+
+    @classmethod
+    def from_estimator(cls, knn, **params):
+        """Blocked copy of a fitted uniform-weight Euclidean `KNeighborsClassifier`, on the same training rows."""
+        if not isinstance(knn, KNeighborsClassifier) or knn.weights != 'uniform' or knn.effective_metric_ != 'euclidean':
+            raise ValueError("Only a fitted uniform-weight Euclidean KNeighborsClassifier can be converted.")
+        return cls(n_neighbors=knn.n_neighbors, **params).fit(knn._fit_X, knn.classes_[knn._y])
+
+    def kneighbors(self, X, n_neighbors=None, return_distance=True):
+        check_is_fitted(self, "_fit_X")
+        X = check_array(X, dtype=np.float64)
+        n_neighbors = self.n_neighbors if n_neighbors is None else n_neighbors
+        distances, ind = blocked_kneighbors(self._fit_X, X, n_neighbors, self.block_size, self.dtype,
+                                            self.n_threads, fit_X_search=self._fit_X_search)
+        return (np.sqrt(distances), ind) if return_distance else ind
+
+    def predict_proba(self, X):
+        neigh_labels = self._y[self.kneighbors(X, return_distance=False)]
+        votes = np.stack([(neigh_labels == c).sum(axis=1) for c in range(len(self.classes_))], axis=1)
+        return votes / self.n_neighbors
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def blocked_pipeline(pipeline, **params):
+    """
+    Copy of a fitted pipeline whose final `KNeighborsClassifier` searches with `blocked_kneighbors`.
+
+    Example
+    -------
+    >>> knn = blocked_pipeline(load_model('results/models/imb_knn_pipeline.pickle'), block_size=512, n_threads=4)
+    >>> knn.predict(X_test)
+    """
+    if not hasattr(pipeline, 'steps'):
+        raise ValueError("Only a fitted pipeline ending in a KNeighborsClassifier can use the blocked search.")
+    name, knn = pipeline.steps[-1]
+    return type(pipeline)(pipeline.steps[:-1] + [(name, BlockedKNeighborsClassifier.from_estimator(knn, **params))])
@@ -0,0 +1,264 @@
+import os
+import pickle
+
+import click
+from src.instrumentation import instrumented, span
+
+# Only click and the standard library are imported above: each command imports what it needs
+# (pandas, sklearn, altair, matplotlib) in its body, so `--help` and `score` with a model
+# artifact start without loading the modelling and plotting libraries.
+
+
+@click.group()
+def cli():
+    '''CardioPredict: download, split, explore, model and score the Framingham heart disease data.'''
+
+
+@cli.command()
+@click.option('--url', default=None, help='URL of the CSV file to download. Defaults to the Framingham data set.')
+@click.option('--filepath', default=None, help='Local path the CSV file will be saved to. Defaults to data/raw/framingham.csv.')
+@click.option('--sha256', default=None, help='Expected SHA-256 digest of the file')
+@click.option('--chunk-size', type=int, default=1024 ** 2, help='Bytes downloaded and written at a time')
+@click.option('--manifest', default=None, type=click.Path(exists=True), help='CSV of url, filepath (and optional sha256) columns to download concurrently')
+@click.option('--report-to', default=None, help='Path of the per-file status report written in manifest mode')
+@click.option('--max-workers', type=int, default=8, help='Number of concurrent downloads in manifest mode')
+@click.option('--retries', type=int, default=3, help='Retries of a failed download in manifest mode')
+@instrumented('download_data')
+
+def download(url, filepath, sha256, chunk_size, manifest, report_to, max_workers, retries):
+    '''Download the raw data, resuming an interrupted download.
+
+    With --manifest, every file listed in the manifest is downloaded concurrently instead.'''
+    if manifest is not None:
+        if url is not None or filepath is not None:
+            raise click.UsageError('Use either --manifest or --url and --filepath.')
+        from src.fetch_manifest import fetch_manifest
+
+        with span('download', manifest=manifest):
+            report = fetch_manifest(manifest, max_workers=max_workers, retries=retries, chunk_size=chunk_size,
+                                    report_path=report_to)
+        failed = report[report['status'] != 'ok']
+        print(f"{len(report) - len(failed)} of {len(report)} files downloaded.")
+        if len(failed):
+            raise click.ClickException(f"{len(failed)} downloads failed: {', '.join(failed['url'])}")
+        return
+    from src.read_csv import download_data
+
+    url = url or 'https://paulblanche.com/files/framingham.csv'
+    filepath = filepath or 'data/raw/framingham.csv'
+    with span('download', url=url):
+        download_data(url, filepath, sha256=sha256, chunk_size=chunk_size)
+    print("Download completed.")
+
+
+@cli.command()
+@click.option('--input-file', default='data/raw/framingham.csv', type=click.Path(exists=True), help="The path to the raw data CSV file.")
+@click.option('--split-dir', default='data/processed', type=click.Path(), help="The directory where the splitted data should be saved.")
+@click.option('--preprocess-dir', default='data/processed', type=click.Path(), help="The directory where the processed data and object should be saved.")
+@click.option('--preprocessor-to', default='results/models', type=str, help="Path to directory where the preprocessor object will be written to")
+@click.option('--seed', type=int, help="Random seed", default=123)
+@click.option('--split-index-to', type=str, default=None,
+              help="Path of the row-index manifest of the split. Defaults to <input-file>.split.npz next to the raw data.")
+@click.option('--n-folds', type=int, default=None, help="Number of cross-validation folds stored in the split index")
+@click.option('--export-csv/--no-export-csv', default=True,
+              help="Also write the splits and transformed data as files, or store only the split index")
+@instrumented('split_preprocess_data')
+
+def split(input_file, split_dir, preprocess_dir, preprocessor_to, seed, split_index_to, n_folds, export_csv):
+    '''Split the raw data into train and test sets and save the unfitted preprocessor.'''
+    from src.data_cache import load_frame
+    from src.pipeline_steps import save_split, split_and_preprocess
+    from src.schema import FRAMINGHAM_SCHEMA
+    from src.split_index import index_path_for, save_split_index
+
+    split = split_and_preprocess(load_frame(input_file, schema=FRAMINGHAM_SCHEMA), seed=seed, n_folds=n_folds,
+                                 transform=export_csv)
+    index_path = save_split_index(split.index, input_file, split_index_to or index_path_for(input_file))
+    print(f"Split index saved to {index_path}")
+    if export_csv:
+        save_split(split, split_dir, preprocess_dir)
+        print(f"Processed data saved to {split_dir}")
+    os.makedirs(preprocessor_to, exist_ok=True)
+    with open(os.path.join(preprocessor_to, "preprocessor.pickle"), 'wb') as f:
+        pickle.dump(split.preprocessor, f)
+
+
+@cli.command()
+@click.option('--df', default='data/processed/train_data.csv', type=str, help="Path to training data")
+@click.option('--plot-to', default='results/figures', type=str, help="Path to directory where the plot will be written to")
+@click.option('--data-to', default='data/processed', type=str, help="Path to directory where data.csv will be saved to")
+@instrumented('eda')
+
+def eda(df, plot_to, data_to):
+    '''Save the exploratory charts of the training data.'''
+    from src.data_cache import load_frame
+    from src.pipeline_figures import plot_eda
+    from src.schema import FRAMINGHAM_SCHEMA
+
+    os.makedirs(plot_to, exist_ok=True)
+    plot_eda(load_frame(df, schema=FRAMINGHAM_SCHEMA), plot_to, data_to)
+
+
+@cli.command()
+@click.option('--x_train', default='data/processed/X_train.csv', type=str, help="Path to X_train")
+@click.option('--y_train', default='data/processed/y_train.csv', type=str, help="Path to y_train")
+@click.option('--split-index', type=str, default=None, help="Split index of the raw data; replaces --x_train and --y_train")
+@click.option('--preprocessor', default='results/models/preprocessor.pickle', type=str, help="Path to preprocessor")
+@click.option('--seed', type=int, help="Random seed", default=123)
+@click.option('--table-results-to', default='results/tables', type=str, help="Path to directory where the result table will be written to")
+@click.option('--figure-results-to', default='results/figures', type=str, help="Path to directory where the result figures will be written to")
+@click.option('--sweep/--no-sweep', default=True, help="Query neighbours once per fold for the whole k grid instead of refitting per k")
+@click.option('--n-jobs', type=int, default=None, help="Number of worker processes for the cross-validation tasks (-1 uses all cores)")
+@click.option('--engine', type=click.Choice(['sklearn', 'blocked']), default='sklearn',
+              help="Neighbour search of the folds: sklearn's, or float32 query x train blocks (blocked)")
+@click.option('--block-size', type=int, default=1024, help="Rows per query and training block of the blocked engine")
+@click.option('--n-threads', type=int, default=None, help="Threads of the blocked engine")
+@instrumented('select_knn_model')
+
+def select(x_train, y_train, split_index, preprocessor, seed, table_results_to, figure_results_to, sweep, n_jobs, engine,
+           block_size, n_threads):
+    '''Cross-validate kNN models over the k grid and plot their accuracy and recall.'''
+    import warnings
+    warnings.filterwarnings('ignore')
+    from src.blocked_knn import BlockedKNeighborsClassifier
+    from src.pipeline_figures import plot_knn_selection
+    from src.pipeline_steps import select_knn
+
+    x_train, y_train = _load_training_data(x_train, y_train, split_index)
+    with open(preprocessor, 'rb') as f:
+        preprocessor = pickle.load(f)
+
+    df_cv_knn = select_knn(x_train, y_train, preprocessor, seed=seed, sweep=sweep, n_jobs=n_jobs,
+                           engine=BlockedKNeighborsClassifier(block_size=block_size, n_threads=n_threads) if engine == 'blocked' else None)
+    os.makedirs(table_results_to, exist_ok=True)
+    os.makedirs(figure_results_to, exist_ok=True)
+    df_cv_knn.to_csv(os.path.join(table_results_to, "result_knn.csv"), index=False)
+    plot_knn_selection(df_cv_knn, figure_results_to)
+    print('Line plots saved!')
+
+
+@cli.command()
+@click.option('--x_train', default='data/processed/X_train.csv', type=str, help="Path to X_train")
+@click.option('--y_train', default='data/processed/y_train.csv', type=str, help="Path to y_train")
+@click.option('--split-index', type=str, default=None, help="Split index of the raw data; replaces --x_train and --y_train")
+@click.option('--preprocessor', default='results/models/preprocessor.pickle', type=str, help="Path to preprocessor")
+@click.option('--pipeline-to', default='results/models', type=str, help="Path to directory where the pipeline object will be written to")
+@click.option('--figure-results-to', default='results/figures', type=str, help="Path to directory where the result figure will be written to")
+@click.option('--oversampling', type=click.Choice(['duplicate', 'weighted']), default='duplicate',
+              help="Copy minority rows (duplicate) or store each row once with an oversampling count (weighted)")
+@click.option('--artifact-to', type=str, default=None,
+              help="Optional directory where a memory-mappable copy of the fitted model will be written to")
+@click.option('--neighbours', type=click.Choice(['exact', 'approximate']), default='exact',
+              help="Search all training rows (exact) or a random projection forest (approximate)")
+@click.option('--n-trees', type=int, default=10, help="Number of trees of the approximate search; more trees find more true neighbours")
+@click.option('--leaf-size', type=int, default=64, help="Maximum number of rows in a leaf of the approximate search")
+@click.option('--n-jobs', type=int, default=None, help="Number of worker processes for the permutation importance (-1 uses all cores)")
+@instrumented('fit_knn_model')
+
+def fit(x_train, y_train, split_index, preprocessor, pipeline_to, figure_results_to, oversampling, artifact_to, neighbours,
+        n_trees, leaf_size, n_jobs):
+    '''Fit the final kNN pipeline and plot its permutation feature importances.'''
+    if neighbours == 'approximate' and (oversampling == 'weighted' or artifact_to):
+        raise click.UsageError("--neighbours approximate works with --oversampling duplicate and without --artifact-to.")
+    from src.model_artifact import save_artifact
+    from src.pipeline_figures import plot_feature_importance
+    from src.pipeline_steps import fit_knn, knn_feature_importance
+
+    x_train, y_train = _load_training_data(x_train, y_train, split_index)
+    with open(preprocessor, 'rb') as f:
+        preprocessor = pickle.load(f)
+
+    pipeline = fit_knn(x_train, y_train, preprocessor, oversampling=oversampling, neighbours=neighbours,
+                       n_trees=n_trees, leaf_size=leaf_size)
+    os.makedirs(pipeline_to, exist_ok=True)
+    with open(os.path.join(pipeline_to, "imb_knn_pipeline.pickle"), 'wb') as f:
+        pickle.dump(pipeline, f)
+    if artifact_to:
+        save_artifact(pipeline, artifact_to)
+
+    os.makedirs(figure_results_to, exist_ok=True)
+    plot_feature_importance(knn_feature_importance(pipeline, x_train, y_train, n_jobs=n_jobs), figure_results_to)
+    print('Radar plot saved!')
+
+
+@cli.command()
+@click.option('--x_test', default='data/processed/X_test.csv', type=str, help="Path to X_test")
+@click.option('--y_test', default='data/processed/y_test.csv', type=str, help="Path to y_test")
+@click.option('--split-index', type=str, default=None, help="Split index of the raw data; replaces --x_test and --y_test")
+@click.option('--trained_knn_model', default='results/models/imb_knn_pipeline.pickle', type=str, help="Path to the trained knn model pipeline or model artifact directory")
+@click.option('--results-dir', default='results', type=str, help="Directory to save the evaluation results")
+@click.option('--engine', type=click.Choice(['sklearn', 'blocked']), default='sklearn',
+              help="Neighbour search of the predictions: the model's own, or float32 query x train blocks (blocked)")
+@click.option('--block-size', type=int, default=1024, help="Rows per query and training block of the blocked engine")
+@click.option('--n-threads', type=int, default=None, help="Threads of the blocked engine")
+@instrumented('knn_eval')
+
+def evaluate(x_test, y_test, split_index, trained_knn_model, results_dir, engine, block_size, n_threads):
+    '''Evaluate the trained model on the test set and save its confusion matrix and classification report.'''
+    from src.blocked_knn import blocked_pipeline
+    from src.data_cache import load_frame
+    from src.model_artifact import load_model
+    from src.pipeline_figures import plot_confusion_matrix
+    from src.pipeline_steps import evaluate_knn, save_evaluation
+    from src.schema import FRAMINGHAM_SCHEMA
+    from src.split_index import load_split
+
+    if split_index:
+        X_test, y_test = load_split(split_index, 'test')
+    else:
+        X_test = load_frame(x_test, schema=FRAMINGHAM_SCHEMA)
+        y_test = load_frame(y_test, squeeze=True, schema=FRAMINGHAM_SCHEMA)
+
+    knn = load_model(trained_knn_model)
+    if engine == 'blocked':
+        knn = blocked_pipeline(knn, block_size=block_size, n_threads=n_threads)
+    evaluation = evaluate_knn(knn, X_test, y_test)
+
+    figures_path = os.path.join(results_dir, 'figures')
+    os.makedirs(figures_path, exist_ok=True)
+    save_evaluation(evaluation, os.path.join(results_dir, 'tables'))
+    plot_confusion_matrix(evaluation.confusion_matrix, figures_path)
+    if evaluation.agreement is not None:
+        print(f"Approximate predictions differ from the exact search on {evaluation.agreement['disagreement'][0]:.1%} of the test rows")
+    print('Confusion mx and classification report saved!')
+
+
+@cli.command()
+@click.option('--input-file', required=True, type=click.Path(exists=True), help="Path to the CSV of patient records to score")
+@click.option('--output-file', required=True, type=str, help="Path to the CSV the predictions will be written to")
+@click.option('--trained_knn_model', default='results/models/imb_knn_pipeline.pickle', type=str,
+              help="Path to the trained knn model pipeline, or to a model artifact directory (fastest to start)")
+@click.option('--chunksize', default=10000, type=int, help="Number of rows read and scored at a time")
+@click.option('--n-jobs', default=None, type=int, help="Number of worker processes (-1 uses all cores)")
+@click.option('--id-column', default=None, type=str, help="Column copied to the output to identify each record")
+@instrumented('batch_score')
+
+def score(input_file, output_file, trained_knn_model, chunksize, n_jobs, id_column):
+    '''Score a CSV of patient records with the trained model, chunk by chunk.
+
+    A model artifact directory (`fit --artifact-to`) is scored with NumPy and
+    pandas only; a pickled pipeline also loads sklearn and imblearn.'''
+    from src.batch_score import score_csv
+
+    n_rows = score_csv(trained_knn_model, input_file, output_file, chunksize=chunksize, n_jobs=n_jobs,
+                       id_column=id_column)
+    print(f'{n_rows} records scored and saved to {output_file}')
+
+
+def _load_training_data(x_train, y_train, split_index):
+    """Training features and target, from the split index if given, else from their CSV files."""
+    from src.data_cache import load_frame
+    from src.schema import FRAMINGHAM_SCHEMA
+    from src.split_index import load_split
+
+    if split_index:
+        return load_split(split_index, 'train')
+    return (load_frame(x_train, schema=FRAMINGHAM_SCHEMA),
+            load_frame(y_train, squeeze=True, schema=FRAMINGHAM_SCHEMA))
+
+
+if __name__ == '__main__':
+    cli()
+
+# cardiopredict split && cardiopredict fit --artifact-to results/models/imb_knn_artifact
+# cardiopredict score --input-file data/processed/X_test.csv --output-file results/tables/knn_test_scores.csv --trained_knn_model results/models/imb_knn_artifact
@@ -0,0 +1,154 @@
+import warnings
+
+import numpy as np
+
+
+def confusion_counts(y_true, y_pred, pos_label=1, sample_weight=None):
+    """
+    True positives, false positives, false negatives and true negatives for `pos_label`.
+
+    Parameters
+    ----------
+    y_true, y_pred : array-like of shape (n_samples,) or (n_sets, n_samples)
+        True and predicted labels. With 2-d input every row of `y_pred` is
+        compared with `y_true` (broadcast), giving one set of counts per row.
+    pos_label : int or str, optional
+        Label of the positive class. Defaults to 1.
+    sample_weight : array-like of shape (n_samples,), optional
+        Weight of each sample. Defaults to None (unit weights).
+
+    Returns
+    -------
+    tuple of np.ndarray
+        `(tp, fp, fn, tn)`, scalars for 1-d input or arrays of shape (n_sets,).
+    """
+    # A single-column DataFrame of labels is treated as a vector
+    actual = np.asarray(y_true).ravel() == pos_label
+    predicted = np.asarray(y_pred) == pos_label
+    weight = np.ones(actual.shape[-1]) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    tp = ((actual & predicted) * weight).sum(axis=-1)
+    fp = ((~actual & predicted) * weight).sum(axis=-1)
+    fn = ((actual & ~predicted) * weight).sum(axis=-1)
+    tn = ((~actual & ~predicted) * weight).sum(axis=-1)
+    return tp, fp, fn, tn
+
+
+def _ratio(numerator, denominator):
+    """numerator / denominator, with 0 where the denominator is 0 (sklearn's zero_division default)."""
+    numerator, denominator = np.asarray(numerator, dtype=np.float64), np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator * denominator), where=denominator != 0)
+
+
+def _f1(tp, fp, fn, tn):
+    return _ratio(2 * tp, 2 * tp + fp + fn)
+
+
+def _balanced_accuracy(tp, fp, fn, tn):
+    return (_ratio(tp, tp + fn) + _ratio(tn, tn + fp)) / 2
+
+
+# Binary metrics expressed on the confusion counts; names follow sklearn's scorer names
+METRICS = {
+    "accuracy": lambda tp, fp, fn, tn: _ratio(tp + tn, tp + fp + fn + tn),
+    "precision": lambda tp, fp, fn, tn: _ratio(tp, tp + fp),
+    "recall": lambda tp, fp, fn, tn: _ratio(tp, tp + fn),
+    "specificity": lambda tp, fp, fn, tn: _ratio(tn, tn + fp),
+    "f1": _f1,
+    "balanced_accuracy": _balanced_accuracy,
+}
+
+
+def metrics_from_counts(counts, metrics):
+    """
+    Compute several metrics from one set of confusion counts.
+
+    Parameters
+    ----------
+    counts : tuple
+        `(tp, fp, fn, tn)` as returned by `confusion_counts`.
+    metrics : dict
+        Maps output names to metric names in `METRICS`.
+
+    Returns
+    -------
+    dict
+        Maps each output name to its score (a float, or an array for stacked counts).
+    """
+    scores = {}
+    for name, metric in metrics.items():
+        value = METRICS[metric](*counts)
+        scores[name] = float(value) if np.ndim(value) == 0 else value
+    return scores
+
+
+class ConfusionMatrixScorer:
+    """
+    Multi-metric scorer that predicts once and derives every metric from the confusion matrix.
+
+    sklearn scorers each call `predict` on their own, so a dict of four
+    scorers runs four neighbour searches per fold in our cross-validation
+    helpers. This scorer calls `predict` once, counts the confusion matrix of
+    the positive class and returns all requested metrics as a dict, which
+    `cross_validate` and the kNN sweeps accept as a multi-metric `scoring`
+    argument and report as `test_<name>`.
+
+    Like sklearn's own multi-metric scoring with `error_score=np.nan`, a
+    failing `predict` (for example k larger than the training fold) gives NaN
+    for every metric and a warning instead of an exception.
+
+    Parameters
+    ----------
+    metrics : dict or list of str
+        Maps output names to metric names ('accuracy', 'precision', 'recall',
+        'specificity', 'f1', 'balanced_accuracy'); a list uses the metric names
+        as output names.
+    pos_label : int or str, optional
+        Label of the positive class. Defaults to 1.
+
+    Example
+    -------
+    >>> scoring = ConfusionMatrixScorer({'accuracy': 'accuracy', 'recall': 'recall', 'f1_score': 'f1'})
+    >>> cross_validate(pipe, X_train, y_train, scoring=scoring)['test_f1_score']
+    """
+
+    def __init__(self, metrics, pos_label=1):
+        metrics = dict(metrics) if isinstance(metrics, dict) else {metric: metric for metric in metrics}
+        unknown = sorted(set(metrics.values()) - set(METRICS))
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}. Available: {', '.join(METRICS)}.")
+        self.metrics = metrics
+        self.pos_label = pos_label
+
+    def __call__(self, estimator, X, y_true, sample_weight=None):
+        try:
+            y_pred = estimator.predict(X)
+        except Exception as error:
+            warnings.warn(f"Scoring failed, the scores are set to NaN: {error!r}", UserWarning)
+            return {name: np.nan for name in self.metrics}
+        return metrics_from_counts(confusion_counts(y_true, y_pred, self.pos_label, sample_weight), self.metrics)
+
+    def __repr__(self):
+        return f"ConfusionMatrixScorer({self.metrics!r}, pos_label={self.pos_label!r})"
+
+
+class ReplayedPredictions:
+    """
+    Stand-in classifier that replays predictions already computed elsewhere.
+
+    sklearn scorers only need `predict`/`predict_proba` and `classes_`, so
+    predictions read off precomputed neighbour votes (a kNN sweep fold, a
+    permuted feature) can be scored with the same scorer objects
+    `cross_validate` uses. The `X` passed to the scorer is ignored.
+    """
+    _estimator_type = "classifier"
+
+    def __init__(self, classes, y_pred, y_proba):
+        self.classes_ = classes
+        self._y_pred = y_pred
+        self._y_proba = y_proba
+
+    def predict(self, X):
+        return self._y_pred
+
+    def predict_proba(self, X):
+        return self._y_proba
@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from src.instrumentation import span
+from src.schema import apply_schema, csv_dtypes
+
+CACHE_FORMAT = "cardiopredict-columns/1"
+METADATA_FILE = "columns.json"
+
+
+def cache_dir(csv_path):
+    """Directory of the columnar copy of `csv_path`: `data/processed/X_train.csv` -> `data/processed/X_train.cols`."""
+    return os.path.splitext(csv_path)[0] + '.cols'
+
+
+def _code_strings(values):
+    """Integer codes and categories of a string or categorical column; missing values get code -1."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, categories = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, categories = pd.factorize(values, sort=True)
+    if not all(isinstance(category, str) for category in categories):
+        return None, None
+    dtype = np.int8 if len(categories) < 2 ** 7 else np.int32
+    return codes.astype(dtype), categories.tolist()
+
+
+def save_frame(frame, csv_path):
+    """
+    Save a DataFrame as CSV and as a columnar cache of one `.npy` file per column.
+
+    The CSV stays the reference copy that people and other tools read. The
+    cache next to it (see `cache_dir`) keeps each column's dtype: numeric and
+    boolean columns are stored as they are, string and categorical columns as
+    integer codes with their categories in `columns.json`. If any column has
+    another type, no cache is written (and an older one is removed), so
+    `load_frame` then reads the CSV.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame or pd.Series
+        Data to save; a Series is saved as a one-column frame, as `to_csv` does.
+    csv_path : str
+        Path of the CSV file.
+
+    Returns
+    -------
+    str or None
+        Directory of the cache, or None if a column type prevented it.
+
+    Example
+    -------
+    >>> save_frame(X_train, 'data/processed/X_train.csv')
+    """
+    frame = frame.to_frame() if isinstance(frame, pd.Series) else frame
+    frame.to_csv(csv_path, index=False)
+
+    # Check every column before writing, so an unsupported one leaves no partial cache behind
+    arrays, columns = [], []
+    for position, (name, values) in enumerate(frame.items()):
+        filename = f"{position}.npy"
+        if values.dtype.kind in 'biuf':
+            arrays.append(values.to_numpy())
+            columns.append({"name": name, "file": filename})
+            continue
+        categorical = isinstance(values.dtype, pd.CategoricalDtype)
+        codes, categories = _code_strings(values) if values.dtype == object or categorical else (None, None)
+        if codes is None:
+            arrays = None
+            break
+        arrays.append(codes)
+        columns.append({"name": name, "file": filename, "categories": categories, "categorical": categorical})
+
+    directory = cache_dir(csv_path)
+    # Arrays of an older cache would not match the new metadata
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    if arrays is None:
+        return None
+    os.makedirs(directory)
+    for column, values in zip(columns, arrays):
+        np.save(os.path.join(directory, column["file"]), values)
+
+    metadata = {"format": CACHE_FORMAT, "n_rows": len(frame), "columns": columns,
+                "csv_size": os.path.getsize(csv_path), "csv_mtime_ns": os.stat(csv_path).st_mtime_ns}
+    with open(os.path.join(directory, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return directory
+
+
+def _cache_metadata(csv_path):
+    """Metadata of the columnar cache of `csv_path`, or None if it is missing or older than the CSV."""
+    path = os.path.join(cache_dir(csv_path), METADATA_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        metadata = json.load(f)
+    if metadata.get("format") != CACHE_FORMAT:
+        return None
+    # A CSV edited or rewritten after the cache was saved is the newer data
+    if os.path.exists(csv_path):
+        stat = os.stat(csv_path)
+        if (stat.st_size, stat.st_mtime_ns) != (metadata["csv_size"], metadata["csv_mtime_ns"]):
+            return None
+    return metadata
+
+
+def load_frame(csv_path, mmap=True, squeeze=False, schema=None):
+    """
+    Load a DataFrame saved by `save_frame`, preferring its columnar cache over the CSV.
+
+    Numeric columns are memory-mapped read-only when `mmap` is True, so
+    loading costs no parsing and the pages are read from disk as they are
+    used. Assigning to those columns in place then raises a ValueError
+    ("assignment destination is read-only"); modify a `frame.copy()`, or
+    load with `mmap=False`, instead. Falls back to `pd.read_csv` when there is no cache or the CSV has
+    changed since the cache was written, so it also reads plain CSV files.
+    With a `schema`, the columns it describes are validated and converted to
+    their compact dtypes (see `src.schema.apply_schema`); a cache saved from
+    converted data is already compact and is not copied.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path of the CSV file.
+    mmap : bool, optional
+        Memory-map the numeric columns instead of reading them into memory. Defaults to True.
+    squeeze : bool, optional
+        Return a one-column frame as a Series, like `pd.read_csv(...).squeeze()`. Defaults to False.
+    schema : dict, optional
+        Column schema such as `src.schema.FRAMINGHAM_SCHEMA`. Defaults to None (dtypes as stored or parsed).
+
+    Returns
+    -------
+    pd.DataFrame or pd.Series
+
+    Example
+    -------
+    >>> X_train = load_frame('data/processed/X_train.csv')
+    >>> y_train = load_frame('data/processed/y_train.csv', squeeze=True, schema=FRAMINGHAM_SCHEMA)
+    """
+    with span('load', path=csv_path):
+        frame = _load_frame(csv_path, mmap, schema)
+    return frame.squeeze(axis=1) if squeeze and frame.shape[1] == 1 else frame
+
+
+def _load_frame(csv_path, mmap, schema):
+    metadata = _cache_metadata(csv_path)
+    if metadata is None:
+        frame = pd.read_csv(csv_path, dtype=csv_dtypes(schema) if schema is not None else None)
+    else:
+        directory = cache_dir(csv_path)
+        data = {}
+        for column in metadata["columns"]:
+            values = np.load(os.path.join(directory, column["file"]), mmap_mode='r' if mmap else None)
+            if column.get("categorical"):
+                values = pd.Categorical.from_codes(values, column["categories"])
+            elif "categories" in column:
+                categories = np.array(column["categories"] + [np.nan], dtype=object)
+                values = categories[values]
+            data[column["name"]] = values
+        # copy=False keeps one block per column, so the memory-mapped columns are not copied
+        frame = pd.DataFrame(data, columns=[column["name"] for column in metadata["columns"]], copy=False)
+    if schema is not None:
+        frame = apply_schema(frame, schema)
+    return frame
@@ -0,0 +1,281 @@
+import math
+import pickle
+
+import numpy as np
+import pandas as pd
+from src.knn_votes import compress_rows, nearest_rows, weighted_votes
+
+# sklearn is only needed to compile a pipeline, so it is imported there; scoring with a
+# loaded artifact then starts without paying for it (see `cardiopredict score`)
+
+
+def _numeric_steps(transformer, n_columns):
+    """Collapse a chain of SimpleImputer and StandardScaler steps into fill values, offsets and scales."""
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    steps = transformer.steps if isinstance(transformer, Pipeline) else [(None, transformer)]
+    # The chain maps a raw value v to (v - offset) / scale and a missing value to fill
+    fill = np.full(n_columns, np.nan)
+    offset = np.zeros(n_columns)
+    scale = np.ones(n_columns)
+    for _, step in steps:
+        if isinstance(step, SimpleImputer):
+            if step.add_indicator or not (isinstance(step.missing_values, float) and math.isnan(step.missing_values)):
+                raise ValueError("Only SimpleImputer with missing_values=np.nan and no indicator can be compiled.")
+            fill = np.where(np.isnan(fill), step.statistics_.astype(np.float64), fill)
+        elif isinstance(step, StandardScaler):
+            mean = step.mean_ if step.with_mean and step.mean_ is not None else 0.0
+            std = step.scale_ if step.scale_ is not None else 1.0
+            offset = offset + mean * scale
+            scale = scale * std
+            fill = (fill - mean) / std
+        else:
+            raise ValueError(f"Cannot compile numeric step {type(step).__name__}.")
+    return fill, offset, scale
+
+
+def _one_hot_maps(encoder):
+    """Map each category of every encoded column to its output position, leaving out dropped categories."""
+    if encoder.handle_unknown not in ('error', 'ignore'):
+        raise ValueError(f"Cannot compile OneHotEncoder with handle_unknown={encoder.handle_unknown!r}.")
+    drop_idx = encoder.drop_idx_ if encoder.drop_idx_ is not None else [None] * len(encoder.categories_)
+    maps, position = [], 0
+    for categories, dropped in zip(encoder.categories_, drop_idx):
+        mapping = {}
+        for i, category in enumerate(categories):
+            if dropped is not None and i == dropped:
+                mapping[category] = None
+            else:
+                mapping[category] = position
+                position += 1
+        maps.append(mapping)
+    return maps, position
+
+
+def _category_position(mapping, value):
+    position = mapping.get(value, -1)
+    return -2 if position is None else position
+
+
+class FastKNNPredictor:
+    """
+    Single-patient kNN predictor compiled from a fitted preprocessing and kNN pipeline.
+
+    The imputer medians, scaler means and scales, one-hot category maps and the
+    training matrix are copied into plain NumPy arrays and dicts, so scoring one
+    patient costs a few vector operations instead of a pass through pandas and
+    the `ColumnTransformer`. Identical training rows (such as the copies made by
+    `RandomOverSampler`) are stored once with a count, which gives the same votes.
+
+    Build it with `FastKNNPredictor.from_pipeline`; it supports column
+    transformers made of SimpleImputer/StandardScaler chains and OneHotEncoder,
+    followed by a uniform-weight Euclidean `KNeighborsClassifier` or a
+    `CountWeightedKNeighborsClassifier`. Neighbours tied in distance at the k-th
+    position may be broken in a different order than in sklearn.
+
+    Example
+    -------
+    >>> fast = FastKNNPredictor.from_pipeline(load_model('results/models/imb_knn_pipeline.pickle'))
+    >>> fast.predict({'AGE': 52, 'FRW': 105, 'SBP': 140, 'DBP': 85, 'CHOL': 230, 'CIG': 10, 'sex': 'Male'})
+    """
+
+    def __init__(self, feature_names, numeric_index, fill, offset, scale, categorical_index, category_maps,
+                 ignore_unknown, n_output, fit_X, y, counts, classes, n_neighbors):
+        self.feature_names = list(feature_names)
+        self.numeric_index = np.asarray(numeric_index, dtype=np.intp)
+        self.fill = np.asarray(fill, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.categorical_index = list(categorical_index)
+        self.category_maps = list(category_maps)
+        self.ignore_unknown = list(ignore_unknown)
+        self.n_output = n_output
+        self.fit_X = np.ascontiguousarray(fit_X, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.intp)
+        self.counts = np.asarray(counts)
+        self.classes_ = np.asarray(classes)
+        self.n_neighbors = n_neighbors
+        self._n_numeric = len(self.numeric_index)
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """
+        Compile a fitted pipeline ending in a kNN classifier.
+
+        Parameters
+        ----------
+        pipeline : fitted sklearn or imblearn Pipeline
+            Optional resampling steps, a fitted `ColumnTransformer` and a kNN
+            classifier. Resampling steps are skipped, as they are at predict time.
+
+        Returns
+        -------
+        FastKNNPredictor
+        """
+        from sklearn.compose import ColumnTransformer
+        from sklearn.neighbors import KNeighborsClassifier
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import OneHotEncoder
+        from src.weighted_knn import CountWeightedKNeighborsClassifier
+
+        steps = [step for _, step in pipeline.steps if not hasattr(step, "fit_resample")]
+        if len(steps) != 2 or not isinstance(steps[0], ColumnTransformer):
+            raise ValueError("The pipeline must consist of a ColumnTransformer followed by a kNN classifier.")
+        preprocessor, knn = steps
+
+        if isinstance(knn, CountWeightedKNeighborsClassifier):
+            fit_X, y, counts = knn._fit_X, knn._y, knn.sample_counts_
+        elif isinstance(knn, KNeighborsClassifier):
+            if knn.weights != 'uniform' or knn.effective_metric_ != 'euclidean':
+                raise ValueError("Only uniform-weight Euclidean KNeighborsClassifier can be compiled.")
+            fit_X, y, counts = compress_rows(knn._fit_X, knn._y, np.ones(len(knn._y), dtype=np.intp))
+        else:
+            raise ValueError(f"Cannot compile classifier {type(knn).__name__}.")
+
+        feature_names = list(preprocessor.feature_names_in_)
+        numeric_index, fill, offset, scale, numeric_output = [], [], [], [], []
+        categorical_index, category_maps, ignore_unknown, categorical_output = [], [], [], []
+        position = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            positions = [feature_names.index(c) if isinstance(c, str) else int(c) for c in columns]
+            if transformer == 'passthrough':
+                transformer = Pipeline([])
+            if isinstance(transformer, OneHotEncoder):
+                maps, width = _one_hot_maps(transformer)
+                for column, mapping in zip(positions, maps):
+                    categorical_index.append(column)
+                    category_maps.append({k: v if v is None else v + position for k, v in mapping.items()})
+                    ignore_unknown.append(transformer.handle_unknown == 'ignore')
+                categorical_output.extend(range(position, position + width))
+            else:
+                column_fill, column_offset, column_scale = _numeric_steps(transformer, len(positions))
+                numeric_index.extend(positions)
+                fill.extend(column_fill)
+                offset.extend(column_offset)
+                scale.extend(column_scale)
+                numeric_output.extend(range(position, position + len(positions)))
+                width = len(positions)
+            position += width
+
+        if position != fit_X.shape[1]:
+            raise ValueError(f"The preprocessor produces {position} features but the classifier expects {fit_X.shape[1]}.")
+        # Numeric features come first in the compiled vector; reorder the training columns to match
+        order = np.array(numeric_output + categorical_output, dtype=np.intp)
+        shift = {old: new for new, old in enumerate(order)}
+        category_maps = [{k: v if v is None else shift[v] for k, v in m.items()} for m in category_maps]
+
+        return cls(feature_names, numeric_index, fill, offset, scale, categorical_index, category_maps,
+                   ignore_unknown, position, fit_X[:, order], y, counts, knn.classes_, knn.n_neighbors)
+
+    def transform(self, row):
+        """
+        Preprocess one patient record into the classifier's feature vector.
+
+        Parameters
+        ----------
+        row : dict or sequence
+            Feature values by column name, or in the column order the pipeline
+            was trained on. Missing numeric values (absent keys, None or NaN) are imputed.
+
+        Returns
+        -------
+        np.ndarray of shape (n_features,)
+        """
+        if isinstance(row, dict):
+            values = [row.get(name) for name in self.feature_names]
+        else:
+            values = list(row)
+            if len(values) != len(self.feature_names):
+                raise ValueError(f"Expected {len(self.feature_names)} values, got {len(values)}.")
+
+        x = np.zeros(self.n_output)
+        numeric = np.array([np.nan if values[i] is None else values[i] for i in self.numeric_index], dtype=np.float64)
+        numeric = (numeric - self.offset) / self.scale
+        numeric = np.where(np.isnan(numeric), self.fill, numeric)
+        if np.isnan(numeric).any():
+            raise ValueError("Input contains NaN in a column without an imputer.")
+        x[:self._n_numeric] = numeric
+        for column, mapping, ignore in zip(self.categorical_index, self.category_maps, self.ignore_unknown):
+            value = values[column]
+            if value not in mapping:
+                if ignore:
+                    continue
+                raise ValueError(f"Unknown category {value!r} in column {self.feature_names[column]!r}.")
+            if mapping[value] is not None:
+                x[mapping[value]] = 1.0
+        return x
+
+    def transform_frame(self, X):
+        """
+        Preprocess a DataFrame of patient records, one feature vector per row.
+
+        Parameters
+        ----------
+        X : pd.DataFrame
+            Records with the columns the pipeline was trained on.
+
+        Returns
+        -------
+        np.ndarray of shape (n_records, n_features)
+        """
+        Xt = np.zeros((len(X), self.n_output))
+        numeric = X.iloc[:, self.numeric_index].to_numpy(dtype=np.float64, na_value=np.nan)
+        numeric = (numeric - self.offset) / self.scale
+        numeric = np.where(np.isnan(numeric), self.fill, numeric)
+        if np.isnan(numeric).any():
+            raise ValueError("Input contains NaN in a column without an imputer.")
+        Xt[:, :self._n_numeric] = numeric
+        rows = np.arange(len(X))
+        for column, mapping, ignore in zip(self.categorical_index, self.category_maps, self.ignore_unknown):
+            values = X.iloc[:, column].tolist()
+            # -1 marks an unknown category and -2 the dropped one
+            positions = np.array([_category_position(mapping, value) for value in values], dtype=np.intp)
+            unknown = positions == -1
+            if unknown.any() and not ignore:
+                value = values[np.argmax(unknown)]
+                raise ValueError(f"Unknown category {value!r} in column {self.feature_names[column]!r}.")
+            hot = positions >= 0
+            Xt[rows[hot], positions[hot]] = 1.0
+        return Xt
+
+    def _votes(self, Xt):
+        """Votes for a matrix of preprocessed rows; the neighbour search runs in blocks of bounded memory."""
+        if getattr(self, '_fit_norms', None) is None:
+            self._fit_norms = np.einsum('ij,ij->i', self.fit_X, self.fit_X)
+        _, nearest = nearest_rows(self.fit_X, Xt, self.n_neighbors, fit_norms=self._fit_norms)
+        return weighted_votes(self.y[nearest], self.counts[nearest], len(self.classes_), self.n_neighbors)
+
+    def vote_counts(self, row):
+        """
+        Number of the k voting slots held by each class.
+
+        A dict or sequence is scored as one patient record and gives a vector of
+        shape (n_classes,); a DataFrame gives one row of votes per record.
+        """
+        if isinstance(row, pd.DataFrame):
+            return self._votes(self.transform_frame(row))
+        return self._votes(self.transform(row)[None, :])[0]
+
+    def predict_proba(self, row):
+        """Class probabilities in the order of `classes_`, for one record or a DataFrame of records."""
+        return self.vote_counts(row) / self.n_neighbors
+
+    def predict(self, row):
+        """Predicted class for one record, or an array of classes for a DataFrame of records."""
+        votes = self.vote_counts(row)
+        return self.classes_[np.argmax(votes, axis=-1)]
+
+    def save(self, path):
+        """Write the compiled predictor to `path`."""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        """Read a compiled predictor written by `save`."""
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from src.read_csv import CHUNK_SIZE, TransientDownloadError, download_data
+
+# Columns of the per-file status report, in order
+REPORT_COLUMNS = ['url', 'filepath', 'status', 'attempts', 'bytes', 'sha256', 'seconds', 'error']
+# Failures worth retrying: the connection or the server may recover, unlike an invalid URL or a checksum mismatch
+TRANSIENT_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError, TransientDownloadError)
+
+
+def read_manifest(manifest_path):
+    """
+    Read a CSV manifest of files to download.
+
+    The manifest has a `url` and a `filepath` column and optionally a
+    `sha256` column with the expected digest of each file (empty if unknown).
+    Two rows may not write the same file.
+
+    Returns
+    -------
+    list of dict
+        One `{'url', 'filepath', 'sha256'}` entry per row.
+    """
+    manifest = pd.read_csv(manifest_path, dtype=str)
+    missing = {'url', 'filepath'} - set(manifest.columns)
+    if missing:
+        raise ValueError(f"The manifest is missing the columns: {', '.join(sorted(missing))}.")
+    if 'sha256' not in manifest.columns:
+        manifest['sha256'] = None
+    manifest = manifest.astype(object).where(manifest.notna(), None)
+    return check_filepaths(manifest[['url', 'filepath', 'sha256']].to_dict('records'))
+
+
+def check_filepaths(entries):
+    """Raise a ValueError if two manifest entries would download to the same file; returns `entries`."""
+    seen = {}
+    for entry in entries:
+        path = os.path.abspath(entry['filepath'])
+        if path in seen:
+            raise ValueError(f"{seen[path]} and {entry['url']} are both downloaded to {entry['filepath']}.")
+        seen[path] = entry['url']
+    return entries
+
+
+def make_session(pool_size=1):
+    """
+    A requests session keeping up to `pool_size` open connections per host for reuse across downloads.
+
+    A session is not thread-safe, so concurrent downloads each use their own.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_file(session, entry, retries=3, backoff=0.5, chunk_size=CHUNK_SIZE, timeout=60):
+    """
+    Download one manifest entry, retrying transient failures with exponential backoff.
+
+    Connection errors, timeouts, server errors (408, 429 and 5xx) and cut-off
+    transfers are retried after `backoff`, `2 * backoff`, ... seconds. Each
+    retry resumes the partial file left by the previous attempt. Any other
+    error, such as an invalid URL, a missing file, a checksum mismatch or an
+    unwritable `filepath`, fails at once and is recorded rather than raised.
+
+    Returns
+    -------
+    dict
+        Status of the download with the keys of `REPORT_COLUMNS`.
+    """
+    started = time.perf_counter()
+    status = {'url': entry['url'], 'filepath': entry['filepath'], 'status': 'failed', 'attempts': 0,
+              'bytes': None, 'sha256': None, 'seconds': None, 'error': None}
+    for attempt in range(retries + 1):
+        status['attempts'] = attempt + 1
+        try:
+            status['sha256'] = download_data(entry['url'], entry['filepath'], sha256=entry.get('sha256'),
+                                             chunk_size=chunk_size, timeout=timeout, session=session)
+        except TRANSIENT_ERRORS as error:
+            status['error'] = repr(error)
+            if attempt < retries:
+                time.sleep(backoff * 2 ** attempt)
+            continue
+        except Exception as error:
+            status['error'] = repr(error)
+            break
+        status['status'] = 'ok'
+        status['error'] = None
+        status['bytes'] = os.path.getsize(entry['filepath'])
+        break
+    status['seconds'] = time.perf_counter() - started
+    return status
+
+
+def fetch_manifest(entries, max_workers=8, retries=3, backoff=0.5, chunk_size=CHUNK_SIZE, timeout=60,
+                   report_path=None):
+    """
+    Download the files of a manifest concurrently, with one HTTP session per worker thread.
+
+    At most `max_workers` files are downloaded at a time, each in its own
+    thread. Every thread keeps its session, and with it the connection to a
+    server, for the files it downloads next, so the shards of one server reuse
+    connections instead of reconnecting for every file. A failing file does
+    not stop the others: its final error is recorded in the status report.
+    Entries that would write the same file are rejected before any download.
+
+    Parameters
+    ----------
+    entries : list of dict or str
+        Entries with `url`, `filepath` and optionally `sha256`, or the path of a manifest CSV.
+    max_workers : int, optional
+        Largest number of concurrent downloads. Defaults to 8.
+    retries : int, optional
+        Number of retries of a transient failure per file. Defaults to 3.
+    backoff : float, optional
+        Seconds to wait before the first retry; doubled for every further retry. Defaults to 0.5.
+    chunk_size : int, optional
+        Number of bytes read and written at a time. Defaults to 1 MiB.
+    timeout : float, optional
+        Seconds to wait for a server to respond or send data. Defaults to 60.
+    report_path : str, optional
+        CSV file the per-file status report is written to. Defaults to None (not written).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per entry, in manifest order, with the columns `REPORT_COLUMNS`.
+
+    Example
+    -------
+    >>> report = fetch_manifest('data/raw/cohort_manifest.csv', max_workers=16,
+    ...                         report_path='data/raw/cohort_fetch_report.csv')
+    >>> report[report['status'] != 'ok']
+    """
+    entries = read_manifest(entries) if isinstance(entries, str) else check_filepaths(entries)
+    local, sessions = threading.local(), []
+
+    def fetch(entry):
+        if not hasattr(local, 'session'):
+            local.session = make_session()
+            sessions.append(local.session)
+        return fetch_file(local.session, entry, retries, backoff, chunk_size, timeout)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            statuses = list(executor.map(fetch, entries))
+    finally:
+        for session in sessions:
+            session.close()
+
+    report = pd.DataFrame(statuses, columns=REPORT_COLUMNS)
+    if report_path is not None:
+        directory = os.path.dirname(report_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        report.to_csv(report_path, index=False)
+    return report
@@ -0,0 +1,218 @@
+import threading
+import uuid
+import weakref
+from collections import OrderedDict, namedtuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.utils import _safe_indexing
+from sklearn.utils.validation import column_or_1d
+
+# Caches owned by this process, looked up when a pickled cache arrives in a worker
+_OWNED_CACHES = weakref.WeakValueDictionary()
+# Worker-side copies; kept alive so consecutive tasks in the same worker share them
+_WORKER_CACHES = {}
+
+TransformedFold = namedtuple("TransformedFold", ["preprocessor", "X_fit", "y_fit", "X_val", "y_val"])
+
+
+def _nbytes(data):
+    """Approximate memory footprint of a transformed array or DataFrame."""
+    if isinstance(data, pd.DataFrame):
+        return int(data.memory_usage(index=False, deep=True).sum())
+    if isinstance(data, pd.Series):
+        return int(data.memory_usage(index=False, deep=True))
+    if hasattr(data, "nbytes"):
+        return int(data.nbytes)
+    # Sparse matrices keep their values in `.data`
+    return int(getattr(getattr(data, "data", None), "nbytes", 0))
+
+
+def _index_key(indices):
+    """Hash a vector of row positions."""
+    return joblib.hash(np.ascontiguousarray(indices, dtype=np.intp))
+
+
+def data_fingerprint(X, y):
+    """
+    Fingerprint of the content of `X` and `y` for the keys of a `FoldTransformCache`.
+
+    Hashing the data costs a pass over it, so analyses compute the fingerprint
+    once and pass it to every fold through `transform_fold`.
+    """
+    return joblib.hash(X), joblib.hash(column_or_1d(y))
+
+
+def _lookup_cache(token, max_bytes):
+    """Resolve a pickled cache to the live instance in this process, creating a worker copy if needed."""
+    cache = _OWNED_CACHES.get(token)
+    if cache is None:
+        cache = _WORKER_CACHES.get(token)
+    if cache is None:
+        cache = FoldTransformCache(max_bytes=max_bytes, _token=token)
+        _WORKER_CACHES[token] = cache
+    return cache
+
+
+class FoldTransformCache:
+    """
+    Bounded, least-recently-used cache of preprocessors fitted on cross-validation folds.
+
+    For a given fold the fitted preprocessor and the transformed arrays do not
+    depend on the model hyperparameters, so every k, C value and oversampling
+    variant evaluated on that fold can share one fit. Entries are keyed by a
+    fingerprint of the data (see `data_fingerprint`), a fingerprint of the
+    (unfitted) preprocessor and the row positions of the fold; the least
+    recently used entries are evicted once the transformed arrays exceed
+    `max_bytes`.
+
+    The cache is consulted by `transform_fold`, so analyses use it by
+    preprocessing their folds through that function rather than through a
+    pipeline. When the cache is sent to worker processes with a task, each
+    worker keeps its own copy with the same memory budget.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Memory budget for the cached arrays. Defaults to 256 MiB.
+
+    Example
+    -------
+    >>> cache = FoldTransformCache(max_bytes=64 * 1024 ** 2)
+    >>> results = run_knn_analysis(X_train, y_train, param_grid, preprocessor=preprocessor, sweep=True, cache=cache)
+    >>> cache.hits, cache.misses
+    """
+    def __init__(self, max_bytes=256 * 1024 ** 2, _token=None):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._token = _token or uuid.uuid4().hex
+        if _token is None:
+            _OWNED_CACHES[self._token] = self
+
+    def __reduce__(self):
+        return _lookup_cache, (self._token, self.max_bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def _put(self, key, value, nbytes):
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+
+    def transform(self, preprocessor, X, y, train, test, data_key=None):
+        """
+        Fit `preprocessor` on rows `train` of `X` and transform rows `train` and `test`, reusing a cached fit.
+
+        Parameters
+        ----------
+        preprocessor : sklearn transformer
+            Unfitted preprocessor; a clone is fitted on a cache miss.
+        X : pd.DataFrame or array-like
+            Feature data for all folds.
+        y : array-like
+            Target values for all folds.
+        train, test : array-like of int
+            Row positions of the training part (repeated positions for oversampled
+            rows are allowed) and of the validation part of the fold.
+        data_key : tuple, optional
+            `data_fingerprint(X, y)`, computed once per analysis so that a lookup
+            only hashes the preprocessor and the fold. Defaults to None (computed here).
+
+        Returns
+        -------
+        tuple
+            The fitted preprocessor, the transformed training rows and the
+            transformed validation rows.
+        """
+        y = column_or_1d(y)
+        if data_key is None:
+            data_key = data_fingerprint(X, y)
+        key = (data_key, joblib.hash(clone(preprocessor)), _index_key(train), _index_key(test))
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        fitted = clone(preprocessor)
+        X_fit = fitted.fit_transform(_safe_indexing(X, train), y[train])
+        X_val = fitted.transform(_safe_indexing(X, test))
+        self._put(key, (fitted, X_fit, X_val), _nbytes(X_fit) + _nbytes(X_val))
+        return fitted, X_fit, X_val
+
+
+def transform_fold(X, y, train, test, preprocessor=None, sampler=None, cache=None, data_key=None):
+    """
+    Resample and preprocess one cross-validation fold the way a (sampler, preprocessor, model) pipeline does.
+
+    Parameters
+    ----------
+    X : pd.DataFrame or array-like
+        Feature data for all folds.
+    y : array-like
+        Target values for all folds.
+    train, test : array-like of int
+        Row positions of the training and validation part of the fold.
+    preprocessor : sklearn transformer, optional
+        Unfitted preprocessor fitted on the (resampled) training part.
+    sampler : imblearn sampler, optional
+        Unfitted resampler applied to the training part before preprocessing.
+    cache : FoldTransformCache, optional
+        Cache used to reuse the preprocessor fit across calls on the same fold.
+    data_key : tuple, optional
+        `data_fingerprint(X, y)`, passed on to `cache`. Defaults to None (computed by the cache).
+
+    Returns
+    -------
+    TransformedFold
+        The fitted preprocessor (or None) and the transformed training and validation data.
+    """
+    y = column_or_1d(y)
+    train = np.asarray(train)
+    X_fit, y_fit = _safe_indexing(X, train), y[train]
+
+    if sampler is not None:
+        fitted_sampler = clone(sampler)
+        X_fit, y_fit = fitted_sampler.fit_resample(X_fit, y_fit)
+        # Express the resampled rows as (repeated) positions in X so the fold can be cached
+        resampled = getattr(fitted_sampler, "sample_indices_", None)
+        train = train[resampled] if resampled is not None else None
+
+    X_val, y_val = _safe_indexing(X, test), y[test]
+    if preprocessor is None:
+        return TransformedFold(None, X_fit, y_fit, X_val, y_val)
+
+    if cache is not None and train is not None:
+        fitted, X_fit, X_val = cache.transform(preprocessor, X, y, train, test, data_key)
+    else:
+        fitted = clone(preprocessor)
+        X_fit = fitted.fit_transform(X_fit, y_fit)
+        X_val = fitted.transform(X_val)
+    return TransformedFold(fitted, X_fit, y_fit, X_val, y_val)
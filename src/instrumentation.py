@@ -0,0 +1,210 @@
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+TRACE_FORMAT = "cardiopredict-trace/1"
+# Setting TRACE_DIR_VARIABLE makes every instrumented script write its trace there; PROFILE_VARIABLE=1 adds a cProfile dump
+TRACE_DIR_VARIABLE = "CARDIOPREDICT_TRACE_DIR"
+PROFILE_VARIABLE = "CARDIOPREDICT_PROFILE"
+
+_tracer = None
+
+
+def _peak_rss_mb():
+    """
+    High-water mark of the resident memory of this process; Linux reports it in KiB and macOS in bytes.
+
+    Returns None where the `resource` module is not available, such as on Windows.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+class Tracer:
+    """
+    Records nested spans of one run: wall time, CPU time and peak resident memory of each.
+
+    The CPU time is that of the whole process, so it exceeds the wall time
+    when BLAS or other threads work in parallel. The peak RSS is the
+    process's high-water mark when the span ends; `rss_growth_mb` is how far
+    the span raised it, i.e. the memory the span needed beyond what earlier
+    spans had already used; both are None where the peak RSS is not available
+    (Windows). A span left by an exception records its type as `error`.
+
+    Only spans of this process are recorded: the spans of tasks that
+    `run_tasks` sends to worker processes (`n_jobs` other than None or 1) are
+    lost, and the pool shows up as a single `run_tasks` span.
+    """
+
+    def __init__(self, run_name):
+        self.run_name = run_name
+        self.started = datetime.now(timezone.utc)
+        self.spans = []
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        record = {"name": name, "parent": self._stack[-1]["id"] if self._stack else None, "id": len(self.spans),
+                  "depth": len(self._stack), "attributes": attributes}
+        self.spans.append(record)
+        self._stack.append(record)
+        rss_before = _peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        record["start_seconds"] = wall - self._origin
+        try:
+            yield record
+        except BaseException as error:
+            record["error"] = type(error).__name__
+            raise
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall
+            record["cpu_seconds"] = time.process_time() - cpu
+            record["peak_rss_mb"] = _peak_rss_mb()
+            record["rss_growth_mb"] = None if rss_before is None else record["peak_rss_mb"] - rss_before
+            self._stack.pop()
+
+    def summary(self):
+        """
+        Totals per span name, slowest first.
+
+        Returns
+        -------
+        pd.DataFrame
+            Count, total and mean wall time, total CPU time, the largest peak
+            RSS and RSS growth of the spans of each name, and their share of
+            the wall time of the run (the top-level spans).
+        """
+        # Imported here so that commands that only declare spans start without pandas
+        import pandas as pd
+
+        spans = pd.DataFrame([span for span in self.spans if "wall_seconds" in span])
+        if spans.empty:
+            return pd.DataFrame(columns=['span', 'count', 'wall_seconds', 'mean_wall_seconds', 'cpu_seconds',
+                                         'peak_rss_mb', 'rss_growth_mb', 'share_of_run'])
+        # Without the peak RSS (Windows) the memory columns hold None; summarise them as NaN
+        spans[['peak_rss_mb', 'rss_growth_mb']] = spans[['peak_rss_mb', 'rss_growth_mb']].astype(float)
+        run_seconds = spans.loc[spans['depth'] == 0, 'wall_seconds'].sum()
+        summary = spans.groupby('name', sort=False).agg(
+            count=('wall_seconds', 'size'), wall_seconds=('wall_seconds', 'sum'),
+            mean_wall_seconds=('wall_seconds', 'mean'), cpu_seconds=('cpu_seconds', 'sum'),
+            peak_rss_mb=('peak_rss_mb', 'max'), rss_growth_mb=('rss_growth_mb', 'max'))
+        summary['share_of_run'] = summary['wall_seconds'] / run_seconds if run_seconds else float('nan')
+        return summary.rename_axis('span').reset_index().sort_values('wall_seconds', ascending=False,
+                                                                     ignore_index=True)
+
+    def write(self, directory):
+        """
+        Write the trace of the run as JSON and its summary as CSV into `directory`.
+
+        Returns
+        -------
+        tuple of str
+            Paths of the trace (`<run>-<time>-<pid>.trace.json`) and of the summary (`...summary.csv`).
+        """
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, f"{self.run_name}-{self.started:%Y%m%dT%H%M%S}-{os.getpid()}")
+        trace = {"format": TRACE_FORMAT, "run": self.run_name, "argv": sys.argv,
+                 "started": self.started.isoformat(timespec='seconds'), "spans": self.spans}
+        with open(stem + ".trace.json", 'w') as f:
+            json.dump(trace, f, indent=2, default=str)
+        self.summary().to_csv(stem + ".summary.csv", index=False)
+        return stem + ".trace.json", stem + ".summary.csv"
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Record the enclosed block as a span of the active run, if any.
+
+    Without an active run (see `trace_run`) this does nothing, so library
+    code can be instrumented at no cost to callers that do not trace. Worker
+    processes have no active run, so spans inside the tasks of `run_tasks`
+    are only recorded when the tasks run serially.
+
+    Example
+    -------
+    >>> with span('preprocess.fit', n_rows=len(X_train)):
+    ...     preprocessor.fit(X_train)
+    """
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.span(name, **attributes) as record:
+        yield record
+
+
+@contextmanager
+def trace_run(run_name, directory=None, profile=False):
+    """
+    Trace a run: spans opened inside are recorded and written to `directory` when it ends.
+
+    Parameters
+    ----------
+    run_name : str
+        Name of the run, e.g. the script; it names the output files.
+    directory : str, optional
+        Where the trace and summary are written. Defaults to None (keep the tracer in memory only).
+    profile : bool, optional
+        Also run cProfile and dump its statistics next to the trace (`.prof`). Defaults to False.
+
+    Example
+    -------
+    >>> with trace_run('fit_knn_model', 'results/traces') as tracer:
+    ...     main()
+    >>> tracer.summary()
+    """
+    global _tracer
+    previous, _tracer = _tracer, Tracer(run_name)
+    tracer = _tracer
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        with tracer.span(run_name):
+            yield tracer
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _tracer = previous
+        if directory is not None:
+            trace_path, summary_path = tracer.write(directory)
+            if profiler is not None:
+                profiler.dump_stats(trace_path[:-len(".trace.json")] + ".prof")
+            print(tracer.summary().to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+            print(f"Trace written to {trace_path} and {summary_path}")
+
+
+def instrumented(run_name):
+    """
+    Decorate a script's `main` so that it is traced when `CARDIOPREDICT_TRACE_DIR` is set.
+
+    The trace, summary and (with `CARDIOPREDICT_PROFILE=1`) cProfile dump are
+    written to that directory; without it the script runs untraced.
+
+    Example
+    -------
+    >>> @click.command()
+    ... @instrumented('knn_eval')
+    ... def main(x_test, y_test):
+    ...     ...
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            directory = os.environ.get(TRACE_DIR_VARIABLE)
+            if not directory:
+                return func(*args, **kwargs)
+            with trace_run(run_name, directory, profile=os.environ.get(PROFILE_VARIABLE) == '1'):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,200 @@
+import numpy as np
+from sklearn.utils import Bunch, check_random_state
+from sklearn.utils.validation import column_or_1d
+from src.cv_metrics import ReplayedPredictions
+from src.fast_predictor import FastKNNPredictor
+from src.knn_votes import nearest_rows, weighted_votes
+from src.parallel_cv import resolve_scorers, run_tasks
+
+
+def feature_groups(fast):
+    """
+    Output columns of the compiled feature vector produced by each input column.
+
+    Parameters
+    ----------
+    fast : FastKNNPredictor
+        Compiled predictor.
+
+    Returns
+    -------
+    list of np.ndarray
+        One array of output positions per input column, in input column order.
+    """
+    groups = [[] for _ in fast.feature_names]
+    for position, column in enumerate(fast.numeric_index):
+        groups[column].append(position)
+    for column, mapping in zip(fast.categorical_index, fast.category_maps):
+        groups[column].extend(sorted(p for p in mapping.values() if p is not None))
+    return [np.array(group, dtype=np.intp) for group in groups]
+
+
+def permutation_indices(n_samples, n_repeats, random_seed):
+    """
+    Row orders of one column over the repeats of `sklearn.inspection.permutation_importance`.
+
+    sklearn shuffles its index vector in place and re-indexes the already
+    permuted column at every repeat, so repeat r shows the column in the
+    composed order of all shuffles so far. The same seed gives the same orders.
+
+    Returns
+    -------
+    np.ndarray of shape (n_repeats, n_samples)
+    """
+    random_state = check_random_state(random_seed)
+    shuffling_idx = np.arange(n_samples)
+    order = np.arange(n_samples)
+    orders = np.empty((n_repeats, n_samples), dtype=np.intp)
+    for r in range(n_repeats):
+        random_state.shuffle(shuffling_idx)
+        order = order[shuffling_idx]
+        orders[r] = order
+    return orders
+
+
+def _nearest(distances, n_candidates):
+    """Column positions of the `n_candidates` smallest distances of every row, closest first."""
+    n_fit = distances.shape[1]
+    if n_candidates >= n_fit:
+        nearest = np.broadcast_to(np.arange(n_fit), distances.shape)
+    else:
+        nearest = np.argpartition(distances, n_candidates - 1, axis=1)[:, :n_candidates]
+    order = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(nearest, order, axis=1)
+
+
+def _score_nearest(nearest, fast, y, scorer):
+    """Score the kNN predictions given the nearest training rows of every query, closest first."""
+    votes = weighted_votes(fast.y[nearest], fast.counts[nearest], len(fast.classes_), fast.n_neighbors)
+    y_pred = fast.classes_[np.argmax(votes, axis=1)]
+    return scorer(ReplayedPredictions(fast.classes_, y_pred, votes / fast.n_neighbors), None, y)
+
+
+def _permuted_nearest(Xt, group, order, ranked, ranked_distances, fast, n_candidates, widths):
+    """
+    Nearest training rows of every query after its `group` columns are replaced by those of row `order[i]`.
+
+    The other columns' term alone is a lower bound of the permuted distance.
+    Training rows are therefore visited in increasing order of that term
+    (`ranked`), adding only the permuted columns' term: once the k-th best
+    permuted distance among the first w rows is below the term of row w + 1, no
+    later row can be closer. Queries for which no width in `widths` settles
+    this fall back to a blocked search of all training rows.
+    """
+    permuted = Xt[order][:, group]
+    fit_group = fast.fit_X[:, group]
+    nearest = np.empty((len(Xt), n_candidates), dtype=np.intp)
+    pending = np.arange(len(Xt))
+    for width in widths:
+        if len(pending) == 0:
+            break
+        columns = ranked[pending, :width]
+        differences = fit_group[columns] - permuted[pending][:, None, :]
+        distances = ranked_distances[pending, :width] + np.einsum('qij,qij->qi', differences, differences)
+        best = _nearest(distances, n_candidates)
+        kth = np.take_along_axis(distances, best[:, -1:], axis=1)[:, 0]
+        settled = ranked_distances[pending, width] > kth
+        nearest[pending[settled]] = np.take_along_axis(columns, best, axis=1)[settled]
+        pending = pending[~settled]
+    if len(pending):
+        rows = Xt[pending]
+        rows[:, group] = permuted[pending]
+        nearest[pending] = nearest_rows(fast.fit_X, rows, n_candidates)[1]
+    return nearest
+
+
+def _rank_rows(Xt, fast, group, n_ranked):
+    """The `n_ranked` training rows closest to every query on the columns outside `group`, and their distances."""
+    other = np.setdiff1d(np.arange(Xt.shape[1]), group)
+    distances, ranked = nearest_rows(np.ascontiguousarray(fast.fit_X[:, other]), Xt[:, other], n_ranked)
+    return ranked, distances
+
+
+def _permuted_scores(Xt, group, ranked, ranked_distances, orders, fast, y, scorer, widths):
+    """Scores for the given row orders of one feature, recomputing only that feature's distance terms."""
+    n_candidates = min(fast.n_neighbors, len(fast.fit_X))
+    scores = []
+    for order in orders:
+        nearest = _permuted_nearest(Xt, group, order, ranked, ranked_distances, fast, n_candidates, widths)
+        scores.append(_score_nearest(nearest, fast, y, scorer))
+    return np.array(scores)
+
+
+def knn_permutation_importance(pipeline, X, y, scoring=None, n_repeats=5, random_state=None, n_jobs=None,
+                               repeats_per_task=10):
+    """
+    Permutation importance of a kNN pipeline computed in the transformed feature space.
+
+    Gives the same importances as `sklearn.inspection.permutation_importance`
+    with the same `random_state`, but transforms `X` once. Because a squared
+    Euclidean distance is the sum of the terms of each input feature's output
+    columns, the training rows nearest to every query on the other features
+    are ranked once per feature, and a permutation only adds the shuffled
+    feature's term for these rows; a full neighbour search is needed only for
+    the few queries this does not settle. Neighbours tied in distance at the
+    k-th position may be broken in a different order than in sklearn.
+
+    All searches run in blocks (see `knn_votes.nearest_rows`), so memory grows
+    linearly with `len(X)` and the number of training rows.
+
+    Parameters
+    ----------
+    pipeline : fitted Pipeline or FastKNNPredictor
+        Pipeline accepted by `FastKNNPredictor.from_pipeline`.
+    X : pd.DataFrame
+        Data the importances are computed on.
+    y : array-like
+        Target values of `X`.
+    scoring : str, callable or None, optional
+        Single scorer; None uses accuracy, as the classifier's `score` does.
+    n_repeats : int, optional
+        Number of times each feature is permuted. Defaults to 5.
+    random_state : int, RandomState or None, optional
+        Seed of the permutations. Defaults to None.
+    n_jobs : int, optional
+        Number of worker processes the repeats are spread over. Defaults to None (serial).
+    repeats_per_task : int, optional
+        Number of repeats of one feature scored per worker task. Defaults to 10.
+
+    Returns
+    -------
+    sklearn.utils.Bunch
+        `importances_mean`, `importances_std` and `importances` of shape
+        (n_features, n_repeats), as returned by sklearn.
+
+    Example
+    -------
+    >>> result = knn_permutation_importance(pipe_imb_fit, X_train, y_train, n_repeats=30, random_state=123, n_jobs=-1)
+    >>> result.importances_mean
+    """
+    scorers = resolve_scorers(scoring)
+    if len(scorers) != 1:
+        raise ValueError("knn_permutation_importance supports a single scorer only.")
+    scorer = next(iter(scorers.values()))
+    fast = pipeline if isinstance(pipeline, FastKNNPredictor) else FastKNNPredictor.from_pipeline(pipeline)
+    y = column_or_1d(y)
+
+    # Same seed derivation as sklearn: one seed drawn up front, reused for every feature
+    random_seed = check_random_state(random_state).randint(np.iinfo(np.int32).max + 1)
+    orders = permutation_indices(len(X), n_repeats, random_seed)
+
+    Xt = fast.transform_frame(X)
+    groups = feature_groups(fast)
+    n_candidates = min(fast.n_neighbors, len(fast.fit_X))
+    baseline = _score_nearest(nearest_rows(fast.fit_X, Xt, n_candidates)[1], fast, y, scorer)
+
+    widths = [w for w in (32, 128) if n_candidates <= w < len(fast.fit_X) - 1]
+    tasks = []
+    for group in groups:
+        # One extra ranked row per query for the bound check of the widest pass
+        ranked, ranked_distances = _rank_rows(Xt, fast, group, widths[-1] + 1) if widths else (None, None)
+        tasks.extend((Xt, group, ranked, ranked_distances, orders[start:start + repeats_per_task],
+                      fast, y, scorer, widths) for start in range(0, n_repeats, repeats_per_task))
+    results = run_tasks(_permuted_scores, tasks, n_jobs=n_jobs)
+    n_tasks = len(tasks) // len(groups)
+    scores = np.array([np.concatenate(results[j * n_tasks:(j + 1) * n_tasks]) for j in range(len(groups))])
+
+    importances = baseline - scores
+    return Bunch(importances_mean=np.mean(importances, axis=1),
+                 importances_std=np.std(importances, axis=1),
+                 importances=importances)
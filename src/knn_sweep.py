@@ -0,0 +1,159 @@
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import check_cv
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils.validation import column_or_1d
+from src.cv_metrics import ConfusionMatrixScorer, ReplayedPredictions, confusion_counts, metrics_from_counts
+from src.fold_cache import data_fingerprint, transform_fold
+from src.instrumentation import span
+from src.parallel_cv import apply_scorers, resolve_scorers, run_tasks, shareable
+
+
+def sweep_fold(X, y, train, test, n_neighbors, preprocessor=None, sampler=None, scoring=None, cache=None,
+               data_key=None, weighted=None, engine=None):
+    """
+    Score every k of a kNN sweep on one cross-validation fold with a single neighbour query.
+
+    The fold is resampled and preprocessed exactly as the corresponding
+    pipeline would do it, the neighbours of the validation rows are queried once
+    at the largest k, and the votes for every smaller k are read off the ranked
+    neighbour lists.
+
+    Parameters
+    ----------
+    X : pd.DataFrame or array-like
+        Feature data for all folds.
+    y : array-like
+        Target values for all folds.
+    train, test : array-like of int
+        Row positions of the training and validation part of the fold.
+    n_neighbors : array-like of int
+        Values of k to score.
+    preprocessor : sklearn transformer, optional
+        Unfitted preprocessor; a clone is fitted on the training part of the fold.
+    sampler : imblearn sampler, optional
+        Unfitted resampler applied to the training part before preprocessing.
+    scoring : dict, str, callable or None
+        Scoring strategy, in the same format accepted by `cross_validate`.
+    cache : FoldTransformCache, optional
+        Cache used to reuse the preprocessor fit of this fold across calls.
+    data_key : tuple, optional
+        `data_fingerprint(X, y)` for the keys of `cache`. Defaults to None (computed by the cache).
+    weighted : CountWeightedKNeighborsClassifier, optional
+        Unfitted count-weighted classifier; when given, the votes are taken from
+        its oversampling counts instead of from plain neighbours.
+    engine : kNN classifier, optional
+        Unfitted classifier with a `kneighbors` method, such as
+        `BlockedKNeighborsClassifier`, used for the plain neighbour query. Defaults
+        to None (`NearestNeighbors`).
+
+    Returns
+    -------
+    dict
+        Maps each k to a dict of `{metric_name: score}` for this fold.
+    """
+    scorers = resolve_scorers(scoring)
+    with span('fold.preprocess', n_rows=len(train)):
+        _, X_fit, y_fit, X_val, y_val = transform_fold(X, y, train, test, preprocessor, sampler, cache, data_key)
+
+    with span('fold.predict', n_rows=len(test), n_neighbors=len(n_neighbors)):
+        fold_scores = _score_sweep(X_fit, y_fit, X_val, y_val, n_neighbors, scoring, scorers, weighted, engine)
+    return fold_scores
+
+
+def _score_sweep(X_fit, y_fit, X_val, y_val, n_neighbors, scoring, scorers, weighted, engine):
+    if weighted is not None:
+        knn = clone(weighted).fit(X_fit, y_fit)
+        classes, n_fit = knn.classes_, knn.sample_counts_.sum()
+        fittable = [k for k in n_neighbors if k <= n_fit]
+        votes = knn.vote_counts(X_val, fittable) if fittable else {}
+    else:
+        classes, y_encoded = np.unique(y_fit, return_inverse=True)
+        n_fit = len(y_fit)
+        k_max = min(int(np.max(n_neighbors)), n_fit)
+        search = NearestNeighbors() if engine is None else clone(engine)
+        neigh_ind = search.set_params(n_neighbors=k_max).fit(X_fit, y_fit).kneighbors(X_val, return_distance=False)
+        # cumulative[:, j, c] is the number of the j + 1 nearest neighbours that belong to class c
+        cumulative = np.cumsum(np.eye(len(classes), dtype=np.intp)[y_encoded[neigh_ind]], axis=1)
+        votes = {k: cumulative[:, k - 1, :] for k in n_neighbors if k <= n_fit}
+
+    fittable = [k for k in n_neighbors if k <= n_fit]
+    y_preds = {k: classes[np.argmax(votes[k], axis=1)] for k in fittable}
+    if isinstance(scoring, ConfusionMatrixScorer) and fittable:
+        # Count the confusion matrices of every k in one pass over the stacked predictions
+        counts = confusion_counts(y_val, np.stack([y_preds[k] for k in fittable]), scoring.pos_label)
+        stacked = metrics_from_counts(counts, scoring.metrics)
+        swept = {k: {name: float(values[i]) for name, values in stacked.items()} for i, k in enumerate(fittable)}
+    else:
+        swept = {k: apply_scorers(scorers, ReplayedPredictions(classes, y_preds[k], votes[k] / k), X_val, y_val)
+                 for k in fittable}
+
+    fold_scores = {}
+    for k in n_neighbors:
+        if k > n_fit:
+            # Mirrors cross_validate's error_score=np.nan for an unfittable k
+            names = list(scoring.metrics) if isinstance(scoring, ConfusionMatrixScorer) else list(scorers)
+            fold_scores[k] = {name: np.nan for name in names}
+        else:
+            fold_scores[k] = swept[k]
+    return fold_scores
+
+
+def collect_sweep_scores(fold_results, n_neighbors):
+    """Combine the per-fold output of `sweep_fold` into `cross_validate` style score arrays per k."""
+    return {
+        k: {f"test_{name}": np.array([fold[k][name] for fold in fold_results]) for name in fold_results[0][k]}
+        for k in n_neighbors
+    }
+
+
+def sweep_knn_cv(X, y, n_neighbors, preprocessor=None, sampler=None, scoring=None, cv=20, n_jobs=None, cache=None):
+    """
+    Cross-validate a kNN classifier for every k in `n_neighbors` at the cost of one query per fold.
+
+    Produces the same per-fold test scores as running `cross_validate` on a
+    `(sampler, preprocessor, KNeighborsClassifier(k))` pipeline for each k,
+    apart from ties in distance at the k-th neighbour, which may be broken in a
+    different order.
+
+    Parameters
+    ----------
+    X : pd.DataFrame or array-like
+        Training feature dataset.
+    y : array-like
+        Training target variable.
+    n_neighbors : array-like of int
+        Values of k to evaluate.
+    preprocessor : sklearn transformer, optional
+        Preprocessor fitted on the training part of each fold.
+    sampler : imblearn sampler, optional
+        Resampler applied to the training part of each fold before preprocessing.
+    scoring : dict, str, callable or None
+        Scoring strategy, in the same format accepted by `cross_validate`.
+    cv : int or cross-validation generator, optional
+        Cross-validation splitting strategy. Defaults to 20 folds.
+    n_jobs : int, optional
+        Number of worker processes the folds are spread over. Defaults to None (serial).
+    cache : FoldTransformCache, optional
+        Cache used to reuse each fold's preprocessor fit across calls.
+
+    Returns
+    -------
+    dict
+        Maps each k to a dict of `{f"test_{metric}": np.ndarray of fold scores}`,
+        matching the keys returned by `cross_validate`.
+
+    Example
+    -------
+    >>> scores = sweep_knn_cv(X_train, y_train, [1, 3, 5], preprocessor, scoring={'recall': 'recall'})
+    >>> scores[5]['test_recall'].mean()
+    """
+    y = column_or_1d(y)
+    splitter = check_cv(cv, y, classifier=True)
+    if n_jobs is not None:
+        X = shareable(X)
+    data_key = data_fingerprint(X, y) if cache is not None else None
+    tasks = [(X, y, train, test, n_neighbors, preprocessor, sampler, scoring, cache, data_key)
+             for train, test in splitter.split(X, y)]
+
+    return collect_sweep_scores(run_tasks(sweep_fold, tasks, n_jobs=n_jobs), n_neighbors)
@@ -0,0 +1,123 @@
+import numpy as np
+
+
+def compress_rows(X, y, counts):
+    """
+    Store each distinct (row, label) pair once, summing the counts of identical rows.
+
+    Parameters
+    ----------
+    X : np.ndarray of shape (n_samples, n_features)
+        Training feature matrix.
+    y : np.ndarray of shape (n_samples,)
+        Encoded training labels.
+    counts : np.ndarray of shape (n_samples,)
+        Multiplicity of each row.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The distinct rows, their labels and their summed counts.
+    """
+    rows, inverse = np.unique(np.column_stack([X, y]), axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    unique_counts = np.bincount(inverse, weights=counts, minlength=len(rows))
+    if np.issubdtype(np.asarray(counts).dtype, np.integer):
+        unique_counts = unique_counts.astype(np.intp)
+    return np.ascontiguousarray(rows[:, :-1]), rows[:, -1].astype(np.intp), unique_counts
+
+
+def weighted_votes(neigh_labels, neigh_counts, n_classes, n_neighbors):
+    """
+    Class votes of the k nearest neighbours when each neighbour stands for several identical rows.
+
+    The neighbours are filled into k voting slots in order of distance, so a row
+    with count c takes up to c slots, exactly as c duplicated copies would.
+
+    Parameters
+    ----------
+    neigh_labels : np.ndarray of shape (n_queries, n_candidates)
+        Encoded labels of the nearest distinct rows, closest first.
+    neigh_counts : np.ndarray of shape (n_queries, n_candidates)
+        Counts of the nearest distinct rows.
+    n_classes : int
+        Number of classes.
+    n_neighbors : int
+        Number of voting slots k.
+
+    Returns
+    -------
+    np.ndarray of shape (n_queries, n_classes)
+        Number of the k slots held by each class.
+    """
+    filled_before = np.cumsum(neigh_counts, axis=1) - neigh_counts
+    slots = np.clip(n_neighbors - filled_before, 0, neigh_counts)
+    votes = np.zeros((neigh_labels.shape[0], n_classes), dtype=np.result_type(slots, np.float64))
+    for c in range(n_classes):
+        votes[:, c] = np.where(neigh_labels == c, slots, 0).sum(axis=1)
+    return votes
+
+
+def nearest_rows(fit_X, X, n_neighbors, fit_norms=None, block_size=256, fit_block_size=4096):
+    """
+    The `n_neighbors` rows of `fit_X` nearest to every row of `X`, closest first, in bounded memory.
+
+    Squared distances are computed as |x|^2 - 2 x.t + |t|^2 with one matrix
+    product per block of `block_size` query rows and `fit_block_size`
+    training rows, and only a running list of candidates is kept per query, so
+    peak memory depends on the block sizes and not on the number of training
+    rows. The candidates' distances are then recomputed term by term, and
+    neighbours tied in distance are ordered by row position.
+
+    Parameters
+    ----------
+    fit_X : np.ndarray of shape (n_fit, n_features)
+        Training rows; may be memory-mapped.
+    X : np.ndarray of shape (n_queries, n_features)
+        Query rows.
+    n_neighbors : int
+        Number of neighbours returned; at most `n_fit`.
+    fit_norms : np.ndarray of shape (n_fit,), optional
+        Squared norms of the training rows, if already known.
+    block_size, fit_block_size : int, optional
+        Query and training rows per distance block. Default to 256 and 4096.
+
+    Returns
+    -------
+    tuple of np.ndarray of shape (n_queries, n_neighbors)
+        Squared distances and row positions in `fit_X` of the nearest rows.
+    """
+    n_fit = len(fit_X)
+    n_neighbors = min(n_neighbors, n_fit)
+    # A pool of 2k candidates absorbs the rounding of the matrix product before the exact ordering
+    n_keep = min(2 * n_neighbors, n_fit)
+    if fit_norms is None:
+        fit_norms = np.einsum('ij,ij->i', fit_X, fit_X)
+    distances = np.empty((len(X), n_neighbors))
+    indices = np.empty((len(X), n_neighbors), dtype=np.intp)
+    for start in range(0, len(X), block_size):
+        block = X[start:start + block_size]
+        best = np.full((len(block), n_keep), np.inf)
+        best_ind = np.zeros((len(block), n_keep), dtype=np.intp)
+        for fit_start in range(0, n_fit, fit_block_size):
+            fit_block = fit_X[fit_start:fit_start + fit_block_size]
+            # |x|^2 does not change the order within a row, so it is left out of the search
+            block_distances = block @ fit_block.T
+            block_distances *= -2
+            block_distances += fit_norms[None, fit_start:fit_start + fit_block_size]
+            # Only the queries with a row closer than their current last candidate update their list
+            rows = np.flatnonzero((block_distances < best.max(axis=1)[:, None]).any(axis=1))
+            if not len(rows):
+                continue
+            merged = np.concatenate([best[rows], block_distances[rows]], axis=1)
+            merged_ind = np.concatenate([best_ind[rows], np.broadcast_to(
+                np.arange(fit_start, fit_start + len(fit_block)), (len(rows), len(fit_block)))], axis=1)
+            keep = np.argpartition(merged, n_keep - 1, axis=1)[:, :n_keep]
+            best[rows] = np.take_along_axis(merged, keep, axis=1)
+            best_ind[rows] = np.take_along_axis(merged_ind, keep, axis=1)
+        differences = fit_X[best_ind] - block[:, None, :]
+        exact = np.einsum('ijk,ijk->ij', differences, differences)
+        order = np.lexsort((best_ind, exact), axis=1)[:, :n_neighbors]
+        distances[start:start + block_size] = np.take_along_axis(exact, order, axis=1)
+        indices[start:start + block_size] = np.take_along_axis(best_ind, order, axis=1)
+    return distances, indices
@@ -0,0 +1,152 @@
+import numpy as np
+from scipy.stats import rankdata
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import check_cv
+from sklearn.pipeline import make_pipeline
+from sklearn.utils.validation import column_or_1d
+from src.fold_cache import data_fingerprint, transform_fold
+from src.parallel_cv import run_tasks
+
+
+def logistic_path_fold(preprocessor, X, y, train, test, Cs, class_weight=None, max_iter=100, cache=None,
+                       data_key=None, warm_start=True):
+    """
+    Accuracy of a logistic regression for every C on one fold, walking the C grid with warm starts.
+
+    The preprocessor is fitted once on the training part. The values of C are
+    then solved from the strongest to the weakest regularisation, each solve
+    starting from the coefficients of the previous one unless `warm_start` is False.
+
+    Parameters
+    ----------
+    preprocessor : sklearn transformer
+        Unfitted preprocessor.
+    X : pd.DataFrame
+        Feature data for all folds.
+    y : array-like
+        Target values for all folds.
+    train, test : array-like of int
+        Row positions of the training and validation part of the fold.
+    Cs : array-like of float
+        Inverse regularisation strengths.
+    class_weight : dict or 'balanced', optional
+        Passed to `LogisticRegression`.
+    max_iter : int, optional
+        Passed to `LogisticRegression`. Defaults to 100.
+    cache : FoldTransformCache, optional
+        Cache used to reuse the preprocessor fit of this fold across calls.
+    data_key : tuple, optional
+        `data_fingerprint(X, y)` for the keys of `cache`. Defaults to None (computed by the cache).
+    warm_start : bool, optional
+        If False, every C is solved from scratch, exactly as a grid search does. Defaults to True.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        Training and validation accuracy for each C, in the order of `Cs`.
+    """
+    _, X_fit, y_fit, X_val, y_val = transform_fold(X, y, train, test, preprocessor, cache=cache, data_key=data_key)
+
+    Cs = np.asarray(Cs, dtype=np.float64)
+    train_scores = np.empty(len(Cs))
+    test_scores = np.empty(len(Cs))
+    model = LogisticRegression(class_weight=class_weight, max_iter=max_iter, warm_start=warm_start)
+    for i in np.argsort(Cs):
+        model.set_params(C=Cs[i]).fit(X_fit, y_fit)
+        train_scores[i] = model.score(X_fit, y_fit)
+        test_scores[i] = model.score(X_val, y_val)
+    return train_scores, test_scores
+
+
+class LogisticRegressionPathCV:
+    """
+    Cross-validated choice of C for a (preprocessor, LogisticRegression) pipeline along a warm-started path.
+
+    A drop-in for `GridSearchCV(make_pipeline(preprocessor, LogisticRegression(...)),
+    {"logisticregression__C": Cs}, return_train_score=True)`: it exposes the same
+    `cv_results_`, `best_params_`, `best_score_`, `best_index_` and
+    `best_estimator_` attributes and predicts with the refitted best pipeline.
+    Each fold fits the preprocessor once and solves the C grid with warm starts
+    (see `logistic_path_fold`), so a denser grid costs little extra time. Warm
+    started solutions agree with cold starts up to the solver tolerance.
+
+    Parameters
+    ----------
+    preprocessor : sklearn transformer
+        Unfitted preprocessor.
+    Cs : array-like of float
+        Inverse regularisation strengths to evaluate.
+    class_weight : dict or 'balanced', optional
+        Passed to `LogisticRegression`.
+    cv : int or cross-validation generator, optional
+        Cross-validation splitting strategy. Defaults to 5 folds, like `GridSearchCV`.
+    max_iter : int, optional
+        Passed to `LogisticRegression`. Defaults to 100.
+    n_jobs : int, optional
+        Number of worker processes the folds are spread over. Defaults to None (serial).
+    cache : FoldTransformCache, optional
+        Cache used to reuse each fold's preprocessor fit across calls.
+    warm_start : bool, optional
+        If False, every C is solved from scratch and the results equal those of
+        the grid search. Defaults to True.
+
+    Example
+    -------
+    >>> path = LogisticRegressionPathCV(preprocessor, 10.0 ** np.arange(-4, 6, 0.1), class_weight={0: 1, 1: 6})
+    >>> path.fit(X_train, y_train).best_params_
+    """
+
+    def __init__(self, preprocessor, Cs, class_weight=None, cv=5, max_iter=100, n_jobs=None, cache=None,
+                 warm_start=True):
+        self.preprocessor = preprocessor
+        self.Cs = Cs
+        self.class_weight = class_weight
+        self.cv = cv
+        self.max_iter = max_iter
+        self.n_jobs = n_jobs
+        self.cache = cache
+        self.warm_start = warm_start
+
+    def fit(self, X, y):
+        y = column_or_1d(y)
+        Cs = np.asarray(self.Cs, dtype=np.float64)
+        splitter = check_cv(self.cv, y, classifier=True)
+        data_key = data_fingerprint(X, y) if self.cache is not None else None
+        tasks = [(self.preprocessor, X, y, train, test, Cs, self.class_weight, self.max_iter, self.cache,
+                  data_key, self.warm_start)
+                 for train, test in splitter.split(X, y)]
+        fold_scores = run_tasks(logistic_path_fold, tasks, n_jobs=self.n_jobs)
+        self.n_splits_ = len(fold_scores)
+
+        results = {
+            "param_logisticregression__C": Cs.astype(object),
+            "params": [{"logisticregression__C": C} for C in Cs],
+        }
+        for kind, position in (("test", 1), ("train", 0)):
+            scores = np.array([fold[position] for fold in fold_scores])
+            for split, split_scores in enumerate(scores):
+                results[f"split{split}_{kind}_score"] = split_scores
+            results[f"mean_{kind}_score"] = scores.mean(axis=0)
+            results[f"std_{kind}_score"] = scores.std(axis=0)
+        results["rank_test_score"] = rankdata(-results["mean_test_score"], method="min").astype(np.int32)
+        self.cv_results_ = results
+
+        self.best_index_ = int(results["rank_test_score"].argmin())
+        self.best_params_ = results["params"][self.best_index_]
+        self.best_score_ = float(results["mean_test_score"][self.best_index_])
+        self.best_estimator_ = make_pipeline(
+            clone(self.preprocessor),
+            LogisticRegression(C=Cs[self.best_index_], class_weight=self.class_weight, max_iter=self.max_iter)
+        ).fit(X, y)
+        self.classes_ = self.best_estimator_.classes_
+        return self
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)
+
+    def predict_proba(self, X):
+        return self.best_estimator_.predict_proba(X)
+
+    def score(self, X, y):
+        return self.best_estimator_.score(X, y)
@@ -7,8 +7,10 @@ from sklearn.compose import make_column_transformer
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import GridSearchCV
 from sklearn.metrics import confusion_matrix, classification_report
+from src.logistic_path import LogisticRegressionPathCV
 
-def evaluate_logistic_regression(X_train, y_train, X_test, y_test, numeric_features, categorical_features):
+def evaluate_logistic_regression(X_train, y_train, X_test, y_test, numeric_features, categorical_features, cache=None,
+                                 path=False, Cs=None):
     """
     Evaluate the logistic regression model with hyperparameter tuning using GridSearchCV.
 
@@ -19,10 +21,18 @@ def evaluate_logistic_regression(X_train, y_train, X_test, y_test, numeric_featu
     - y_test (pd.Series): Test data target variable.
     - numeric_features (list): List of column names for numeric features.
     - categorical_features (list): List of column names for categorical features.
+    - cache (FoldTransformCache, optional): Cache of per-fold preprocessor fits shared
+                      by every value of C. Without `path` each C is then still solved
+                      from scratch, giving the GridSearchCV results. Defaults to None.
+    - path (bool, optional): If True, fit the preprocessor once per fold and walk the C grid
+                      with warm starts (LogisticRegressionPathCV) instead of refitting the
+                      whole pipeline for every C with GridSearchCV. Defaults to False.
+    - Cs (array-like, optional): Values of C to evaluate. Defaults to 10 ** -4, ..., 10 ** 5.
 
     Returns:
     - results (dict): Dictionary containing the confusion matrix, classification report,
-                      fitted GridSearchCV object, and GridSearchCV results.
+                      fitted GridSearchCV (or LogisticRegressionPathCV) object, and the
+                      grid search results.
     """
 
     # Create pipeline for numeric features
@@ -36,21 +46,30 @@ def evaluate_logistic_regression(X_train, y_train, X_test, y_test, numeric_featu
         (OneHotEncoder(drop="if_binary", sparse_output=False), categorical_features)
     )
 
+    if Cs is None:
+        Cs = 10.0 ** np.arange(-4, 6, 1)
+
     # Create and fit logistic regression pipeline with grid search
-    pipe = make_pipeline(preprocessor, LogisticRegression(class_weight={0: 1, 1: 6}))
-    param_grid = {"logisticregression__C": 10.0 ** np.arange(-4, 6, 1)}
-    gs = GridSearchCV(pipe, param_grid=param_grid, n_jobs=-1, return_train_score=True)
+    if path or cache is not None:
+        gs = LogisticRegressionPathCV(preprocessor, Cs, class_weight={0: 1, 1: 6}, cache=cache, warm_start=path)
+    else:
+        pipe = make_pipeline(preprocessor, LogisticRegression(class_weight={0: 1, 1: 6}))
+        param_grid = {"logisticregression__C": Cs}
+        gs = GridSearchCV(pipe, param_grid=param_grid, n_jobs=-1, return_train_score=True)
     gs.fit(X_train, y_train)
 
     gs_res = pd.DataFrame(gs.cv_results_)[[
         'rank_test_score', 'param_logisticregression__C', 
         'mean_train_score', 'std_train_score', 'mean_test_score', 'std_test_score']].sort_values('rank_test_score')
 
+    # Predict the test set once for both summaries
+    y_pred = gs.predict(X_test)
+
     # Generate the confusion matrix
-    cm = confusion_matrix(y_test, gs.predict(X_test))
+    cm = confusion_matrix(y_test, y_pred)
 
     # Generate and print classification report
-    report = classification_report(y_test, gs.predict(X_test), zero_division=1)
+    report = classification_report(y_test, y_pred, zero_division=1)
 
     # Returning results in a dictionary
     results = {
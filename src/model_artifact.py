@@ -0,0 +1,112 @@
+import json
+import os
+import pickle
+
+import numpy as np
+from src.fast_predictor import FastKNNPredictor
+
+ARTIFACT_FORMAT = "cardiopredict-knn/1"
+METADATA_FILE = "metadata.json"
+# Arrays written next to the metadata, one raw .npy file each
+ARRAY_FILES = {"fit_X": "fit_X.npy", "y": "y.npy", "counts": "counts.npy"}
+
+
+def save_artifact(model, directory):
+    """
+    Save a fitted kNN pipeline as a directory of JSON metadata and raw `.npy` arrays.
+
+    The preprocessing parameters, class labels and k go into a small
+    `metadata.json`; the training matrix, labels and row counts are stored as
+    `.npy` files so that `load_artifact` can memory-map them.
+
+    Parameters
+    ----------
+    model : fitted Pipeline or FastKNNPredictor
+        Pipeline accepted by `FastKNNPredictor.from_pipeline`, or an already compiled predictor.
+    directory : str
+        Directory the artifact is written to; created if needed.
+
+    Returns
+    -------
+    FastKNNPredictor
+        The compiled predictor that was saved.
+
+    Example
+    -------
+    >>> save_artifact(pipe_imb_fit, 'results/models/imb_knn_artifact')
+    """
+    fast = model if isinstance(model, FastKNNPredictor) else FastKNNPredictor.from_pipeline(model)
+    os.makedirs(directory, exist_ok=True)
+
+    for name, filename in ARRAY_FILES.items():
+        np.save(os.path.join(directory, filename), np.ascontiguousarray(getattr(fast, name)))
+
+    metadata = {
+        "format": ARTIFACT_FORMAT,
+        "feature_names": fast.feature_names,
+        "numeric_index": fast.numeric_index.tolist(),
+        "fill": fast.fill.tolist(),
+        "offset": fast.offset.tolist(),
+        "scale": fast.scale.tolist(),
+        "categorical_index": [int(i) for i in fast.categorical_index],
+        # Stored as pairs so categories keep their JSON type instead of becoming object keys
+        "category_maps": [[[category, position] for category, position in mapping.items()]
+                          for mapping in fast.category_maps],
+        "ignore_unknown": fast.ignore_unknown,
+        "n_output": fast.n_output,
+        "classes": fast.classes_.tolist(),
+        "n_neighbors": fast.n_neighbors,
+    }
+    # Written last, so a directory with metadata always holds complete arrays
+    with open(os.path.join(directory, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return fast
+
+
+def load_artifact(directory, mmap=True):
+    """
+    Load a model saved by `save_artifact`.
+
+    With `mmap=True` the arrays are memory-mapped read-only, so loading takes
+    constant time and every process scoring with the same artifact shares one
+    copy of the training matrix through the operating system's page cache.
+
+    Parameters
+    ----------
+    directory : str
+        Artifact directory.
+    mmap : bool, optional
+        Memory-map the arrays instead of reading them into memory. Defaults to True.
+
+    Returns
+    -------
+    FastKNNPredictor
+    """
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if metadata.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported model artifact format {metadata.get('format')!r}.")
+
+    arrays = {name: np.load(os.path.join(directory, filename), mmap_mode='r' if mmap else None)
+              for name, filename in ARRAY_FILES.items()}
+    return FastKNNPredictor(
+        metadata["feature_names"], metadata["numeric_index"], metadata["fill"], metadata["offset"],
+        metadata["scale"], metadata["categorical_index"],
+        [{category: position for category, position in pairs} for pairs in metadata["category_maps"]],
+        metadata["ignore_unknown"], metadata["n_output"], arrays["fit_X"], arrays["y"], arrays["counts"],
+        np.array(metadata["classes"]), metadata["n_neighbors"])
+
+
+def load_model(model_path):
+    """
+    Load a trained model from a pickle file or from an artifact directory written by `save_artifact`.
+
+    Example
+    -------
+    >>> knn = load_model('results/models/imb_knn_pipeline.pickle')
+    >>> knn = load_model('results/models/imb_knn_artifact')
+    """
+    if os.path.isdir(model_path):
+        return load_artifact(model_path)
+    with open(model_path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,257 @@
+import warnings
+from collections import Counter
+from traceback import format_exc
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.exceptions import FitFailedWarning
+from sklearn.metrics import get_scorer
+from sklearn.utils import _safe_indexing
+from sklearn.utils.validation import column_or_1d
+from src.fold_cache import transform_fold
+from src.instrumentation import span
+
+
+def resolve_scorers(scoring):
+    """
+    Turn a `cross_validate` style scoring argument into a dict of scorers.
+
+    Parameters
+    ----------
+    scoring : dict, list, str, callable or None
+        Scoring strategy. None scores with accuracy, like a classifier's `score`.
+
+    Returns
+    -------
+    dict
+        Maps metric names to scorer callables.
+    """
+    if scoring is None:
+        return {"score": get_scorer("accuracy")}
+    if isinstance(scoring, str):
+        return {scoring: get_scorer(scoring)}
+    if callable(scoring):
+        return {"score": scoring}
+    if isinstance(scoring, dict):
+        return {name: get_scorer(s) if isinstance(s, str) else s for name, s in scoring.items()}
+    return {name: get_scorer(name) for name in scoring}
+
+
+def apply_scorers(scorers, estimator, X, y, error_score='raise', errors=None):
+    """
+    Score `estimator` with every scorer, flattening multi-metric scorers.
+
+    A scorer may return a single number or, like `ConfusionMatrixScorer`, a
+    dict of metrics computed from one prediction; the dict entries are then
+    reported under their own names, as `cross_validate` does.
+
+    Parameters
+    ----------
+    error_score : 'raise' or float, optional
+        Score recorded under the scorer's name when it fails, or 'raise' to raise the error. Defaults to 'raise'.
+    errors : list, optional
+        List the traceback of every failed scorer is appended to.
+
+    Returns
+    -------
+    dict
+        Maps metric names to scores.
+    """
+    scores = {}
+    for name, scorer in scorers.items():
+        try:
+            value = scorer(estimator, X, y)
+        except Exception:
+            if error_score == 'raise':
+                raise
+            value = error_score
+            if errors is not None:
+                errors.append(format_exc())
+        if isinstance(value, dict):
+            scores.update(value)
+        else:
+            scores[name] = value
+    return scores
+
+
+def shareable(X):
+    """
+    Prepare a feature DataFrame to be shared with worker processes.
+
+    joblib memory-maps numeric arrays above its `max_nbytes` threshold instead of
+    pickling them to every worker, but cannot do so for object columns. String
+    columns are therefore converted to pandas categoricals, whose integer codes
+    are memory-mapped like any other numeric block.
+
+    Parameters
+    ----------
+    X : pd.DataFrame or array-like
+        Feature data.
+
+    Returns
+    -------
+    pd.DataFrame or array-like
+        `X` with object columns stored as categoricals.
+    """
+    if not isinstance(X, pd.DataFrame):
+        return X
+    object_columns = X.select_dtypes(include='object').columns
+    if len(object_columns) == 0:
+        return X
+    return X.astype({col: 'category' for col in object_columns})
+
+
+def fit_and_score(estimator, X, y, train, test, scoring=None, return_train_score=False, preprocessor=None,
+                  sampler=None, cache=None, data_key=None, error_score=np.nan):
+    """
+    Fit a clone of `estimator` on one fold and score it, as one iteration of `cross_validate` does.
+
+    With a `preprocessor` or `sampler`, the fold is resampled and preprocessed by
+    `transform_fold` and `estimator` is fitted as the last step of a (sampler,
+    preprocessor, estimator) pipeline, which lets the preprocessor fit be reused
+    from `cache`. The scores equal those of the pipeline.
+
+    As in `cross_validate`, a failed fit or scorer does not raise: the scores
+    it should have given are set to `error_score`, and the tracebacks are
+    returned under `fit_error` or `score_errors`, for `stack_fold_scores` to
+    report in the parent process.
+
+    Parameters
+    ----------
+    estimator : estimator object
+        Unfitted estimator or pipeline.
+    X : pd.DataFrame or array-like
+        Feature data for all folds.
+    y : array-like
+        Target values for all folds.
+    train, test : array-like of int
+        Row positions of the training and validation part of the fold.
+    scoring : dict, list, str, callable or None
+        Scoring strategy, in the same format accepted by `cross_validate`.
+    return_train_score : bool, optional
+        Whether to also score the training part. Defaults to False.
+    preprocessor : sklearn transformer, optional
+        Unfitted preprocessor applied before `estimator`. Defaults to None.
+    sampler : imblearn sampler, optional
+        Unfitted resampler applied to the training part before preprocessing. Defaults to None.
+    cache : FoldTransformCache, optional
+        Cache used to reuse the preprocessor fit of this fold across calls. Defaults to None.
+    data_key : tuple, optional
+        `data_fingerprint(X, y)` for the keys of `cache`. Defaults to None (computed by the cache).
+    error_score : 'raise' or float, optional
+        Score recorded when the fit fails, or 'raise' to raise the error. Defaults to NaN.
+
+    Returns
+    -------
+    dict
+        Maps `test_<metric>` (and `train_<metric>`) to the score on this fold.
+        After a failure it also holds `error_score`, and `fit_error` or
+        `score_errors` with the tracebacks.
+    """
+    scorers = resolve_scorers(scoring)
+    y = column_or_1d(y)
+
+    with span('fold.fit', n_rows=len(train)):
+        try:
+            fold = transform_fold(X, y, train, test, preprocessor, sampler, cache, data_key)
+            fitted = clone(estimator).fit(fold.X_fit, fold.y_fit)
+        except Exception:
+            if error_score == 'raise':
+                raise
+            kinds = ("test", "train") if return_train_score else ("test",)
+            scores = {f"{kind}_{name}": error_score for kind in kinds for name in scorers}
+            scores.update(error_score=error_score, fit_error=format_exc())
+            return scores
+
+    errors = []
+    with span('fold.predict', n_rows=len(test)):
+        scores = {f"test_{name}": value for name, value in
+                  apply_scorers(scorers, fitted, fold.X_val, fold.y_val, error_score, errors).items()}
+        if return_train_score:
+            # A pipeline scores the training rows as given, before resampling; transforming them is part of scoring
+            try:
+                X_fit = _safe_indexing(X, train)
+                if fold.preprocessor is not None:
+                    X_fit = fold.preprocessor.transform(X_fit)
+                train_scores = apply_scorers(scorers, fitted, X_fit, y[train], error_score, errors)
+            except Exception:
+                if error_score == 'raise':
+                    raise
+                errors.append(format_exc())
+                train_scores = dict.fromkeys(scorers, error_score)
+            scores.update({f"train_{name}": value for name, value in train_scores.items()})
+    if errors:
+        scores.update(error_score=error_score, score_errors=errors)
+    return scores
+
+
+def run_tasks(func, tasks, n_jobs=None):
+    """
+    Run `func(*args)` for every argument tuple in `tasks` on a joblib process pool.
+
+    Results are returned in the order of `tasks`, so the output does not depend
+    on `n_jobs`. Large arrays in the arguments are memory-mapped into the
+    workers rather than pickled. The whole pool is traced as one `run_tasks`
+    span; the spans inside the tasks are only recorded when they run serially.
+
+    Parameters
+    ----------
+    func : callable
+        Function executed for each task.
+    tasks : iterable of tuple
+        Positional arguments of each call.
+    n_jobs : int, optional
+        Number of worker processes; -1 uses all cores and None runs serially.
+
+    Returns
+    -------
+    list
+        The return values of `func`, in task order.
+    """
+    tasks = list(tasks)
+    with span('run_tasks', func=func.__name__, n_tasks=len(tasks), n_jobs=n_jobs):
+        return Parallel(n_jobs=n_jobs)(delayed(func)(*args) for args in tasks)
+
+
+def stack_fold_scores(fold_scores):
+    """
+    Combine a list of per-fold score dicts into arrays, like `cross_validate` returns.
+
+    Failures are reported like `cross_validate` does: failed fits with a
+    `FitFailedWarning` when some folds failed and a ValueError when all did,
+    and failed scorers with a UserWarning each.
+    """
+    failed = [scores for scores in fold_scores if "fit_error" in scores]
+    if failed:
+        _warn_or_raise_about_fit_failures(failed, len(fold_scores))
+    for scores in fold_scores:
+        for error in scores.get("score_errors", []):
+            warnings.warn("Scoring failed. The score on this train-test partition for these parameters will be set "
+                          f"to {scores['error_score']}. Details: \n{error}", UserWarning)
+
+    # A multi-metric scorer names its metrics only in the folds it scored; elsewhere the fold has its error score
+    metadata = ("error_score", "fit_error", "score_errors")
+    scored = [scores for scores in fold_scores if "error_score" not in scores] or \
+        [scores for scores in fold_scores if "fit_error" not in scores]
+    keys = dict.fromkeys(key for scores in scored for key in scores if key not in metadata)
+    return {key: np.array([scores.get(key, scores.get("error_score")) for scores in fold_scores]) for key in keys}
+
+
+def _warn_or_raise_about_fit_failures(failed, n_fits):
+    """Report failed fits with the messages of `cross_validate`."""
+    delimiter = "-" * 80 + "\n"
+    summary = "\n".join(f"{delimiter}{n} fits failed with the following error:\n{error}"
+                        for error, n in Counter(scores["fit_error"] for scores in failed).items())
+    if len(failed) == n_fits:
+        raise ValueError(f"\nAll the {n_fits} fits failed.\n"
+                         "It is very likely that your model is misconfigured.\n"
+                         "You can try to debug the error by setting error_score='raise'.\n\n"
+                         f"Below are more details about the failures:\n{summary}")
+    warnings.warn(f"\n{len(failed)} fits failed out of a total of {n_fits}.\n"
+                  "The score on these train-test partitions for these parameters"
+                  f" will be set to {failed[0]['error_score']}.\n"
+                  "If these failures are not expected, you can try to debug them "
+                  "by setting error_score='raise'.\n\n"
+                  f"Below are more details about the failures:\n{summary}", FitFailedWarning)
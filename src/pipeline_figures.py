@@ -0,0 +1,228 @@
+import os
+from math import pi
+
+import altair as alt
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from sklearn.metrics import ConfusionMatrixDisplay
+from src.instrumentation import span
+
+NUMERICAL_FEATURES = ['AGE', 'FRW', 'SBP', 'DBP', 'CHOL', 'CIG']
+
+
+def plot_eda(df, plot_to, data_to):
+    """
+    Save the exploratory charts of the training data and the list of numerical features.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Training data with the `disease` target.
+    plot_to : str
+        Directory the six charts are written to.
+    data_to : str
+        Directory `numerical_features.csv` is written to.
+    """
+    df = df.assign(disease_label=df['disease'].replace({1: 'CVD', 0: 'non-CVD'}))
+
+    # 1.distribution of target feature
+    target_chart = alt.Chart(df).mark_bar().encode(
+    x='disease_label:O',
+    y=alt.Y('count():Q', axis=alt.Axis(title='Count')),
+    text=alt.Text('count():Q')
+    ).properties(
+    height=200,
+    width=200
+    )
+
+    target_chart = target_chart + target_chart.mark_text(
+    align='center',
+    baseline='bottom',
+    dy=-5
+    )
+
+    with span('chart', figure='distribution_of_disease_occurrence'):
+        target_chart.save(os.path.join(plot_to, "distribution_of_disease_occurrence.png"),
+                  scale_factor=2.0)
+
+    # 2. Distribution of numerical features
+    numerical_features = NUMERICAL_FEATURES
+
+    numerical_chart = alt.Chart(df).transform_calculate(
+        disease_label="datum.disease == 1 ? '1: have heart disease' : '0: do not have heart disease'"
+    ).mark_bar(opacity=0.8).encode(
+        alt.X(alt.repeat('repeat'), type='quantitative', bin=alt.Bin(maxbins=20)),
+        alt.Y('count()', stack=None),
+        color=alt.Color('disease_label:N', legend=alt.Legend(title="Disease Status"))
+    ).properties(
+        width=200,
+        height=200
+    ).repeat(
+        repeat=numerical_features,
+        columns=3
+    )
+    with span('chart', figure='age_and_health_indicators_exhibit_elevated_heart_disease'):
+        numerical_chart.save(os.path.join(plot_to, "age_and_health_indicators_exhibit_elevated_heart_disease.png"),
+                  scale_factor=2.0)
+    pd.DataFrame(numerical_features, columns=['numerical_features']).to_csv(os.path.join(data_to, "numerical_features.csv"), index=False)
+
+    # 3. correlation matrix
+    # Calculate correlation matrix
+    correlation_matrix = df.select_dtypes(include=['number', 'bool']).corr('spearman')
+    # Create a figure and axis in Matplotlib
+    fig, ax = plt.subplots(figsize=(10, 8))
+    # Create a mask for the upper triangle
+    mask = np.triu(np.ones_like(correlation_matrix, dtype=bool))
+    # Draw the heatmap using Matplotlib's `imshow` function
+    cax = ax.imshow(correlation_matrix, interpolation="nearest", cmap='Blues')
+    fig.colorbar(cax)
+    # Set ticks
+    ax.set_xticks(np.arange(len(correlation_matrix.columns)))
+    ax.set_yticks(np.arange(len(correlation_matrix.columns)))
+    ax.set_xticklabels(correlation_matrix.columns)
+    ax.set_yticklabels(correlation_matrix.columns)
+    # Rotate the tick labels and set their alignment
+    plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
+    # Loop over data dimensions and create text annotations
+    for i in range(len(correlation_matrix.columns)):
+        for j in range(len(correlation_matrix.columns)):
+            if not mask[i, j]:
+                text = ax.text(j, i, round(correlation_matrix.iloc[i, j], 2),
+                            ha="center", va="center", color="black")
+
+    with span('chart', figure='correlation_matrix_of_the_features'):
+        plt.savefig(os.path.join(plot_to, "correlation_matrix_of_the_features.png"), dpi=300)
+    plt.close(fig)
+
+    # 4. Create pairwise scatter plot with independent scales
+    base = alt.Chart(df).mark_point(opacity=0.5, size=10)
+    pairwise_chart = base.encode(
+        x=alt.X(alt.repeat("row"), type='quantitative', scale=alt.Scale(zero=False)),
+        y=alt.Y(alt.repeat("column"), type='quantitative', scale=alt.Scale(zero=False)),
+        color='disease_label:N'
+    ).properties(
+        width=150,
+        height=150
+    ).repeat(
+        row=numerical_features,
+        column=numerical_features
+    ).resolve_scale(
+        x='independent',
+        y='independent'
+    )
+
+    with span('chart', figure='pairwise_scatter_plot_matrix'):
+        pairwise_chart.save(os.path.join(plot_to, "pairwise_scatter_plot_matrix.png"),
+                  scale_factor=2.0)
+
+    #5. Distribution of the variable sex
+    sex_chart = alt.Chart(df).mark_bar().encode(
+        y="sex",
+        x= "count()",
+        color = "disease_label:N"
+    )
+    with span('chart', figure='distribution_of_the_sex_variable'):
+        sex_chart.save(os.path.join(plot_to, "distribution_of_the_sex_variable.png"),
+                  scale_factor=2.0)
+
+    #6. Boxplot of Specified Numerical Features
+    fig = plt.figure(figsize=(10, 6))
+    plt.boxplot([df['AGE'], df['FRW'], df['SBP'], df['DBP'], df['CHOL'], df['CIG']],
+                labels=numerical_features)
+    plt.ylabel('Values')
+    plt.xlabel('Numerical Features')
+    with span('chart', figure='boxplot_of_specified_numerical_features'):
+        plt.savefig(os.path.join(plot_to, "boxplot_of_specified_numerical_features"), dpi=600)
+    plt.close(fig)
+
+
+def plot_knn_selection(df_cv_knn, figure_results_to):
+    """Save the cross-validated accuracy and recall of each k (`select_knn`) as line charts with error bars."""
+    accuracy_chart = alt.Chart(df_cv_knn).mark_line(point=True).encode(
+        x=alt.X('n_neighbors:O', title='Neighbors', axis=alt.Axis(labelAngle=0)),
+        y=alt.Y('mean_accuracy:Q', title='Accuracy'),
+        color='kNN model:N',
+    )
+
+    error_bars_acc = alt.Chart(df_cv_knn).mark_errorbar(extent='ci').encode(
+        x=alt.X('n_neighbors:O', title=''),
+        y=alt.Y('mean_accuracy:Q', title=''),
+        yError='std_accuracy:Q',
+        color='kNN model:N'
+    )
+
+    # Create the line chart for recall with error bars
+    recall_chart = alt.Chart(df_cv_knn).mark_line(point=True).encode(
+        x=alt.X('n_neighbors:O', title='Neighbors', axis=alt.Axis(labelAngle=0)),
+        y=alt.Y('mean_recall:Q', title='Recall'),
+        color='kNN model:N',
+    )
+
+    error_bars_rec = alt.Chart(df_cv_knn).mark_errorbar(extent='ci').encode(
+        x=alt.X('n_neighbors:O', title=''),
+        y=alt.Y('mean_recall:Q', title=''),
+        yError='std_recall:Q',
+        color='kNN model:N'
+    )
+
+    # Combine the charts side by side
+    accuracy_chart = accuracy_chart + error_bars_acc
+    recall_chart = recall_chart + error_bars_rec
+
+    # Save the chart
+    with span('chart', figure='accuracy_lines'):
+        accuracy_chart.save(os.path.join(figure_results_to, "accuracy_lines.png"),
+                  scale_factor=2.0)
+    with span('chart', figure='recall_lines'):
+        recall_chart.save(os.path.join(figure_results_to, "recall_lines.png"),
+                  scale_factor=2.0)
+
+
+def plot_feature_importance(importances_df, figure_results_to):
+    """Save the scaled feature importances (`knn_feature_importance`) as a radar chart."""
+    # Number of variables
+    categories = list(importances_df['Feature'])
+    N = len(categories)
+
+    # We need to repeat the first value to close the circular graph:
+    values = importances_df['Importance'].values.flatten().tolist()
+    values += values[:1]
+    categories += categories[:1]
+
+    # What will be the angle of each axis in the plot? (we divide the plot / number of variable)
+    angles = [n / float(N) * 2 * pi for n in range(N)]
+    angles += angles[:1]
+
+    # Initialise the spider plot
+    fig = plt.figure()
+    ax = plt.subplot(111, polar=True)
+
+    # Draw one axe per variable + add labels
+    plt.xticks(angles, categories, color='grey', size=8)
+
+    # Draw ylabels
+    ax.set_rlabel_position(0)
+    plt.yticks([0.25, 0.5, 0.75], ["0.25", "0.5", "0.75"], color="grey", size=7)
+    plt.ylim(0, 1)
+
+    # Plot data
+    ax.plot(angles, values, linewidth=1, linestyle='solid')
+
+    # Fill area
+    ax.fill(angles, values, 'b', alpha=0.1)
+
+    # Save figure
+    with span('chart', figure='radar_feature_importance'):
+        plt.savefig(os.path.join(figure_results_to, "radar_feature_importance.png"), bbox_inches='tight')
+    plt.close(fig)
+
+
+def plot_confusion_matrix(cm, figures_path):
+    """Save a confusion matrix (`evaluate_knn`) of the test set as a heatmap."""
+    disp = ConfusionMatrixDisplay(confusion_matrix=cm)
+    fig, ax = plt.subplots(figsize=(10,10))
+    disp.plot(ax=ax)
+    with span('chart', figure='knn_test_data_confusion_matrix'):
+        plt.savefig(os.path.join(figures_path, 'knn_test_data_confusion_matrix.png'))
+    plt.close(fig)
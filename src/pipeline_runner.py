@@ -0,0 +1,327 @@
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+STATE_FORMAT = "cardiopredict-pipeline/1"
+DATA_URL = "https://paulblanche.com/files/framingham.csv"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+Stage = namedtuple('Stage', ['name', 'command', 'inputs', 'outputs'])
+Stage.__doc__ = """
+One step of the pipeline: a script run with fixed arguments.
+
+`command` is the argument list after the Python interpreter, starting with
+the script. `inputs` are the files it reads and `outputs` the files it
+writes; a stage depends on the stages whose outputs it reads.
+"""
+
+
+def pipeline_stages(raw_file='data/raw/framingham.csv', processed_dir='data/processed', results_dir='results',
+                    url=DATA_URL):
+    """
+    The stages of the Makefile, from the download to the evaluation, as a DAG.
+
+    Parameters
+    ----------
+    raw_file : str, optional
+        Where the raw data is downloaded to. Defaults to 'data/raw/framingham.csv'.
+    processed_dir : str, optional
+        Directory of the split and preprocessed data. Defaults to 'data/processed'.
+    results_dir : str, optional
+        Directory with the `models`, `tables` and `figures` results. Defaults to 'results'.
+    url : str, optional
+        URL of the raw data. Defaults to the Framingham data set used by the Makefile.
+
+    Returns
+    -------
+    list of Stage
+    """
+    models, tables, figures = (os.path.join(results_dir, name) for name in ('models', 'tables', 'figures'))
+
+    def processed(name):
+        return os.path.join(processed_dir, name)
+
+    X_train, y_train, X_test, y_test = (processed(f"{name}.csv") for name in ('X_train', 'y_train', 'X_test', 'y_test'))
+    preprocessor = os.path.join(models, 'preprocessor.pickle')
+    pipeline = os.path.join(models, 'imb_knn_pipeline.pickle')
+    eda_figures = ['distribution_of_disease_occurrence.png', 'age_and_health_indicators_exhibit_elevated_heart_disease.png',
+                   'correlation_matrix_of_the_features.png', 'pairwise_scatter_plot_matrix.png',
+                   'distribution_of_the_sex_variable.png', 'boxplot_of_specified_numerical_features.png']
+    return [
+        Stage('download', ['scripts/download_data.py', '--url', url, '--filepath', raw_file], [], [raw_file]),
+        Stage('split_preprocess',
+              ['scripts/split_preprocess_data.py', '--input-file', raw_file, '--split-dir', processed_dir,
+               '--preprocess-dir', processed_dir, '--preprocessor-to', models],
+              [raw_file],
+              [processed('train_data.csv'), processed('test_data.csv'), X_train, y_train, X_test, y_test,
+               processed('X_train_transformed.csv'), processed('X_test_transformed.csv'), preprocessor,
+               os.path.splitext(raw_file)[0] + '.split.npz']),
+        Stage('eda', ['scripts/eda.py', f"--df={processed('train_data.csv')}", f"--plot-to={figures}",
+                      f"--data-to={processed_dir}"],
+              [processed('train_data.csv')],
+              [os.path.join(figures, name) for name in eda_figures] + [processed('numerical_features.csv')]),
+        Stage('select_knn_model',
+              ['scripts/select_knn_model.py', f"--x_train={X_train}", f"--y_train={y_train}",
+               f"--preprocessor={preprocessor}", f"--table-results-to={tables}", f"--figure-results-to={figures}"],
+              [X_train, y_train, preprocessor],
+              [os.path.join(tables, 'result_knn.csv'), os.path.join(figures, 'accuracy_lines.png'),
+               os.path.join(figures, 'recall_lines.png')]),
+        Stage('fit_knn_model',
+              ['scripts/fit_knn_model.py', f"--x_train={X_train}", f"--y_train={y_train}",
+               f"--preprocessor={preprocessor}", f"--pipeline-to={models}", f"--figure-results-to={figures}"],
+              [X_train, y_train, preprocessor],
+              [pipeline, os.path.join(figures, 'radar_feature_importance.png')]),
+        Stage('knn_eval',
+              ['scripts/knn_eval.py', f"--x_test={X_test}", f"--y_test={y_test}", f"--trained_knn_model={pipeline}",
+               f"--results-dir={results_dir}"],
+              [X_test, y_test, pipeline],
+              [os.path.join(figures, 'knn_test_data_confusion_matrix.png'),
+               os.path.join(tables, 'knn_test_confusion_matrix.csv'),
+               os.path.join(tables, 'knn_test_data_classification_report.csv')]),
+    ]
+
+
+def stage_dependencies(stages):
+    """
+    Map each stage name to the names of the stages that write its inputs.
+
+    Raises ValueError when two stages write the same file or the stages form a cycle.
+    """
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            if path in producers:
+                raise ValueError(f"{path} is written by both {producers[path]} and {stage.name}.")
+            producers[path] = stage.name
+    dependencies = {stage.name: sorted({producers[path] for path in stage.inputs if path in producers})
+                    for stage in stages}
+
+    # Kahn's algorithm; stages left over lie on a cycle
+    remaining = {name: set(parents) for name, parents in dependencies.items()}
+    while remaining:
+        ready = [name for name, parents in remaining.items() if not parents]
+        if not ready:
+            raise ValueError(f"The stages {sorted(remaining)} depend on each other in a cycle.")
+        for name in ready:
+            del remaining[name]
+        for parents in remaining.values():
+            parents.difference_update(ready)
+    return dependencies
+
+
+def code_files(script, root=REPO_ROOT):
+    """
+    The script and the `src` modules it imports, directly or through other `src` modules.
+
+    Only the repository's own code is followed; installed packages are not
+    hashed, so upgrading them does not invalidate the cache.
+    """
+    files, pending = set(), [os.path.join(root, script)]
+    while pending:
+        path = pending.pop()
+        if path in files or not os.path.exists(path):
+            continue
+        files.add(path)
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module and node.module.split('.')[0] == 'src':
+                modules = [node.module] if node.module != 'src' else [f"src.{alias.name}" for alias in node.names]
+            elif isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names if alias.name.split('.')[0] == 'src']
+            else:
+                continue
+            pending.extend(os.path.join(root, *module.split('.')) + '.py' for module in modules)
+    return sorted(os.path.relpath(path, root) for path in files)
+
+
+class PipelineState:
+    """
+    Content hashes remembered between runs, stored as JSON.
+
+    File hashes are memoised by size and modification time, so unchanged
+    files are not read again; a file that is only touched is re-hashed once
+    and, having the same content, keeps its stages up to date.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files, self.stages = {}, {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get("format") == STATE_FORMAT:
+                self.files, self.stages = state["files"], state["stages"]
+
+    def file_hash(self, path):
+        """SHA-256 of the file at `path`, or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        memo = self.files.get(path)
+        if memo is not None and memo["size"] == stat.st_size and memo["mtime_ns"] == stat.st_mtime_ns:
+            return memo["sha256"]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 ** 2), b''):
+                digest.update(block)
+        self.files[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def stage_key(self, stage, root=REPO_ROOT):
+        """Hash of everything a stage's outputs depend on: its command, the content of its inputs and its code."""
+        key = {"command": stage.command,
+               "inputs": {path: self.file_hash(os.path.join(root, path)) for path in stage.inputs},
+               "code": {path: self.file_hash(os.path.join(root, path)) for path in code_files(stage.command[0], root)}}
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def is_current(self, stage, key, root=REPO_ROOT):
+        """Whether the stage last ran with `key` and its outputs are still the files it wrote."""
+        record = self.stages.get(stage.name)
+        if record is None or record["key"] != key:
+            return False
+        return all(self.file_hash(os.path.join(root, path)) == record["outputs"].get(path) for path in stage.outputs)
+
+    def record(self, stage, key, root=REPO_ROOT):
+        self.stages[stage.name] = {"key": key, "outputs": {path: self.file_hash(os.path.join(root, path))
+                                                           for path in stage.outputs}}
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump({"format": STATE_FORMAT, "files": self.files, "stages": self.stages}, f, indent=2)
+
+
+def _run_command(stage, root):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, *stage.command], cwd=root, capture_output=True, text=True)
+    return completed, time.perf_counter() - start
+
+
+def run_pipeline(stages=None, targets=None, max_workers=3, force=False, dry_run=False, root=REPO_ROOT,
+                 state_path=None, verbose=False):
+    """
+    Run the stages whose inputs, command or code changed, independent stages concurrently.
+
+    A stage is skipped when the hash of its command, the content of its
+    inputs and the code of its script (with the `src` modules it imports)
+    matches its last successful run and its outputs are unchanged since. A
+    stage without inputs, such as the download, only runs when an output is
+    missing. A stage starts as soon as the stages it depends on have
+    finished; the stages after a failed one are not run.
+
+    Parameters
+    ----------
+    stages : list of Stage, optional
+        The pipeline. Defaults to `pipeline_stages()`.
+    targets : list of str, optional
+        Names of the stages to bring up to date, with the stages they depend on. Defaults to all.
+    max_workers : int, optional
+        Number of stages run at the same time. Defaults to 3 (EDA, model selection and fitting).
+    force : bool, optional
+        Run every selected stage even if it is up to date. Defaults to False.
+    dry_run : bool, optional
+        Only report which stages would run. Defaults to False.
+    root : str, optional
+        Directory the stage paths and commands are relative to. Defaults to the repository.
+    state_path : str, optional
+        JSON file of the hashes of the last runs. Defaults to `<root>/.pipeline_state.json`.
+    verbose : bool, optional
+        Print each stage's status and the output of the scripts. Defaults to False.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per selected stage with its `status` (`ran`, `up to date`,
+        `would run`, `failed` or `not run`) and the seconds it ran for.
+
+    Example
+    -------
+    >>> report = run_pipeline(targets=['knn_eval'], max_workers=3)
+    >>> report[report['status'] == 'failed']
+    """
+    stages = pipeline_stages() if stages is None else stages
+    dependencies = stage_dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [name for name in targets or [] if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}; choose from {list(by_name)}.")
+
+    selected, pending = set(), list(targets or by_name)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(dependencies[name])
+    order = [stage.name for stage in stages if stage.name in selected]
+
+    state = PipelineState(state_path or os.path.join(root, '.pipeline_state.json'))
+    report = {name: {"stage": name, "status": "not run", "seconds": 0.0} for name in order}
+    finished, started, would_run = set(), set(), set()
+
+    def schedule(executor, running):
+        """Settle or submit every stage whose dependencies have finished, until none is left."""
+        settled = True
+        while settled:
+            settled = False
+            for name in order:
+                parents = dependencies[name]
+                if name in started or not all(parent in finished for parent in parents):
+                    continue
+                started.add(name)
+                stage = by_name[name]
+                # The inputs are hashed once the stages that write them have finished
+                key = state.stage_key(stage, root)
+                if stage.inputs:
+                    current = state.is_current(stage, key, root)
+                else:
+                    current = all(os.path.exists(os.path.join(root, path)) for path in stage.outputs)
+                if dry_run:
+                    # A stage after one that would run is assumed to run too
+                    current = current and not would_run.intersection(parents)
+                if current and not force:
+                    report[name]["status"] = "up to date"
+                elif dry_run:
+                    report[name]["status"] = "would run"
+                    would_run.add(name)
+                else:
+                    running[executor.submit(_run_command, stage, root)] = name
+                    continue
+                finished.add(name)
+                settled = True
+                if verbose:
+                    print(f"{name:<20} {report[name]['status']}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        schedule(executor, running)
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                completed, seconds = future.result()
+                report[name]["seconds"] = seconds
+                if completed.returncode == 0:
+                    report[name]["status"] = "ran"
+                    state.record(by_name[name], state.stage_key(by_name[name], root), root)
+                    finished.add(name)
+                else:
+                    report[name]["status"] = "failed"
+                if verbose:
+                    print(f"{name:<20} {report[name]['status']} in {seconds:.1f} s")
+                    print(completed.stdout + completed.stderr, end='')
+            schedule(executor, running)
+    if not dry_run:
+        state.save()
+    return pd.DataFrame(list(report.values()), columns=['stage', 'status', 'seconds'])
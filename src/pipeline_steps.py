@@ -0,0 +1,219 @@
+import os
+
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import make_pipeline as make_imb_pipeline
+from sklearn import config_context
+from sklearn.base import clone
+from sklearn.metrics import classification_report, confusion_matrix
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.utils import Bunch
+from src.ann_knn import ApproximateKNeighborsClassifier, compare_to_exact
+from src.cv_metrics import ConfusionMatrixScorer
+from src.data_cache import save_frame
+from src.fold_cache import FoldTransformCache
+from src.instrumentation import span
+from src.knn_importance import knn_permutation_importance
+from src.preprocessor import build_preprocessor
+from src.run_knn_analysis import run_knn_analysis
+from src.schema import TARGET
+from src.split_index import make_split_index
+from src.weighted_knn import CountWeightedKNeighborsClassifier
+
+KNN_GRID = {"n_neighbors": np.arange(1, 40, 2)}
+N_NEIGHBORS = 9
+
+
+def split_and_preprocess(df, seed=123, n_folds=None, transform=True):
+    """
+    Split the data into train and test sets and fit the preprocessor on the training set.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw data with the target column, e.g. loaded with the Framingham schema.
+    seed : int, optional
+        Seed of the global NumPy state the split is drawn from. Defaults to 123.
+    n_folds : int, optional
+        Number of cross-validation folds stored in the split index. Defaults to None.
+    transform : bool, optional
+        Also transform the train and test features. Defaults to True.
+
+    Returns
+    -------
+    Bunch
+        `index` (the split index), `train` and `test` (the rows with the
+        target), `X_train`, `y_train`, `X_test`, `y_test`, `preprocessor`
+        (unfitted, as the model stages take it), `fitted_preprocessor` and the
+        transformed `X_train_transformed` and `X_test_transformed` (None without
+        `transform`). The frames are renumbered from 0, as they are when read
+        back from their CSV files.
+    """
+    # The seeded global state selects the same rows as the split script always has
+    np.random.seed(seed)
+    with span('split', n_rows=len(df)):
+        index = make_split_index(len(df), test_size=0.2, n_folds=n_folds)
+    train = df.iloc[index["train"]].reset_index(drop=True)
+    test = df.iloc[index["test"]].reset_index(drop=True)
+    X_train, y_train = train.drop(columns=TARGET), train[TARGET]
+    X_test, y_test = test.drop(columns=TARGET), test[TARGET]
+
+    preprocessor = build_preprocessor(X_train.select_dtypes(include='number').columns.tolist(), ["sex"])
+    X_train_transformed = X_test_transformed = None
+    with config_context(transform_output="pandas"):
+        with span('preprocess.fit', n_rows=len(X_train)):
+            fitted = clone(preprocessor).fit(X_train)
+        if transform:
+            with span('preprocess.transform', n_rows=len(X_train) + len(X_test)):
+                X_train_transformed = pd.DataFrame(fitted.transform(X_train), columns=fitted.get_feature_names_out())
+                X_test_transformed = pd.DataFrame(fitted.transform(X_test), columns=fitted.get_feature_names_out())
+    return Bunch(index=index, train=train, test=test, X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test,
+                 preprocessor=preprocessor, fitted_preprocessor=fitted, X_train_transformed=X_train_transformed,
+                 X_test_transformed=X_test_transformed)
+
+
+def save_split(split, split_dir, preprocess_dir):
+    """
+    Write the frames of `split_and_preprocess` as CSV files with their columnar caches.
+
+    `split_dir` receives `train_data`, `test_data`, `X_train`, `X_test`,
+    `y_train` and `y_test`; `preprocess_dir` the transformed features, if any.
+    """
+    os.makedirs(split_dir, exist_ok=True)
+    os.makedirs(preprocess_dir, exist_ok=True)
+    for name in ('train', 'test'):
+        save_frame(split[name], os.path.join(split_dir, f'{name}_data.csv'))
+    for name in ('X_train', 'X_test', 'y_train', 'y_test'):
+        save_frame(split[name], os.path.join(split_dir, f'{name}.csv'))
+    for name in ('X_train_transformed', 'X_test_transformed'):
+        if split[name] is not None:
+            save_frame(split[name], os.path.join(preprocess_dir, f'{name}.csv'))
+
+
+def select_knn(X_train, y_train, preprocessor, seed=123, sweep=True, n_jobs=None, engine=None):
+    """
+    Cross-validate kNN models over the k grid, with and without oversampling.
+
+    Parameters
+    ----------
+    X_train, y_train : pd.DataFrame and pd.Series
+        Training data.
+    preprocessor : sklearn transformer
+        Unfitted preprocessor.
+    seed : int, optional
+        Seed of the oversampling. Defaults to 123.
+    sweep : bool, optional
+        Query the neighbours once per fold for the whole grid. Defaults to True.
+    n_jobs : int, optional
+        Number of worker processes for the cross-validation tasks. Defaults to None.
+    engine : kNN classifier, optional
+        Unfitted classifier with a `kneighbors` method for the neighbour search,
+        such as `BlockedKNeighborsClassifier`. Defaults to None (sklearn's).
+
+    Returns
+    -------
+    pd.DataFrame
+        The cross-validation results of `run_knn_analysis`, one row per k and model.
+    """
+    # One prediction per fold; every metric is computed from its confusion matrix
+    scoring = ConfusionMatrixScorer({'accuracy': 'accuracy', 'precision': 'precision', 'recall': 'recall',
+                                     'f1_score': 'f1'}, pos_label=1)
+    with span('run_knn_analysis', sweep=sweep):
+        return run_knn_analysis(X_train, y_train, KNN_GRID, seed=seed, preprocessor=preprocessor, scoring=scoring,
+                                sweep=sweep, n_jobs=n_jobs, cache=FoldTransformCache(), engine=engine)
+
+
+def fit_knn(X_train, y_train, preprocessor, oversampling='duplicate', neighbours='exact', n_trees=10, leaf_size=64):
+    """
+    Fit the final kNN pipeline (k = 9) with the minority class oversampled.
+
+    Parameters
+    ----------
+    X_train, y_train : pd.DataFrame and pd.Series
+        Training data.
+    preprocessor : sklearn transformer
+        Unfitted preprocessor; it is fitted in place as a step of the pipeline.
+    oversampling : {'duplicate', 'weighted'}, optional
+        Copy minority rows, or store each row once with an oversampling count. Defaults to 'duplicate'.
+    neighbours : {'exact', 'approximate'}, optional
+        Search all training rows or a random projection forest. Defaults to 'exact'.
+    n_trees, leaf_size : int, optional
+        Parameters of the approximate search. Default to 10 and 64.
+
+    Returns
+    -------
+    Pipeline
+        The fitted pipeline.
+    """
+    if neighbours == 'approximate' and oversampling == 'weighted':
+        raise ValueError("The approximate neighbour search works with duplicate oversampling only.")
+    if oversampling == 'weighted':
+        pipeline = make_pipeline(preprocessor, CountWeightedKNeighborsClassifier(n_neighbors=N_NEIGHBORS,
+                                                                                 sampling_strategy='minority'))
+    else:
+        if neighbours == 'approximate':
+            knn = ApproximateKNeighborsClassifier(n_neighbors=N_NEIGHBORS, n_trees=n_trees, leaf_size=leaf_size,
+                                                  random_state=123)
+        else:
+            knn = KNeighborsClassifier(n_neighbors=N_NEIGHBORS)
+        pipeline = make_imb_pipeline(RandomOverSampler(sampling_strategy='minority'), preprocessor, knn)
+    with span('model.fit', n_rows=len(X_train)):
+        return pipeline.fit(X_train, y_train)
+
+
+def knn_feature_importance(pipeline, X_train, y_train, n_repeats=30, n_jobs=None):
+    """
+    Permutation importance of each preprocessed feature, scaled so that the largest is 1.
+
+    For a pipeline with the approximate search, the importances are those of
+    the exact search on the same training rows.
+
+    Returns
+    -------
+    pd.DataFrame
+        `Feature` and `Importance` columns.
+    """
+    preprocessor = pipeline[-2]
+    if isinstance(pipeline[-1], ApproximateKNeighborsClassifier):
+        pipeline = make_pipeline(preprocessor, pipeline[-1].exact_estimator())
+    with span('permutation_importance', n_repeats=n_repeats):
+        importance = knn_permutation_importance(pipeline, X_train, y_train, n_repeats=n_repeats, random_state=123,
+                                                n_jobs=n_jobs)
+    importances = pd.DataFrame({'Feature': [name.split('__')[-1] for name in preprocessor.get_feature_names_out()],
+                                'Importance': importance.importances_mean})
+    importances['Importance'] /= importances['Importance'].max()
+    return importances
+
+
+def evaluate_knn(model, X_test, y_test):
+    """
+    Predict the test set and summarise the errors.
+
+    Returns
+    -------
+    Bunch
+        `y_pred`, the `confusion_matrix` array and frame (`confusion_frame`),
+        the classification `report` as a frame and, for a model with the
+        approximate search, its `agreement` with the exact search (else None).
+    """
+    with span('model.predict', n_rows=len(X_test)):
+        y_pred = model.predict(X_test)
+    cm = confusion_matrix(y_test, y_pred)
+    report = classification_report(y_test, y_pred, output_dict=True, zero_division=1)
+    agreement = None
+    if isinstance(getattr(model, 'steps', [[None, model]])[-1][1], ApproximateKNeighborsClassifier):
+        with span('compare_to_exact', n_rows=len(X_test)):
+            agreement = compare_to_exact(model, X_test, y_test)
+    return Bunch(y_pred=y_pred, confusion_matrix=cm, confusion_frame=pd.DataFrame(cm),
+                 report=pd.DataFrame(report).transpose(), agreement=agreement)
+
+
+def save_evaluation(evaluation, tables_path):
+    """Write the confusion matrix, classification report and approximate-search agreement of `evaluate_knn`."""
+    os.makedirs(tables_path, exist_ok=True)
+    evaluation.confusion_frame.to_csv(os.path.join(tables_path, 'knn_test_confusion_matrix.csv'))
+    evaluation.report.to_csv(os.path.join(tables_path, 'knn_test_data_classification_report.csv'))
+    if evaluation.agreement is not None:
+        evaluation.agreement.to_csv(os.path.join(tables_path, 'knn_test_ann_agreement.csv'), index=False)
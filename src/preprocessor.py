@@ -0,0 +1,304 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from src.schema import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+
+def build_preprocessor(numeric_features=NUMERIC_FEATURES, categorical_features=CATEGORICAL_FEATURES):
+    """
+    The Framingham preprocessor: median imputation and scaling of the numeric
+    features, and one-hot encoding of the categorical ones.
+
+    Parameters
+    ----------
+    numeric_features : list of str, optional
+        Numeric columns. Defaults to the numeric features of `src.schema.FRAMINGHAM_SCHEMA`.
+    categorical_features : list of str, optional
+        Categorical columns. Defaults to the categorical features of the schema (`sex`).
+
+    Returns
+    -------
+    ColumnTransformer
+        Unfitted preprocessor.
+    """
+    numeric_pipe = make_pipeline(
+        SimpleImputer(strategy="median"), StandardScaler()
+    )
+    return make_column_transformer(
+        (numeric_pipe, list(numeric_features)),
+        (OneHotEncoder(drop="if_binary", sparse_output=False), list(categorical_features))
+    )
+
+
+class QuantileSketch:
+    """
+    Mergeable summary of a numeric column for quantiles in bounded memory.
+
+    The sketch keeps the distinct values seen with their counts, which gives
+    exact quantiles as long as there are at most `max_size` of them (clinical
+    measurements are mostly recorded at a fixed precision). Beyond that,
+    neighbouring values are merged pairwise into their weighted mean, so a
+    quantile is off by at most the gap between the merged values.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Largest number of (value, count) pairs kept. Defaults to 4096.
+    """
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.values = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.exact = True
+
+    @property
+    def n(self):
+        return int(self.counts.sum())
+
+    def update(self, values):
+        """Add the non-missing entries of `values`."""
+        values = np.asarray(values, dtype=np.float64)
+        values, counts = np.unique(values[~np.isnan(values)], return_counts=True)
+        return self._add(values, counts)
+
+    def merge(self, other):
+        """Add the values summarised by another sketch, e.g. one built by another worker."""
+        self.exact = self.exact and other.exact
+        return self._add(other.values, other.counts)
+
+    def _add(self, values, counts):
+        values, inverse = np.unique(np.concatenate([self.values, values]), return_inverse=True)
+        self.values = values
+        self.counts = np.bincount(inverse, weights=np.concatenate([self.counts, counts])).astype(np.int64)
+        while len(self.values) > self.max_size:
+            self._compact()
+        return self
+
+    def _compact(self):
+        size = len(self.values) // 2 * 2
+        pairs = self.counts[:size].reshape(-1, 2)
+        weighted = (self.values[:size] * self.counts[:size]).reshape(-1, 2).sum(axis=1)
+        self.values = np.concatenate([weighted / pairs.sum(axis=1), self.values[size:]])
+        self.counts = np.concatenate([pairs.sum(axis=1), self.counts[size:]])
+        self.exact = False
+
+    def median(self):
+        """Median of the values, averaging the two middle values like `np.median`; NaN if there are none."""
+        n = self.n
+        if n == 0:
+            return np.nan
+        cumulative = np.cumsum(self.counts)
+        low, high = np.searchsorted(cumulative, [(n - 1) // 2, n // 2], side='right')
+        return (self.values[low] + self.values[high]) / 2
+
+
+class RunningMoments:
+    """
+    Count, mean and sum of squared deviations of a column, updated chunk by chunk.
+
+    Two summaries are combined with the pairwise update of Chan et al., which
+    is exact up to rounding and lets chunks be summarised independently.
+    """
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, values):
+        """Add the non-missing entries of `values`."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.merge(RunningMoments(len(values), values.mean(), ((values - values.mean()) ** 2).sum()))
+        return self
+
+    def merge(self, other):
+        n = self.n + other.n
+        if other.n:
+            delta = other.mean - self.mean
+            self.mean += delta * other.n / n
+            self.m2 += other.m2 + delta ** 2 * self.n * other.n / n
+            self.n = n
+        return self
+
+    @property
+    def var(self):
+        return self.m2 / self.n if self.n else np.nan
+
+
+def _steps(transformer):
+    return [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+
+
+def _check_supported(preprocessor):
+    """Raise if the preprocessor uses steps the streaming fit cannot reproduce."""
+    for _, transformer, _ in preprocessor.transformers:
+        if transformer in ('drop', 'passthrough'):
+            continue
+        steps = _steps(transformer)
+        kinds = [type(step) for step in steps]
+        if kinds == [OneHotEncoder]:
+            encoder = steps[0]
+            if encoder.min_frequency is not None or encoder.max_categories is not None \
+                    or not isinstance(encoder.categories, str):
+                raise ValueError("Only OneHotEncoder with automatic categories can be fitted in chunks.")
+        elif kinds in ([SimpleImputer, StandardScaler], [SimpleImputer], [StandardScaler]):
+            for step in steps:
+                if isinstance(step, SimpleImputer) and (step.strategy not in ('mean', 'median')
+                                                        or step.add_indicator or step.keep_empty_features):
+                    raise ValueError("Only mean or median SimpleImputer can be fitted in chunks.")
+                if isinstance(step, StandardScaler) and not (step.with_mean and step.with_std):
+                    raise ValueError("Only StandardScaler with centring and scaling can be fitted in chunks.")
+        else:
+            raise ValueError(f"Cannot fit {transformer!r} in chunks.")
+
+
+def fit_in_chunks(preprocessor, chunks, max_sketch_size=4096):
+    """
+    Fit a Framingham-style `ColumnTransformer` on data that arrives in chunks.
+
+    The chunks are read twice. The first pass collects, per numeric column, a
+    `QuantileSketch` for the median and the `RunningMoments` for the mean of
+    the observed values, and the set of categories of every categorical column.
+    The second pass imputes each chunk with these statistics and feeds it to
+    `StandardScaler.partial_fit`.
+
+    The `ColumnTransformer` itself is fitted by sklearn on the leading chunks,
+    with the categories of the whole data passed to the encoders; only the
+    imputers' `statistics_` are then set from the first pass. The result is a
+    regular fitted `ColumnTransformer`: it pickles, transforms and reports
+    feature names like one fitted in memory, and has the same statistics up to
+    rounding (and up to the sketch error for columns with more than
+    `max_sketch_size` distinct values).
+
+    Supported transformers are `SimpleImputer` (mean or median) followed by
+    `StandardScaler`, either one alone, and `OneHotEncoder` with automatic
+    categories, as built by `build_preprocessor`.
+
+    Parameters
+    ----------
+    preprocessor : ColumnTransformer
+        Unfitted preprocessor.
+    chunks : callable
+        Returns a new iterable of pd.DataFrame chunks of the training data on
+        each call, e.g. `lambda: pd.read_csv(path, chunksize=100000)`.
+    max_sketch_size : int, optional
+        Size of the median sketches. Defaults to 4096.
+
+    Returns
+    -------
+    ColumnTransformer
+        A fitted copy of `preprocessor`.
+
+    Example
+    -------
+    >>> chunks = lambda: pd.read_csv('data/processed/X_train.csv', chunksize=100000)
+    >>> preprocessor = fit_in_chunks(build_preprocessor(numeric_features), chunks)
+    """
+    _check_supported(preprocessor)
+    numeric = [column for _, transformer, columns in preprocessor.transformers
+               if transformer not in ('drop', 'passthrough') and not isinstance(_steps(transformer)[0], OneHotEncoder)
+               for column in columns]
+    categorical = [column for _, transformer, columns in preprocessor.transformers
+                   if transformer not in ('drop', 'passthrough') and isinstance(_steps(transformer)[0], OneHotEncoder)
+                   for column in columns]
+
+    sketches = {column: QuantileSketch(max_sketch_size) for column in numeric}
+    moments = {column: RunningMoments() for column in numeric}
+    categories = {column: set() for column in categorical}
+    n_rows = 0
+    for chunk in chunks():
+        n_rows += len(chunk)
+        for column in numeric:
+            values = chunk[column].to_numpy(dtype=np.float64)
+            sketches[column].update(values)
+            moments[column].update(values)
+        for column in categorical:
+            categories[column].update(chunk[column].dropna().unique().tolist())
+    if n_rows == 0:
+        raise ValueError("No training data to fit the preprocessor on.")
+
+    fitted = clone(preprocessor)
+    for name, transformer, columns in preprocessor.transformers:
+        if transformer not in ('drop', 'passthrough') and isinstance(_steps(transformer)[0], OneHotEncoder):
+            fitted.set_params(**{f"{name}__categories": [sorted(categories[column]) for column in columns]})
+
+    # sklearn fits the structure on the leading chunks, once every numeric column has an observed value
+    chunk_iter = iter(chunks())
+    head, unobserved = [], set(numeric)
+    for chunk in chunk_iter:
+        head.append(chunk)
+        unobserved -= {column for column in numeric if chunk[column].notna().any()}
+        if not unobserved:
+            break
+    else:
+        raise ValueError("Every numeric column needs observed values to impute from.")
+    head = pd.concat(head)
+    fitted.fit(head)
+
+    scalers = []
+    for _, transformer, columns in fitted.transformers_:
+        if transformer in ('drop', 'passthrough') or isinstance(_steps(transformer)[0], OneHotEncoder):
+            continue
+        columns = list(columns)
+        imputer = None
+        for step in _steps(transformer):
+            if isinstance(step, SimpleImputer):
+                step.statistics_ = np.array([sketches[column].median() if step.strategy == 'median'
+                                             else moments[column].mean for column in columns])
+                imputer = step
+            else:
+                scalers.append((columns, imputer, step))
+
+    # Refit the scalers on the data imputed with the statistics of the whole data
+    for columns, imputer, scaler in scalers:
+        scaler.fit(head[columns] if imputer is None else imputer.transform(head[columns]))
+    for chunk in chunk_iter:
+        if chunk.empty:
+            continue
+        for columns, imputer, scaler in scalers:
+            scaler.partial_fit(chunk[columns] if imputer is None else imputer.transform(chunk[columns]))
+    return fitted
+
+
+def transform_csv(preprocessor, input_file, output_file, chunksize=100000, drop_columns=()):
+    """
+    Transform a CSV file chunk by chunk with a fitted preprocessor and write the result as CSV.
+
+    Parameters
+    ----------
+    preprocessor : fitted ColumnTransformer
+        Preprocessor, e.g. from `fit_in_chunks`.
+    input_file : str
+        CSV file with the feature columns.
+    output_file : str
+        CSV file the transformed features are written to, with the preprocessor's feature names.
+    chunksize : int, optional
+        Number of rows transformed at a time. Defaults to 100000.
+    drop_columns : list of str, optional
+        Columns of the input to leave out, such as the target. Defaults to none.
+
+    Returns
+    -------
+    int
+        Number of rows written.
+    """
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    columns = preprocessor.get_feature_names_out()
+    n_rows = 0
+    for number, chunk in enumerate(pd.read_csv(input_file, chunksize=chunksize)):
+        transformed = pd.DataFrame(np.asarray(preprocessor.transform(chunk.drop(columns=list(drop_columns)))),
+                                   columns=columns)
+        transformed.to_csv(output_file, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+        n_rows += len(chunk)
+    return n_rows
@@ -2,18 +2,109 @@
 # author: Doris Wang
 # date: 2023-11-30
 
-import requests
+import csv
+import hashlib
+import io
 import os
-import pandas as pd
+import re
+
+import requests
+
+# Bytes read from the network and written to disk at a time
+CHUNK_SIZE = 1024 ** 2
+# Bytes of the start of a file that are enough to validate it, even without two complete lines
+HEAD_SIZE = 64 * 1024
+# Responses worth retrying later: rate limiting and server-side failures
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class TransientDownloadError(ValueError):
+    """A download failure that may succeed when retried, such as a server error or a cut-off transfer."""
+
+
+def _hash_file(filepath, chunk_size=CHUNK_SIZE):
+    """SHA-256 object updated with the contents of `filepath`, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest
+
 
-def download_data(url, filepath):
+def _total_size(response, offset):
+    """Full size of the remote file announced by the response, or None if unknown."""
+    if response.status_code == 206:
+        match = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+        return int(match.group(1)) if match else None
+    length = response.headers.get('Content-Length')
+    return offset + int(length) if length is not None else None
+
+
+def validate_csv_head(head, complete=False):
+    """
+    Check the first bytes of a CSV file without parsing the whole file.
+
+    The complete lines of `head` must hold a header and at least one data row,
+    and every one of those rows must have as many fields as the header.
+
+    Parameters
+    ----------
+    head : bytes
+        The start of the file, typically its first `HEAD_SIZE` bytes or its first two lines.
+    complete : bool, optional
+        Whether `head` is the whole file, so that its last line is not cut off. Defaults to False.
+
+    Returns
+    -------
+    list of str
+        The column names from the header.
+
+    Raises
+    ------
+    ValueError
+        If the file is empty, has no data rows, or its first rows do not match the header.
+    """
+    text = head.decode('utf-8', errors='replace')
+    # The last line of a chunk may be cut off, unless the chunk is the whole file
+    lines = text.splitlines()
+    if not complete and not text.endswith(('\n', '\r')):
+        lines = lines[:-1]
+    rows = [row for row in csv.reader(io.StringIO('\n'.join(lines))) if row]
+    if not rows:
+        raise ValueError("The downloaded file is empty.")
+    header, data = rows[0], rows[1:]
+    if not data:
+        raise ValueError("The downloaded file has a header but no data rows.")
+    for number, row in enumerate(data, start=2):
+        if len(row) != len(header):
+            raise ValueError(f"Row {number} of the downloaded file has {len(row)} fields, "
+                             f"but the header has {len(header)}.")
+    return header
+
+
+def _validate_or_discard(head, complete, part_path):
+    """Validate the start of a download, removing the partial file if it is not a valid CSV."""
+    try:
+        validate_csv_head(head, complete)
+    except ValueError:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+
+def download_data(url, filepath, sha256=None, chunk_size=CHUNK_SIZE, resume=True, timeout=60, session=None):
     """
     Downloads a CSV file from a given URL and saves it to a specified local path.
 
-    This function checks if the URL is valid and points to a CSV file, creates the
-    directory if it doesn't exist, downloads the file, and verifies that the 
-    downloaded CSV is not empty. Raises errors for invalid URL, non-CSV content, 
-    or empty files.
+    The file is streamed to `<filepath>.part` in chunks of `chunk_size` bytes,
+    so memory use does not grow with the file size, and is renamed to
+    `filepath` once complete. If an earlier download was interrupted, the
+    partial file is resumed with an HTTP Range request; servers that ignore
+    the range send the whole file, which then replaces the partial one. The
+    start of the file is buffered until it holds the header and a data row,
+    `HEAD_SIZE` bytes or the whole file, and is then validated whatever the
+    `chunk_size`; the SHA-256 of the whole file is checked against `sha256`
+    when given.
 
     Parameters:
     ----------
@@ -22,13 +113,30 @@ def download_data(url, filepath):
     filepath : str
         The local path where the downloaded file will be saved. If the directory
         in the path doesn't exist, it will be created.
+    sha256 : str, optional
+        Expected hexadecimal SHA-256 digest of the file. Defaults to None (not checked).
+    chunk_size : int, optional
+        Number of bytes read and written at a time. Defaults to 1 MiB.
+    resume : bool, optional
+        Continue a partial download left by an earlier call. Defaults to True.
+    timeout : float, optional
+        Seconds to wait for the server to respond or send data. Defaults to 60.
+    session : requests.Session, optional
+        Session whose pooled connections are used for the request. Defaults to None (a one-off request).
+
+    Returns:
+    -------
+    str
+        The SHA-256 digest of the downloaded file.
 
     Raises:
     ------
     ValueError:
         - If the URL is invalid or inaccessible.
         - If the URL does not point to a CSV file.
-        - If the downloaded CSV file is empty.
+        - If the downloaded CSV file is empty or its header and first rows do not match.
+        - If the download is incomplete or its SHA-256 digest differs from `sha256`.
+        Server errors and incomplete downloads raise the `TransientDownloadError` subclass.
 
     Example:
     -------
@@ -36,29 +144,73 @@ def download_data(url, filepath):
     File downloaded successfully and saved to ./data/my_data.csv
 
     """
-    response = requests.get(url)
-    
-    # Check if URL exists, if not raise an error
-    if response.status_code != 200:
-        raise ValueError('The URL provided does not exist or is inaccessible.')
-    
-    # Check if the URL points to a CSV file, if not raise an error
-    content_type = response.headers.get('Content-Type')
-    if 'csv' not in content_type:
-        raise ValueError('The URL provided does not point to a valid CSV file.')
-
     # Check if the directory exists, if not, create it
     directory = os.path.dirname(filepath)
-    if not os.path.isdir(directory):
+    if directory and not os.path.isdir(directory):
         os.makedirs(directory, exist_ok=True)
 
-    # Write the CSV file to the directory
-    with open(filepath, 'wb') as file:
-        file.write(response.content)
+    part_path = filepath + '.part'
+    offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+    validated = False
+    head = b''
 
-    # Verify that the CSV is not empty
-    df = pd.read_csv(filepath)
-    if df.empty:
-        raise ValueError("The downloaded file is empty.")
+    with (session or requests).get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416 and offset:
+            # A range starting at the end of the file means the partial download is already complete;
+            # a partial file longer than the remote one is stale and is downloaded again
+            match = re.match(r'bytes \*/(\d+)', response.headers.get('Content-Range', ''))
+            if match and int(match.group(1)) != offset:
+                os.remove(part_path)
+                return download_data(url, filepath, sha256, chunk_size, resume=False, timeout=timeout,
+                                     session=session)
+            total = offset
+            digest = _hash_file(part_path, chunk_size)
+        else:
+            if response.status_code in TRANSIENT_STATUS:
+                raise TransientDownloadError(f'The server answered with status {response.status_code}.')
+            # Check if URL exists, if not raise an error
+            if response.status_code not in (200, 206):
+                raise ValueError('The URL provided does not exist or is inaccessible.')
+
+            # Check if the URL points to a CSV file, if not raise an error
+            content_type = response.headers.get('Content-Type', '')
+            if 'csv' not in content_type:
+                raise ValueError('The URL provided does not point to a valid CSV file.')
+
+            # The server ignored the range and sends the whole file: start over
+            if response.status_code == 200:
+                offset = 0
+            total = _total_size(response, offset)
+            digest = _hash_file(part_path, chunk_size) if offset else hashlib.sha256()
+
+            # Write the CSV file chunk by chunk; an interruption leaves the .part file to resume from
+            with open(part_path, 'ab' if offset else 'wb') as file:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    # Fail once the header and a data row arrived rather than after downloading a whole error page
+                    if not offset and not validated:
+                        head += chunk
+                        if head.count(b'\n') >= 2 or len(head) >= HEAD_SIZE:
+                            _validate_or_discard(head, False, part_path)
+                            validated = True
+                            head = b''
+                    file.write(chunk)
+                    digest.update(chunk)
+
+    size = os.path.getsize(part_path)
+    if total is not None and size != total:
+        raise TransientDownloadError(f"The download is incomplete: {size} of {total} bytes received.")
+
+    # A resumed or short download is checked from the start of the file on disk
+    if not validated:
+        with open(part_path, 'rb') as file:
+            head = file.read(HEAD_SIZE)
+        _validate_or_discard(head, len(head) == size, part_path)
+
+    if sha256 is not None and digest.hexdigest() != sha256.lower():
+        os.remove(part_path)
+        raise ValueError(f"The SHA-256 of the downloaded file is {digest.hexdigest()}, expected {sha256}.")
 
+    os.replace(part_path, filepath)
     print(f"File downloaded successfully and saved to {filepath}")
+    return digest.hexdigest()
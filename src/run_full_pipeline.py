@@ -0,0 +1,89 @@
+import os
+import pickle
+
+from sklearn.base import clone
+from sklearn.utils import Bunch
+from src.data_cache import load_frame
+from src.instrumentation import span
+from src.pipeline_figures import plot_confusion_matrix, plot_eda, plot_feature_importance, plot_knn_selection
+from src.pipeline_runner import DATA_URL
+from src.pipeline_steps import (evaluate_knn, fit_knn, knn_feature_importance, save_evaluation, save_split,
+                                select_knn, split_and_preprocess)
+from src.read_csv import download_data
+from src.schema import FRAMINGHAM_SCHEMA
+from src.split_index import index_path_for, save_split_index
+
+
+def run_full_pipeline(raw_file='data/raw/framingham.csv', processed_dir='data/processed', results_dir='results',
+                      url=DATA_URL, seed=123, n_jobs=None, plots=True):
+    """
+    Run every stage of the Makefile, from the download to the evaluation, in this process.
+
+    The data is read once and the split frames, preprocessor and fitted
+    pipeline are handed from stage to stage in memory; the files the scripts
+    write are still written, so the report and later runs of single scripts
+    find them.
+
+    Parameters
+    ----------
+    raw_file : str, optional
+        Path of the raw data; it is downloaded from `url` if missing. Defaults to 'data/raw/framingham.csv'.
+    processed_dir : str, optional
+        Directory of the split and preprocessed data. Defaults to 'data/processed'.
+    results_dir : str, optional
+        Directory the `models`, `tables` and `figures` are written to. Defaults to 'results'.
+    url : str, optional
+        URL of the raw data. Defaults to the Framingham data set used by the Makefile.
+    seed : int, optional
+        Random seed of the split and of the oversampling in the model selection. Defaults to 123.
+    n_jobs : int, optional
+        Number of worker processes for the cross-validation and permutation importance. Defaults to None.
+    plots : bool, optional
+        Also draw the figures. Defaults to True.
+
+    Returns
+    -------
+    Bunch
+        The `split` (see `split_and_preprocess`), the model selection
+        `cv_results`, the fitted `pipeline`, its feature `importances` and
+        its `evaluation` on the test set.
+
+    Example
+    -------
+    >>> results = run_full_pipeline()
+    >>> results.evaluation.report
+    """
+    models, tables, figures = (os.path.join(results_dir, name) for name in ('models', 'tables', 'figures'))
+    for directory in (models, tables, figures):
+        os.makedirs(directory, exist_ok=True)
+
+    if not os.path.exists(raw_file):
+        with span('download', url=url):
+            download_data(url, raw_file)
+
+    split = split_and_preprocess(load_frame(raw_file, schema=FRAMINGHAM_SCHEMA), seed=seed)
+    save_split_index(split.index, raw_file, index_path_for(raw_file))
+    save_split(split, processed_dir, processed_dir)
+    with open(os.path.join(models, "preprocessor.pickle"), 'wb') as f:
+        pickle.dump(split.preprocessor, f)
+    if plots:
+        plot_eda(split.train, figures, processed_dir)
+
+    # Each model stage gets its own unfitted preprocessor, as it would from preprocessor.pickle
+    cv_results = select_knn(split.X_train, split.y_train, clone(split.preprocessor), seed=seed, n_jobs=n_jobs)
+    cv_results.to_csv(os.path.join(tables, "result_knn.csv"), index=False)
+    if plots:
+        plot_knn_selection(cv_results, figures)
+
+    pipeline = fit_knn(split.X_train, split.y_train, clone(split.preprocessor))
+    with open(os.path.join(models, "imb_knn_pipeline.pickle"), 'wb') as f:
+        pickle.dump(pipeline, f)
+    importances = knn_feature_importance(pipeline, split.X_train, split.y_train, n_jobs=n_jobs)
+    if plots:
+        plot_feature_importance(importances, figures)
+
+    evaluation = evaluate_knn(pipeline, split.X_test, split.y_test)
+    save_evaluation(evaluation, tables)
+    if plots:
+        plot_confusion_matrix(evaluation.confusion_matrix, figures)
+    return Bunch(split=split, cv_results=cv_results, pipeline=pipeline, importances=importances, evaluation=evaluation)
@@ -1,10 +1,13 @@
 import pandas as pd
 import numpy as np
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn.model_selection import cross_validate
+from sklearn.model_selection import cross_validate, check_cv
 from sklearn.pipeline import make_pipeline
+from sklearn.utils.validation import column_or_1d
+from src.fold_cache import data_fingerprint
+from src.parallel_cv import fit_and_score, run_tasks, shareable, stack_fold_scores
 
-def run_hyperparameter_knn(X_train, y_train, param_grid={}, preprocessor=None):
+def run_hyperparameter_knn(X_train, y_train, param_grid={}, preprocessor=None, n_jobs=None, cache=None):
     """
     Perfrom Hyperparameter Optimization for k-Nearest Neighbors on the given data.
 
@@ -22,6 +25,14 @@ def run_hyperparameter_knn(X_train, y_train, param_grid={}, preprocessor=None):
     preprocessor : ColumnTransformer object
         A callable preprocessor function that transforms the training data.
 
+    n_jobs : int, optional
+        Number of worker processes the (k, fold) tasks are spread over; -1 uses
+        all cores. The results are identical to a serial run. Defaults to None (serial).
+
+    cache : FoldTransformCache, optional
+        Cache of per-fold preprocessor fits shared by every k; the folds are then
+        evaluated as in the `n_jobs` mode. Defaults to None.
+
     Returns
     -------
     pandas.DataFrame
@@ -44,10 +55,16 @@ def run_hyperparameter_knn(X_train, y_train, param_grid={}, preprocessor=None):
         "std_train_score": [],
     }
 
+    if n_jobs is not None or cache is not None:
+        all_scores = _cross_validate_grid(X_train, y_train, param_grid["n_neighbors"], preprocessor, n_jobs, cache)
+
     for k in param_grid["n_neighbors"]:
-        knn = KNeighborsClassifier(n_neighbors=k)
-        pipe = make_pipeline(preprocessor, knn)
-        scores = cross_validate(pipe, X_train, y_train, return_train_score=True)
+        if n_jobs is not None or cache is not None:
+            scores = all_scores[k]
+        else:
+            knn = KNeighborsClassifier(n_neighbors=k)
+            pipe = make_pipeline(preprocessor, knn)
+            scores = cross_validate(pipe, X_train, y_train, return_train_score=True)
 
         results_dict["n_neighbors"].append(k)
         results_dict["mean_cv_score"].append(np.mean(scores["test_score"]))
@@ -59,4 +76,19 @@ def run_hyperparameter_knn(X_train, y_train, param_grid={}, preprocessor=None):
     return results_df
 
 
+def _cross_validate_grid(X_train, y_train, n_neighbors, preprocessor, n_jobs, cache):
+    """Run the 5-fold cross-validation of every k as independent (k, fold) tasks on a process pool."""
+    y = column_or_1d(y_train)
+    X = shareable(X_train)
+    folds = list(check_cv(5, y, classifier=True).split(X, y))
+    # Hash the data once rather than on every cache lookup
+    data_key = data_fingerprint(X, y) if cache is not None else None
+    tasks = [(KNeighborsClassifier(n_neighbors=k), X, y, train, test, None, True, preprocessor, None, cache,
+              data_key)
+             for k in n_neighbors for train, test in folds]
+    fold_scores = run_tasks(fit_and_score, tasks, n_jobs=n_jobs)
+    return {k: stack_fold_scores(fold_scores[i * len(folds):(i + 1) * len(folds)])
+            for i, k in enumerate(n_neighbors)}
+
+
 
@@ -1,12 +1,20 @@
 import pandas as pd
 import numpy as np
+from sklearn.base import clone
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn.model_selection import cross_validate
+from sklearn.model_selection import cross_validate, check_cv
+from sklearn.utils.validation import column_or_1d
 from imblearn.over_sampling import RandomOverSampler
 from sklearn.pipeline import make_pipeline
 from imblearn.pipeline import make_pipeline as make_imb_pipeline
+from src.fold_cache import data_fingerprint
+from src.instrumentation import span
+from src.knn_sweep import sweep_fold, collect_sweep_scores
+from src.parallel_cv import fit_and_score, run_tasks, shareable, stack_fold_scores
+from src.weighted_knn import CountWeightedKNeighborsClassifier
 
-def run_knn_analysis(X_train, y_train, param_grid={}, seed=123, preprocessor=None, scoring=None):
+def run_knn_analysis(X_train, y_train, param_grid={}, seed=123, preprocessor=None, scoring=None, sweep=False, n_jobs=None,
+                     cache=None, oversampling="duplicate", engine=None):
     """
     Conducts k-Nearest Neighbors (kNN) analysis with optional preprocessing and oversampling,
     performing hyperparameter optimization based on the provided parameter grid. 
@@ -25,9 +33,32 @@ def run_knn_analysis(X_train, y_train, param_grid={}, seed=123, preprocessor=Non
         Random seed for reproducibility. Defaults to 123.
     preprocessor : sklearn.compose.ColumnTransformer, optional
         A preprocessor pipeline (e.g., for scaling or encoding). Defaults to None.
-    scoring : dict or str, optional
+    scoring : dict, str or callable, optional
         Scoring strategy to evaluate the performance of the cross-validated model. 
-        Example: {'accuracy': 'accuracy', 'f1': 'f1'}. Defaults to None.
+        Example: {'accuracy': 'accuracy', 'f1': 'f1'}, or a `ConfusionMatrixScorer`
+        that predicts once per fold for all metrics. Defaults to None.
+    sweep : bool, optional
+        If True, each fold is preprocessed and queried once at the largest k, and the
+        scores for every smaller k are computed from the ranked neighbour lists instead
+        of fitting one pipeline per k. Defaults to False.
+    n_jobs : int, optional
+        Number of worker processes the (k, fold, oversampling) tasks are spread over;
+        -1 uses all cores. The training data is memory-mapped into the workers and the
+        results are identical to a serial run. Defaults to None (serial).
+    cache : FoldTransformCache, optional
+        Cache of per-fold preprocessor fits shared by every k (and by other analyses
+        run on the same data); the folds are then evaluated as in the `n_jobs` mode.
+        Defaults to None (the preprocessor is refitted for every k).
+    oversampling : {"duplicate", "weighted"}, optional
+        How the "with oversampling" model balances the classes: "duplicate" copies
+        minority rows with `RandomOverSampler`, "weighted" keeps each row once and lets
+        `CountWeightedKNeighborsClassifier` vote with the oversampling counts.
+        Defaults to "duplicate".
+    engine : kNN classifier, optional
+        Unfitted classifier that replaces `KNeighborsClassifier` in the plain and the
+        "duplicate" models, with `n_neighbors` set to each k, e.g. a
+        `BlockedKNeighborsClassifier` to search the folds in float32 blocks.
+        Defaults to None (`KNeighborsClassifier`).
 
     Returns
     -------
@@ -43,37 +74,112 @@ def run_knn_analysis(X_train, y_train, param_grid={}, seed=123, preprocessor=Non
     >>> results = run_knn_analysis(X_train, y_train, param_grid)
     >>> print(results)
     """
+    if oversampling not in ("duplicate", "weighted"):
+        raise ValueError("oversampling must be either 'duplicate' or 'weighted'.")
+
     results = []
+    n_neighbors = param_grid.get("n_neighbors", [5])  # Default value set to [5] if not provided
+
+    if sweep or n_jobs is not None or cache is not None:
+        return pd.DataFrame(_run_knn_tasks(X_train, y_train, n_neighbors, seed, preprocessor, scoring, sweep, n_jobs,
+                                           cache, oversampling, engine))
 
-    for k in param_grid.get("n_neighbors", [5]):  # Default value set to [5] if not provided
-        knn = KNeighborsClassifier(n_neighbors=k)
+    for k in n_neighbors:
+        knn = _plain_knn(k, engine)
 
         # Without oversampling
         pipe = make_pipeline(preprocessor, knn) if preprocessor else make_pipeline(knn)
-        scores = cross_validate(pipe, X_train, y_train, return_train_score=True, scoring=scoring, cv=20)
+        with span('cross_validate', k=int(k), model="without oversampling"):
+            scores = cross_validate(pipe, X_train, y_train, return_train_score=True, scoring=scoring, cv=20)
 
         # Store the results for each k
-        k_results = {"n_neighbors": k, "kNN model": "without oversampling"}
-        for metric in (scoring or {}).keys():
-            test_metric = f"test_{metric}"
-            k_results[f"mean_{metric}"] = np.mean(scores[test_metric])
-            k_results[f"std_{metric}"] = np.std(scores[test_metric])
-
-        results.append(k_results)
+        results.append(_summarise_scores(k, "without oversampling", scores, scoring))
         
         # With oversampling
-        pipe_imb = make_imb_pipeline(RandomOverSampler(sampling_strategy='minority'), preprocessor, knn) if preprocessor else make_imb_pipeline(RandomOverSampler(sampling_strategy='minority'), knn)
-        scores = cross_validate(pipe_imb, X_train, y_train, return_train_score=True, scoring=scoring, cv=20)
+        if oversampling == "weighted":
+            pipe_imb = _knn_pipeline(k, (None, CountWeightedKNeighborsClassifier(random_state=seed)), preprocessor)
+        else:
+            pipe_imb = make_imb_pipeline(RandomOverSampler(sampling_strategy='minority', random_state=seed), preprocessor, knn) if preprocessor else make_imb_pipeline(RandomOverSampler(sampling_strategy='minority', random_state=seed), knn)
+        with span('cross_validate', k=int(k), model="with oversampling"):
+            scores = cross_validate(pipe_imb, X_train, y_train, return_train_score=True, scoring=scoring, cv=20)
 
         # Store the results for each k
-        k_results = {"n_neighbors": k, "kNN model": "with oversampling"}
-        for metric in (scoring or {}).keys():
-            test_metric = f"test_{metric}"
-            k_results[f"mean_{metric}"] = np.mean(scores[test_metric])
-            k_results[f"std_{metric}"] = np.std(scores[test_metric])
-
-        results.append(k_results)
+        results.append(_summarise_scores(k, "with oversampling", scores, scoring))
 
     # Convert the results to a pandas DataFrame
     results_df = pd.DataFrame(results)
     return results_df
+
+
+def _summarise_scores(k, model_name, scores, scoring):
+    """Collapse the per-fold test scores of one kNN model into a results row."""
+    k_results = {"n_neighbors": k, "kNN model": model_name}
+    # A multi-metric scorer such as ConfusionMatrixScorer names its metrics in the scores themselves
+    metrics = [key[len("test_"):] for key in scores if key.startswith("test_")] if scoring is not None else []
+    for metric in metrics:
+        test_metric = f"test_{metric}"
+        k_results[f"mean_{metric}"] = np.mean(scores[test_metric])
+        k_results[f"std_{metric}"] = np.std(scores[test_metric])
+    return k_results
+
+
+def _run_knn_tasks(X_train, y_train, n_neighbors, seed, preprocessor, scoring, sweep, n_jobs, cache, oversampling,
+                   engine=None):
+    """
+    Evaluate every (k, fold, oversampling) combination as independent tasks.
+
+    In sweep mode a task covers all k of one (fold, oversampling) pair. Returns
+    the result rows in the same order as the serial loop in `run_knn_analysis`.
+    """
+    y = column_or_1d(y_train)
+    X = shareable(X_train) if n_jobs is not None else X_train
+    folds = list(check_cv(20, y, classifier=True).split(X, y))
+    # Hash the data once rather than on every cache lookup
+    data_key = data_fingerprint(X, y) if cache is not None else None
+    # Each model is a (sampler, count-weighted classifier) pair; at most one of them is set
+    if oversampling == "weighted":
+        oversampled = (None, CountWeightedKNeighborsClassifier(sampling_strategy='minority', random_state=seed))
+    else:
+        oversampled = (RandomOverSampler(sampling_strategy='minority', random_state=seed), None)
+    models = {"without oversampling": (None, None), "with oversampling": oversampled}
+
+    scores = {}
+    if sweep:
+        tasks = [(X, y, train, test, n_neighbors, preprocessor, sampler, scoring, cache, data_key, weighted, engine)
+                 for sampler, weighted in models.values() for train, test in folds]
+        fold_results = run_tasks(sweep_fold, tasks, n_jobs=n_jobs)
+        for i, model_name in enumerate(models):
+            variant_scores = collect_sweep_scores(fold_results[i * len(folds):(i + 1) * len(folds)], n_neighbors)
+            for k in n_neighbors:
+                scores[k, model_name] = variant_scores[k]
+    else:
+        keys = [(k, model_name) for k in n_neighbors for model_name in models]
+        tasks = [(_knn_model(k, models[model_name], engine), X, y, train, test, scoring, False, preprocessor,
+                  models[model_name][0], cache, data_key)
+                 for k, model_name in keys for train, test in folds]
+        fold_scores = run_tasks(fit_and_score, tasks, n_jobs=n_jobs)
+        for i, key in enumerate(keys):
+            scores[key] = stack_fold_scores(fold_scores[i * len(folds):(i + 1) * len(folds)])
+
+    return [_summarise_scores(k, model_name, scores[k, model_name], scoring)
+            for k in n_neighbors for model_name in models]
+
+
+def _plain_knn(k, engine=None):
+    """Unfitted kNN classifier for one k: a clone of `engine`, or a `KNeighborsClassifier`."""
+    return clone(engine).set_params(n_neighbors=k) if engine is not None else KNeighborsClassifier(n_neighbors=k)
+
+
+def _knn_model(k, model, engine=None):
+    """Unfitted classifier for one k of a (sampler, count-weighted classifier) pair."""
+    weighted = model[1]
+    return clone(weighted).set_params(n_neighbors=k) if weighted is not None else _plain_knn(k, engine)
+
+
+def _knn_pipeline(k, model, preprocessor, engine=None):
+    """Build the kNN pipeline evaluated for one k from a (sampler, count-weighted classifier) pair."""
+    sampler = model[0]
+    steps = [step for step in (sampler, preprocessor) if step is not None]
+    if sampler is not None:
+        return make_imb_pipeline(*steps, _knn_model(k, model, engine))
+    return make_pipeline(*steps, _knn_model(k, model, engine))
@@ -1,29 +1,37 @@
 # author: Doris Wang
 # date: 2023-11-23
 
+from math import ceil
+
+import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from src.split_index import make_split_index, save_split_index
 
-def split_data(input_file, output_train_file, output_test_file, test_size=0.2, random_state=123):
+def split_data(input_file, output_train_file, output_test_file, test_size=0.2, random_state=123, index_path=None):
     """
     Splits a dataset into training and testing sets and saves them as CSV files.
 
     This function reads a dataset from a CSV file, splits it into training and
     testing sets based on the specified test size and random state, and then 
-    saves these sets into separate CSV files.
+    saves these sets into separate CSV files. With `index_path`, only the row
+    positions of the split are stored in a compact index, and the CSV copies
+    become optional.
 
     Parameters:
     -----------
     input_file : str
         Path to the input CSV file containing the dataset.
-    output_train_file : str
-        Path where the training set CSV file will be saved.
-    output_test_file : str
-        Path where the testing set CSV file will be saved.
+    output_train_file : str or None
+        Path where the training set CSV file will be saved; None skips the copy.
+    output_test_file : str or None
+        Path where the testing set CSV file will be saved; None skips the copy.
     test_size : float, optional
         Proportion of the dataset to include in the test split (default is 0.2).
     random_state : int, optional
         Seed for the random number generator (default is 123).
+    index_path : str, optional
+        Path where the split index is saved (see `src.split_index.save_split_index`).
+        Defaults to None (no index).
 
     Returns:
     --------
@@ -41,11 +49,136 @@ def split_data(input_file, output_train_file, output_test_file, test_size=0.2, r
     # Read data
     df = pd.read_csv(input_file)
 
-    # Split data
-    train_df, test_df = train_test_split(df, test_size=test_size, random_state=random_state)
+    # Split the row positions; the same seed selects the same rows as splitting the frame itself
+    index = make_split_index(len(df), test_size=test_size, random_state=random_state)
+    train_df, test_df = df.iloc[index["train"]], df.iloc[index["test"]]
+    if index_path is not None:
+        save_split_index(index, input_file, index_path)
 
     # Save to CSV
-    train_df.to_csv(output_train_file, index=False)
-    test_df.to_csv(output_test_file, index=False)
+    if output_train_file is not None:
+        train_df.to_csv(output_train_file, index=False)
+    if output_test_file is not None:
+        test_df.to_csv(output_test_file, index=False)
 
     return train_df, test_df
+
+
+def _allocate(counts, n_test):
+    """Split `n_test` over strata proportionally to their sizes, giving the remainders to the largest fractions."""
+    total = sum(counts.values())
+    exact = {stratum: n_test * count / total for stratum, count in counts.items()}
+    allocation = {stratum: int(share) for stratum, share in exact.items()}
+    by_remainder = sorted(counts, key=lambda stratum: (allocation[stratum] - exact[stratum], stratum))
+    for stratum in by_remainder[:n_test - sum(allocation.values())]:
+        allocation[stratum] += 1
+    return allocation
+
+
+def _strata(chunk, stratify):
+    """Stratum of every row of a chunk, as read from the file; missing values form a stratum of their own."""
+    if stratify is None:
+        return np.zeros(len(chunk), dtype=np.int8)
+    return chunk[stratify].fillna('').to_numpy(dtype=str)
+
+
+def stream_split(input_file, output_train_file, output_test_file, test_size=0.2, random_state=123,
+                 stratify=None, key=None, chunksize=100000):
+    """
+    Splits a CSV file that may not fit in memory into training and testing sets, chunk by chunk.
+
+    Without `key`, the file is read twice. The first pass counts the rows of
+    every stratum; the second assigns rows to the test set by sequential
+    selection sampling: each chunk takes a hypergeometric draw of the test
+    rows still needed from the rows still to come. This selects exactly
+    `ceil(test_size * n_rows)` test rows, distributed over the strata of
+    `stratify` in proportion to their sizes like `train_test_split`, and every
+    such subset is equally likely. The same `random_state` and `chunksize`
+    give the same split, though not the same rows as `split_data`.
+
+    With `key`, each row is assigned in a single pass from a seeded hash of
+    its value in the `key` column, so a row keeps its assignment when the
+    file grows or is reordered, and the test share is `test_size` in
+    expectation rather than exactly.
+
+    Rows are appended to the output files in their input order. Peak memory
+    is set by `chunksize`, not by the size of the file.
+
+    Parameters:
+    -----------
+    input_file : str
+        Path to the input CSV file containing the dataset.
+    output_train_file : str
+        Path where the training set CSV file will be saved.
+    output_test_file : str
+        Path where the testing set CSV file will be saved.
+    test_size : float, optional
+        Proportion of the dataset to include in the test split (default is 0.2).
+    random_state : int, optional
+        Seed for the random number generator or the hash (default is 123).
+    stratify : str, optional
+        Column to stratify the split on, e.g. 'disease' (default is None). Not used with `key`.
+    key : str, optional
+        Column identifying each row, for a hash-based assignment (default is None).
+    chunksize : int, optional
+        Number of rows read at a time (default is 100000).
+
+    Returns:
+    --------
+    tuple of int
+        The number of rows written to the training and testing files.
+
+    Examples:
+    ---------
+    >>> stream_split("data/raw/registry.csv", "data/processed/train_data.csv", "data/processed/test_data.csv",
+    ...              test_size=0.2, random_state=123, stratify="disease", chunksize=500000)
+    """
+    if not 0 < test_size < 1:
+        raise ValueError("test_size must be between 0 and 1.")
+    if key is not None and stratify is not None:
+        raise ValueError("A key-based split assigns rows independently and cannot be stratified.")
+
+    # The stratification column is kept as text, so its values compare equal in every chunk
+    dtype = {stratify: str} if stratify is not None else None
+    if key is None:
+        # First pass: stratum sizes, reading only the stratification column
+        counts = {}
+        usecols = [stratify] if stratify is not None else [0]
+        for chunk in pd.read_csv(input_file, usecols=usecols, dtype=dtype, chunksize=chunksize):
+            strata, sizes = np.unique(_strata(chunk, stratify), return_counts=True)
+            for stratum, size in zip(strata.tolist(), sizes.tolist()):
+                counts[stratum] = counts.get(stratum, 0) + size
+        n_rows = sum(counts.values())
+        if n_rows == 0:
+            raise ValueError("The input file has no rows.")
+        needed = _allocate(counts, ceil(test_size * n_rows))
+        remaining = dict(counts)
+        rng = np.random.default_rng(random_state)
+    else:
+        # pandas hashes with a 16-character key; derive it from the seed
+        hash_key = f"{0 if random_state is None else random_state:016d}"[-16:]
+        threshold = test_size * 2.0 ** 64
+
+    n_train = n_test = 0
+    for number, chunk in enumerate(pd.read_csv(input_file, dtype=dtype, chunksize=chunksize)):
+        if key is None:
+            is_test = np.zeros(len(chunk), dtype=bool)
+            strata = _strata(chunk, stratify)
+            for stratum in np.unique(strata).tolist():
+                rows = np.flatnonzero(strata == stratum)
+                # Test rows among this chunk's rows of the stratum, given what is still needed from what is left
+                take = rng.hypergeometric(needed[stratum], remaining[stratum] - needed[stratum], len(rows)) \
+                    if needed[stratum] else 0
+                is_test[rng.choice(rows, take, replace=False)] = True
+                needed[stratum] -= take
+                remaining[stratum] -= len(rows)
+        else:
+            hashes = pd.util.hash_pandas_object(chunk[key], index=False, hash_key=hash_key).to_numpy()
+            is_test = hashes < threshold
+
+        chunk[~is_test].to_csv(output_train_file, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+        chunk[is_test].to_csv(output_test_file, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+        n_test += int(is_test.sum())
+        n_train += int(len(chunk) - is_test.sum())
+
+    return n_train, n_test
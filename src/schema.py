@@ -0,0 +1,131 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+ColumnSpec = namedtuple('ColumnSpec', ['dtype', 'nullable', 'min_value', 'max_value', 'categories'],
+                        defaults=[None, None, None])
+ColumnSpec.__doc__ = """
+Compact dtype and valid values of one column.
+
+Integer columns must be complete, since NumPy integers cannot hold missing
+values; columns that may be missing use float32. `categories` lists the valid
+values of a categorical column.
+"""
+
+# Framingham columns with the smallest dtypes that hold their plausible range
+FRAMINGHAM_SCHEMA = {
+    'AGE': ColumnSpec('uint8', False, 0, 120),
+    'FRW': ColumnSpec('float32', True, 0, 400),
+    'SBP': ColumnSpec('int16', False, 50, 350),
+    'DBP': ColumnSpec('int16', False, 20, 250),
+    'CHOL': ColumnSpec('int16', False, 50, 1000),
+    'CIG': ColumnSpec('float32', True, 0, 100),
+    'sex': ColumnSpec('category', False, categories=['Female', 'Male']),
+    'disease': ColumnSpec('int8', False, 0, 1),
+}
+TARGET = 'disease'
+NUMERIC_FEATURES = [name for name, spec in FRAMINGHAM_SCHEMA.items() if spec.dtype != 'category' and name != TARGET]
+CATEGORICAL_FEATURES = [name for name, spec in FRAMINGHAM_SCHEMA.items() if spec.dtype == 'category']
+FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
+
+
+class SchemaError(ValueError):
+    """Raised when data does not satisfy its schema; `problems` lists every violation found."""
+
+    def __init__(self, problems):
+        super().__init__("The data does not match the schema:\n  " + "\n  ".join(problems))
+        self.problems = problems
+
+
+def validate_frame(frame, schema=FRAMINGHAM_SCHEMA):
+    """
+    Check the columns of `frame` that appear in `schema` for missing, out-of-range and unknown values.
+
+    Each check is one vectorised pass over a column. Columns of the schema
+    that are absent from `frame` are not checked, so feature-only files such
+    as X_test validate with the full schema.
+
+    Returns
+    -------
+    list of str
+        One message per violated rule; empty if the data is valid.
+    """
+    problems = []
+    for name, spec in schema.items():
+        if name not in frame.columns:
+            continue
+        column = frame[name]
+        missing = column.isna().to_numpy()
+        if not spec.nullable and missing.any():
+            problems.append(f"{name}: {missing.sum()} missing values")
+        if spec.categories is not None:
+            unknown = ~missing & ~column.isin(spec.categories).to_numpy()
+            if unknown.any():
+                values = sorted(map(str, pd.unique(column[unknown])))[:5]
+                problems.append(f"{name}: {unknown.sum()} values outside {spec.categories}, e.g. {values}")
+            continue
+        values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        not_numeric = ~missing & np.isnan(values)
+        if not_numeric.any():
+            problems.append(f"{name}: {not_numeric.sum()} non-numeric values")
+        with np.errstate(invalid='ignore'):
+            outside = (values < spec.min_value) | (values > spec.max_value)
+            fractional = np.dtype(spec.dtype).kind in 'iu' and (values % 1 != 0) & ~np.isnan(values)
+        if outside.any():
+            problems.append(f"{name}: {outside.sum()} values outside [{spec.min_value}, {spec.max_value}]")
+        if np.any(fractional):
+            problems.append(f"{name}: {np.sum(fractional)} non-integer values in an integer column")
+    return problems
+
+
+def apply_schema(frame, schema=FRAMINGHAM_SCHEMA, validate=True):
+    """
+    Validate `frame` and convert the columns that appear in `schema` to their compact dtypes.
+
+    Columns already of the right dtype are not copied, and columns not in the
+    schema are left as they are.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame or pd.Series
+        Data, e.g. as read by `pd.read_csv`; a Series is converted by its name.
+    schema : dict, optional
+        Maps column names to `ColumnSpec`. Defaults to `FRAMINGHAM_SCHEMA`.
+    validate : bool, optional
+        Check the values with `validate_frame` first and raise `SchemaError` on any violation. Defaults to True.
+
+    Returns
+    -------
+    pd.DataFrame or pd.Series
+
+    Example
+    -------
+    >>> df = apply_schema(pd.read_csv('data/raw/framingham.csv'))
+    >>> df.memory_usage(deep=True).sum()
+    """
+    if isinstance(frame, pd.Series):
+        return apply_schema(frame.to_frame(), schema, validate)[frame.name]
+    if validate:
+        problems = validate_frame(frame, schema)
+        if problems:
+            raise SchemaError(problems)
+    dtypes = {}
+    for name, spec in schema.items():
+        if name not in frame.columns:
+            continue
+        dtypes[name] = pd.CategoricalDtype(spec.categories) if spec.dtype == 'category' else np.dtype(spec.dtype)
+    changed = {name: dtype for name, dtype in dtypes.items() if frame[name].dtype != dtype}
+    return frame.astype(changed, copy=False) if changed else frame
+
+
+def csv_dtypes(schema=FRAMINGHAM_SCHEMA):
+    """
+    Dtypes `pd.read_csv` can parse straight into: the float and categorical columns of `schema`.
+
+    Integer columns and the final categories are left to `apply_schema`, so
+    that missing, fractional or unknown values are reported by the validation
+    instead of failing the parser or turning into missing values.
+    """
+    return {name: spec.dtype for name, spec in schema.items()
+            if spec.dtype == 'category' or np.dtype(spec.dtype).kind == 'f'}
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from src.schema import CATEGORICAL_FEATURES, FEATURES, FRAMINGHAM_SCHEMA, NUMERIC_FEATURES
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+_MAX_BODY_BYTES = 1024 ** 2
+
+
+def validate_record(record):
+    """
+    Check one JSON patient record and return it restricted to the model features.
+
+    Parameters
+    ----------
+    record : dict
+        Decoded JSON object with the Framingham features; numeric values may
+        be null and are then imputed by the pipeline.
+
+    Returns
+    -------
+    dict
+        The feature values, with numeric values as floats (NaN for null).
+
+    Raises
+    ------
+    ValueError
+        If a feature is missing, a numeric value is not a number or a
+        categorical value is not one of its categories in the schema, which
+        the fitted encoder would reject.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Each patient record must be a JSON object.")
+    missing = [name for name in FEATURES if name not in record]
+    if missing:
+        raise ValueError(f"Missing features: {', '.join(missing)}.")
+    clean = {}
+    for name in NUMERIC_FEATURES:
+        value = record[name]
+        if value is None:
+            clean[name] = math.nan
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            clean[name] = float(value)
+        else:
+            raise ValueError(f"Feature {name} must be a number or null.")
+    for name in CATEGORICAL_FEATURES:
+        categories = FRAMINGHAM_SCHEMA[name].categories
+        if not isinstance(record[name], str) or record[name] not in categories:
+            raise ValueError(f"Feature {name} must be one of {', '.join(categories)}.")
+        clean[name] = record[name]
+    return clean
+
+
+class ServiceMetrics:
+    """
+    Request, batch and latency counters of the scoring service.
+
+    Latencies are kept for the most recent `window` requests only, so the
+    percentiles describe current behaviour and memory use stays constant.
+    """
+
+    def __init__(self, window=10000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.records = 0
+        self.batches = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+
+    def record_request(self, n_records, latency):
+        self.requests += 1
+        self.records += n_records
+        self._latencies.append(latency)
+
+    def record_batch(self, size):
+        self.batches += 1
+        self._batch_sizes.append(size)
+
+    def snapshot(self):
+        """Current counters as a JSON-serialisable dict; latencies in milliseconds."""
+        uptime = time.perf_counter() - self.started
+        latencies = np.array(self._latencies) * 1000
+        percentiles = {f"p{q}": float(np.percentile(latencies, q)) if len(latencies) else None for q in (50, 95, 99)}
+        return {
+            "uptime_s": uptime,
+            "requests": self.requests,
+            "records": self.records,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": float(np.mean(self._batch_sizes)) if self._batch_sizes else None,
+            "records_per_s": self.records / uptime if uptime > 0 else 0.0,
+            "latency_ms": {"mean": float(latencies.mean()) if len(latencies) else None, **percentiles},
+        }
+
+
+class MicroBatcher:
+    """
+    Group concurrent prediction requests into one vectorised `predict_proba` call.
+
+    A batch is scored as soon as it holds `max_batch_size` records or the
+    oldest record has waited `max_wait` seconds, whichever comes first. The
+    model runs in a worker thread so the event loop keeps accepting requests
+    while a batch is being scored.
+
+    Parameters
+    ----------
+    model : fitted classifier or pipeline
+        Model with `predict_proba` and `classes_` accepting a DataFrame of `FEATURES`.
+    max_batch_size : int, optional
+        Largest number of records scored together. Defaults to 64.
+    max_wait : float, optional
+        Longest time in seconds a record waits for others to join its batch. Defaults to 0.005.
+    metrics : ServiceMetrics, optional
+        Counters updated with every batch.
+    """
+
+    def __init__(self, model, max_batch_size=64, max_wait=0.005, metrics=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.metrics = metrics if metrics is not None else ServiceMetrics()
+        self._queue = None
+        self._worker = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def predict(self, records):
+        """Score a list of validated records, returning one `(prediction, probabilities)` pair per record."""
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in records]
+        for record, future in zip(records, futures):
+            self._queue.put_nowait((record, future))
+        return await asyncio.gather(*futures)
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Records that are already queued join the batch without waiting
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    def _score(self, records):
+        proba = self.model.predict_proba(pd.DataFrame.from_records(records, columns=FEATURES))
+        classes = self.model.classes_
+        return classes[np.argmax(proba, axis=1)], proba, classes
+
+    def _resolve(self, batch, scored):
+        predictions, proba, classes = scored
+        self.metrics.record_batch(len(batch))
+        for i, (_, future) in enumerate(batch):
+            if not future.done():
+                future.set_result((predictions[i].item(), {str(c): float(p) for c, p in zip(classes, proba[i])}))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                scored = await loop.run_in_executor(None, self._score, [record for record, _ in batch])
+            except Exception:
+                # A record the model rejects fails the whole call: score the batch record by record so that
+                # the requests of other clients in the same batch still succeed
+                for record, future in batch:
+                    try:
+                        self._resolve([(record, future)], await loop.run_in_executor(None, self._score, [record]))
+                    except Exception as error:
+                        self.metrics.errors += 1
+                        if not future.done():
+                            future.set_exception(error)
+                continue
+            self._resolve(batch, scored)
+
+
+async def read_request(reader):
+    """Read one HTTP/1.1 request, returning `(method, path, headers, body)` or None at end of stream."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise ValueError("Malformed request line.")
+    method, path, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > _MAX_BODY_BYTES:
+        raise ValueError("Request body too large.")
+    body = await reader.readexactly(length) if length else b''
+    return method, path, headers, body
+
+
+def encode_response(status, payload, keep_alive=True):
+    """Serialise a JSON HTTP response."""
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def request_json(reader, writer, method, path, payload=None):
+    """
+    Send one request over an open connection and return `(status, decoded JSON body)`.
+
+    Used by the load test and the tests as a minimal keep-alive HTTP client.
+    """
+    body = json.dumps(payload).encode() if payload is not None else b''
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+class ScoringService:
+    """
+    Local HTTP scoring service for the trained kNN pipeline.
+
+    Endpoints:
+
+    - `POST /predict` takes one JSON patient record or a list of records and
+      returns `{"prediction": ..., "probability": {class: p}}` for each.
+    - `GET /metrics` returns the request, batch, latency and throughput counters.
+    - `GET /health` returns `{"status": "ok"}`.
+
+    Parameters
+    ----------
+    model : fitted classifier or pipeline
+        Model loaded once at startup.
+    host : str, optional
+        Interface to listen on. Defaults to '127.0.0.1'.
+    port : int, optional
+        Port to listen on; 0 picks a free port. Defaults to 8000.
+    max_batch_size : int, optional
+        Largest micro-batch. Defaults to 64.
+    max_wait : float, optional
+        Longest wait in seconds for a micro-batch to fill. Defaults to 0.005.
+
+    Example
+    -------
+    >>> service = ScoringService(load_model('results/models/imb_knn_pipeline.pickle'), port=8000)
+    >>> asyncio.run(service.serve_forever())
+    """
+
+    def __init__(self, model, host='127.0.0.1', port=8000, max_batch_size=64, max_wait=0.005):
+        self.host = host
+        self.port = port
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(model, max_batch_size, max_wait, self.metrics)
+        self._server = None
+
+    async def start(self):
+        """Start listening; `self.port` is updated with the bound port."""
+        await self.batcher.start()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _predict(self, body):
+        started = time.perf_counter()
+        try:
+            payload = json.loads(body)
+            single = isinstance(payload, dict)
+            records = [validate_record(record) for record in ([payload] if single else payload)]
+            if not records:
+                raise ValueError("No patient records given.")
+        except (ValueError, TypeError) as error:
+            self.metrics.errors += 1
+            return 400, {"error": str(error)}
+        try:
+            results = await self.batcher.predict(records)
+        except Exception as error:
+            return 500, {"error": str(error)}
+        scored = [{"prediction": prediction, "probability": probability} for prediction, probability in results]
+        self.metrics.record_request(len(records), time.perf_counter() - started)
+        return 200, scored[0] if single else scored
+
+    async def _dispatch(self, method, path, body):
+        if path == '/predict':
+            return await self._predict(body) if method == 'POST' else (405, {"error": "Use POST."})
+        if path == '/metrics':
+            return (200, self.metrics.snapshot()) if method == 'GET' else (405, {"error": "Use GET."})
+        if path == '/health':
+            return 200, {"status": "ok"}
+        return 404, {"error": f"Unknown path {path}."}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except ValueError as error:
+                    writer.write(encode_response(400, {"error": str(error)}, keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, payload = await self._dispatch(method, path, body)
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from sklearn.model_selection import KFold, StratifiedKFold, train_test_split
+from src.data_cache import load_frame
+from src.schema import FRAMINGHAM_SCHEMA
+
+INDEX_FORMAT = "cardiopredict-split/2"
+
+
+def index_path_for(raw_path):
+    """Default location of the split index of a raw file: `data/raw/framingham.csv` -> `data/raw/framingham.split.npz`."""
+    return os.path.splitext(raw_path)[0] + '.split.npz'
+
+
+def _sha256(path, chunk_size=1024 ** 2):
+    """SHA-256 of the whole file, read `chunk_size` bytes at a time."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fingerprint(path):
+    """Size, modification time and SHA-256 of a file."""
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _sha256(path)}
+
+
+def _unchanged(path, fingerprint):
+    """Whether a file still matches its fingerprint; the file is only hashed again when its modification time changed."""
+    stat = os.stat(path)
+    if stat.st_size != fingerprint["size"]:
+        return False
+    return stat.st_mtime_ns == fingerprint["mtime_ns"] or _sha256(path) == fingerprint["sha256"]
+
+
+def make_split_index(n_rows, test_size=0.2, random_state=None, stratify=None, n_folds=None):
+    """
+    Row positions of a train/test split, with optional cross-validation folds of the training rows.
+
+    The split is drawn with `train_test_split` on the row positions, so the
+    same `random_state` (or global NumPy seed) selects the same rows as
+    splitting the DataFrame itself.
+
+    Parameters
+    ----------
+    n_rows : int
+        Number of rows of the raw data.
+    test_size : float, optional
+        Proportion of the rows in the test split. Defaults to 0.2.
+    random_state : int or None, optional
+        Seed of the split and the folds. Defaults to None (NumPy's global random state).
+    stratify : array-like of shape (n_rows,), optional
+        Class labels to stratify the split and the folds on. Defaults to None.
+    n_folds : int, optional
+        Number of cross-validation folds over the training rows. Defaults to None (no folds).
+
+    Returns
+    -------
+    dict
+        `train` and `test` row positions and, with `n_folds`, the `fold` number of every training row.
+    """
+    positions = np.arange(n_rows, dtype=np.int64)
+    train, test = train_test_split(positions, test_size=test_size, random_state=random_state, stratify=stratify)
+    # The smallest integer type that holds every row position keeps the index compact
+    dtype = np.min_scalar_type(max(n_rows - 1, 0))
+    index = {"train": train.astype(dtype), "test": test.astype(dtype)}
+    if n_folds:
+        labels = None if stratify is None else np.asarray(stratify)[train]
+        splitter = (StratifiedKFold if labels is not None else KFold)(n_folds, shuffle=True, random_state=random_state)
+        fold = np.empty(len(train), dtype=np.int16)
+        for number, (_, validation) in enumerate(splitter.split(train, labels)):
+            fold[validation] = number
+        index["fold"] = fold
+    return index
+
+
+def save_split_index(index, raw_path, index_path=None):
+    """
+    Save a split index next to the raw file it refers to.
+
+    Only the row positions are stored, in a compressed `.npz` file, together
+    with a fingerprint of the raw file (its size, modification time and a hash
+    of its content), so that a changed raw file is detected instead of
+    silently selecting the wrong rows. A copy of the raw file is only hashed
+    again when it is loaded.
+
+    Parameters
+    ----------
+    index : dict
+        Split index returned by `make_split_index`.
+    raw_path : str
+        Path of the raw CSV file the positions refer to.
+    index_path : str, optional
+        Path of the index file. Defaults to `index_path_for(raw_path)`.
+
+    Returns
+    -------
+    str
+        Path of the index file.
+    """
+    index_path = index_path or index_path_for(raw_path)
+    raw = os.path.relpath(os.path.abspath(raw_path), os.path.dirname(os.path.abspath(index_path)))
+    metadata = {"format": INDEX_FORMAT, "raw_path": raw, "raw": _fingerprint(raw_path)}
+    np.savez_compressed(index_path, metadata=np.array(json.dumps(metadata)), **index)
+    return index_path
+
+
+def load_split_index(index_path):
+    """
+    Load a split index saved by `save_split_index`.
+
+    Returns
+    -------
+    dict
+        `train`, `test` and optionally `fold` arrays, and `raw_path`, the absolute path of the raw file.
+    """
+    with np.load(index_path) as stored:
+        metadata = json.loads(stored["metadata"].item())
+        if metadata.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Unsupported split index format {metadata.get('format')!r}.")
+        index = {name: stored[name] for name in stored.files if name != "metadata"}
+    raw_path = os.path.join(os.path.dirname(os.path.abspath(index_path)), metadata["raw_path"])
+    if not _unchanged(raw_path, metadata["raw"]):
+        raise ValueError(f"{raw_path} changed after the split index {index_path} was made; split it again.")
+    index["raw_path"] = raw_path
+    return index
+
+
+def load_split(index_path, part='train', target='disease', data=None, schema=FRAMINGHAM_SCHEMA):
+    """
+    Build the features and target of one part of a split from the raw data.
+
+    Parameters
+    ----------
+    index_path : str
+        Path of the split index.
+    part : {'train', 'test'}, optional
+        Part of the split to return. Defaults to 'train'.
+    target : str, optional
+        Name of the target column. Defaults to 'disease'.
+    data : pd.DataFrame, optional
+        The raw data, when already loaded; read with `load_frame` otherwise.
+    schema : dict or None, optional
+        Schema the raw data is validated against and converted with. Defaults to `FRAMINGHAM_SCHEMA`.
+
+    Returns
+    -------
+    tuple
+        `(X, y)`: the rows of the part without the target, and the target as a Series.
+        Both keep the row labels of the raw data.
+
+    Example
+    -------
+    >>> X_train, y_train = load_split('data/raw/framingham.split.npz', 'train')
+    """
+    if part not in ('train', 'test'):
+        raise ValueError(f"part must be 'train' or 'test', not {part!r}.")
+    index = load_split_index(index_path)
+    data = load_frame(index["raw_path"], schema=schema) if data is None else data
+    rows = data.iloc[index[part]]
+    return rows.drop(columns=target), rows[target]
+
+
+def fold_splits(index):
+    """
+    Cross-validation folds of a split index as `(train, validation)` positions within the training part.
+
+    The result can be passed as `cv` to `cross_validate` or `GridSearchCV`
+    together with the training part returned by `load_split`.
+    """
+    if "fold" not in index:
+        raise ValueError("The split index has no fold assignments; make it with n_folds.")
+    fold = index["fold"]
+    positions = np.arange(len(fold))
+    return [(positions[fold != number], positions[fold == number]) for number in range(int(fold.max()) + 1)]
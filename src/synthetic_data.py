@@ -0,0 +1,237 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from src.schema import FRAMINGHAM_SCHEMA, apply_schema
+
+# Rows generated from one seed; the data does not depend on how the output is chunked
+BLOCK_SIZE = 2 ** 16
+# Measurements drawn from a multivariate normal per sex; all but AGE on the log scale
+MEASUREMENTS = ['AGE', 'FRW', 'SBP', 'DBP', 'CHOL']
+LOG_MEASUREMENTS = ['FRW', 'SBP', 'DBP', 'CHOL']
+# Features of the logistic model of disease: the measurements, cigarettes per day and male sex
+RISK_FACTORS = MEASUREMENTS + ['CIG', 'male']
+
+
+class CohortModel:
+    """
+    Generative model of a Framingham-like cohort.
+
+    Sex is drawn first. Given sex, AGE and the logarithms of FRW, SBP, DBP and
+    CHOL follow a multivariate normal, which keeps their correlations (SBP
+    and DBP are strongly correlated) and right skew, and are rounded and
+    clipped to the observed range. CIG is zero for non-smokers and otherwise
+    one of the reported amounts, which are mostly multiples of 5. Disease
+    follows a logistic model of the risk factors whose intercept is shifted
+    to give the requested prevalence, and FRW and CIG are missing at their
+    observed rates.
+
+    Fit it to data with `CohortModel.from_frame`; `FRAMINGHAM_COHORT` is the
+    model of `data/raw/framingham.csv`.
+
+    Parameters
+    ----------
+    sex_share : dict
+        Share of each sex, e.g. {'Female': 0.53, 'Male': 0.47}.
+    means, covariances : dict
+        Mean vector and covariance matrix of the measurements for each sex.
+    bounds : dict
+        (min, max) of each measurement, after rounding.
+    smoker_share : dict
+        Share of smokers for each sex.
+    cigarettes : dict
+        Amounts of cigarettes per day reported by smokers, mapped to their share.
+    intercept : float
+        Intercept of the disease model.
+    coefficients : dict
+        Coefficient of each risk factor in the disease model.
+    missing_share : dict
+        Share of missing values of each column.
+    """
+
+    def __init__(self, sex_share, means, covariances, bounds, smoker_share, cigarettes, intercept, coefficients,
+                 missing_share):
+        self.sex_share = sex_share
+        self.means = means
+        self.covariances = covariances
+        self.bounds = bounds
+        self.smoker_share = smoker_share
+        self.cigarettes = cigarettes
+        self.intercept = intercept
+        self.coefficients = coefficients
+        self.missing_share = missing_share
+
+    @classmethod
+    def from_frame(cls, frame):
+        """
+        Estimate the model from a cohort with the Framingham columns.
+
+        Example
+        -------
+        >>> model = CohortModel.from_frame(pd.read_csv('data/raw/framingham.csv'))
+        """
+        complete = frame.dropna()
+        measurements = complete[MEASUREMENTS].astype(float)
+        measurements[LOG_MEASUREMENTS] = np.log(measurements[LOG_MEASUREMENTS])
+        means, covariances = {}, {}
+        for sex, rows in measurements.groupby(complete['sex']):
+            means[sex] = rows.mean().round(5).tolist()
+            covariances[sex] = rows.cov().round(6).to_numpy().tolist()
+
+        smokes = complete['CIG'] > 0
+        cigarettes = complete.loc[smokes, 'CIG'].value_counts(normalize=True).sort_index()
+        risk = complete.assign(male=(complete['sex'] == 'Male').astype(float))[RISK_FACTORS].astype(float)
+        scale = risk.std()
+        logistic = LogisticRegression(C=1e4, max_iter=1000).fit(risk / scale, complete['disease'])
+        coefficients = logistic.coef_[0] / scale.to_numpy()
+
+        return cls(
+            sex_share=frame['sex'].value_counts(normalize=True).sort_index().round(4).to_dict(),
+            means=means,
+            covariances=covariances,
+            bounds={name: (float(frame[name].min()), float(frame[name].max())) for name in MEASUREMENTS},
+            smoker_share=smokes.groupby(complete['sex']).mean().round(4).to_dict(),
+            cigarettes={float(amount): round(share, 4) for amount, share in cigarettes.items()},
+            intercept=round(float(logistic.intercept_[0]), 5),
+            coefficients=dict(zip(RISK_FACTORS, np.round(coefficients, 6).tolist())),
+            missing_share=frame.isna().mean().round(4)[lambda share: share > 0].to_dict(),
+        )
+
+    def _sample(self, n_rows, rng, intercept):
+        sexes = list(self.sex_share)
+        sex = rng.choice(sexes, size=n_rows, p=np.array(list(self.sex_share.values())) / sum(self.sex_share.values()))
+        measurements = np.empty((n_rows, len(MEASUREMENTS)))
+        smoker = np.empty(n_rows, dtype=bool)
+        for value in sexes:
+            rows = np.flatnonzero(sex == value)
+            measurements[rows] = rng.multivariate_normal(self.means[value], self.covariances[value], size=len(rows))
+            smoker[rows] = rng.random(len(rows)) < self.smoker_share[value]
+
+        frame = pd.DataFrame(measurements, columns=MEASUREMENTS)
+        frame[LOG_MEASUREMENTS] = np.exp(frame[LOG_MEASUREMENTS])
+        for name, (low, high) in self.bounds.items():
+            frame[name] = frame[name].round().clip(low, high)
+        amounts, shares = np.array(list(self.cigarettes)), np.array(list(self.cigarettes.values()))
+        frame['CIG'] = np.where(smoker, rng.choice(amounts, size=n_rows, p=shares / shares.sum()), 0.0)
+        frame['sex'] = sex
+
+        risk = frame.assign(male=(sex == 'Male').astype(float))[RISK_FACTORS].to_numpy()
+        logit = intercept + risk @ np.array([self.coefficients[name] for name in RISK_FACTORS])
+        frame['disease'] = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(int)
+        for name, share in self.missing_share.items():
+            frame.loc[rng.random(n_rows) < share, name] = np.nan
+        return frame
+
+    def calibrated_intercept(self, prevalence, n_rows=200000, random_state=0):
+        """Intercept of the disease model that gives the share `prevalence` of disease cases."""
+        sample = self._sample(n_rows, np.random.default_rng(random_state), self.intercept)
+        risk = sample.assign(male=(sample['sex'] == 'Male').astype(float))[RISK_FACTORS].to_numpy()
+        linear = risk @ np.array([self.coefficients[name] for name in RISK_FACTORS])
+        low, high = -50.0, 50.0
+        for _ in range(60):
+            middle = (low + high) / 2
+            if np.nanmean(1 / (1 + np.exp(-(middle + linear)))) < prevalence:
+                low = middle
+            else:
+                high = middle
+        return (low + high) / 2
+
+
+# Model of data/raw/framingham.csv, as estimated by CohortModel.from_frame
+FRAMINGHAM_COHORT = CohortModel(
+    sex_share={'Female': 0.5282, 'Male': 0.4718},
+    means={'Female': [52.35944, 4.66523, 5.00218, 4.49841, 5.47362],
+           'Male': [52.36264, 4.61795, 4.95419, 4.47691, 5.39824]},
+    covariances={'Female': [[22.426644, 0.114925, 0.189017, 0.091515, 0.180252],
+                            [0.114925, 0.031125, 0.01033, 0.008615, 0.000472],
+                            [0.189017, 0.01033, 0.033897, 0.022974, 0.003833],
+                            [0.091515, 0.008615, 0.022974, 0.024089, 0.002817],
+                            [0.180252, 0.000472, 0.003833, 0.002817, 0.039671]],
+                 'Male': [[23.338413, 0.014984, 0.104868, -0.036112, -0.043284],
+                          [0.014984, 0.018159, 0.00608, 0.006955, 0.002413],
+                          [0.104868, 0.00608, 0.026013, 0.017995, 0.003337],
+                          [-0.036112, 0.006955, 0.017995, 0.02191, 0.004077],
+                          [-0.043284, 0.002413, 0.003337, 0.004077, 0.035923]]},
+    bounds={'AGE': (45.0, 62.0), 'FRW': (52.0, 222.0), 'SBP': (90.0, 300.0), 'DBP': (50.0, 160.0),
+            'CHOL': (96.0, 430.0)},
+    smoker_share={'Female': 0.3049, 'Male': 0.6122},
+    cigarettes={1.0: 0.0461, 5.0: 0.2007, 10.0: 0.0872, 15.0: 0.0954, 20.0: 0.3635, 25.0: 0.0345, 30.0: 0.0839,
+                35.0: 0.0197, 40.0: 0.0444, 45.0: 0.0033, 50.0: 0.0181, 60.0: 0.0033},
+    intercept=-9.02171,
+    coefficients={'AGE': 0.055488, 'FRW': 0.004411, 'SBP': 0.014535, 'DBP': 0.004004, 'CHOL': 0.004518,
+                  'CIG': 0.011704, 'male': 0.899705},
+    missing_share={'FRW': 0.0073, 'CIG': 0.0007},
+)
+
+
+def generate_cohort(n_rows, random_state=0, model=None, prevalence=None, chunksize=None):
+    """
+    Synthetic patient records with the `data/raw/framingham.csv` columns and class imbalance.
+
+    The rows are drawn in blocks of `BLOCK_SIZE` with one seed per block
+    spawned from `random_state`, so the same `random_state` gives the same
+    rows for any `chunksize`, and memory is bounded by the chunk size.
+
+    Parameters
+    ----------
+    n_rows : int
+        Number of records.
+    random_state : int, optional
+        Seed of the cohort. Defaults to 0.
+    model : CohortModel, optional
+        Model of the cohort. Defaults to `FRAMINGHAM_COHORT`.
+    prevalence : float, optional
+        Share of disease cases; defaults to the one of the model (about 20% for the Framingham data).
+    chunksize : int, optional
+        If given, yield the records in DataFrames of this many rows instead of returning one DataFrame.
+
+    Returns
+    -------
+    pd.DataFrame or iterator of pd.DataFrame
+        Records with the compact dtypes of `FRAMINGHAM_SCHEMA`.
+
+    Example
+    -------
+    >>> cohort = generate_cohort(100000, random_state=1)
+    >>> cohort['disease'].mean()
+    """
+    model = FRAMINGHAM_COHORT if model is None else model
+    intercept = model.intercept if prevalence is None else model.calibrated_intercept(prevalence)
+    seeds = np.random.SeedSequence(random_state).spawn(-(-n_rows // BLOCK_SIZE))
+    blocks = (model._sample(min(BLOCK_SIZE, n_rows - i * BLOCK_SIZE), np.random.default_rng(seed), intercept)
+              for i, seed in enumerate(seeds))
+    if chunksize is not None:
+        return (apply_schema(chunk, FRAMINGHAM_SCHEMA) for chunk in _rechunk(blocks, chunksize))
+    frame = pd.concat(list(blocks), ignore_index=True) if n_rows else model._sample(0, np.random.default_rng(), intercept)
+    return apply_schema(frame, FRAMINGHAM_SCHEMA)
+
+
+def _rechunk(blocks, chunksize):
+    """Regroup a stream of DataFrames into DataFrames of `chunksize` rows (the last one may be shorter)."""
+    pending, n_pending = [], 0
+    for block in blocks:
+        pending.append(block)
+        n_pending += len(block)
+        while n_pending >= chunksize:
+            merged = pd.concat(pending, ignore_index=True)
+            yield merged.iloc[:chunksize]
+            pending, n_pending = [merged.iloc[chunksize:].reset_index(drop=True)], n_pending - chunksize
+    if n_pending:
+        yield pd.concat(pending, ignore_index=True)
+
+
+def write_cohort_csv(path, n_rows, random_state=0, model=None, prevalence=None, chunksize=BLOCK_SIZE):
+    """
+    Write a synthetic cohort of `n_rows` records to a CSV, one chunk at a time.
+
+    Example
+    -------
+    >>> write_cohort_csv('data/synthetic/framingham_1e6.csv', 10 ** 6)
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    for number, chunk in enumerate(generate_cohort(n_rows, random_state, model, prevalence, chunksize)):
+        chunk.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+    return path
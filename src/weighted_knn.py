@@ -0,0 +1,154 @@
+import numpy as np
+from imblearn.utils import check_sampling_strategy
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils import check_random_state
+from sklearn.utils.validation import check_array, check_is_fitted, check_X_y, column_or_1d
+from src.knn_votes import compress_rows, weighted_votes
+
+
+def oversampling_counts(y, sampling_strategy='minority', random_state=None, multiplicity='sampled'):
+    """
+    Number of times each training row would appear after random oversampling.
+
+    With `multiplicity='sampled'` the counts are drawn exactly as
+    `RandomOverSampler(sampling_strategy, random_state=random_state)` draws its
+    duplicate rows, so the counts describe the same resampled training set
+    without materialising it. With `multiplicity='expected'` every row of a
+    resampled class gets the expected (fractional) count instead.
+
+    Parameters
+    ----------
+    y : array-like
+        Training target values.
+    sampling_strategy : str, float or dict, optional
+        Oversampling target, as accepted by imblearn samplers. Defaults to 'minority'.
+    random_state : int, RandomState or None, optional
+        Seed of the bootstrap draw. Only used when `multiplicity='sampled'`.
+    multiplicity : {'sampled', 'expected'}, optional
+        Whether to draw the counts or use their expectation. Defaults to 'sampled'.
+
+    Returns
+    -------
+    np.ndarray
+        One count per row of `y`; integers when sampled, floats when expected.
+
+    Example
+    -------
+    >>> oversampling_counts(np.array([0, 0, 0, 1]), multiplicity='expected')
+    array([1., 1., 1., 3.])
+    """
+    if multiplicity not in ('sampled', 'expected'):
+        raise ValueError("multiplicity must be either 'sampled' or 'expected'.")
+    y = column_or_1d(y)
+    target = check_sampling_strategy(sampling_strategy, y, 'over-sampling')
+
+    if multiplicity == 'expected':
+        counts = np.ones(len(y), dtype=np.float64)
+        for class_sample, num_samples in target.items():
+            class_rows = y == class_sample
+            counts[class_rows] += num_samples / class_rows.sum()
+        return counts
+
+    rng = check_random_state(random_state)
+    counts = np.ones(len(y), dtype=np.intp)
+    for class_sample, num_samples in target.items():
+        target_class_indices = np.flatnonzero(y == class_sample)
+        bootstrap_indices = rng.choice(target_class_indices, size=num_samples, replace=True)
+        np.add.at(counts, bootstrap_indices, 1)
+    return counts
+
+
+class CountWeightedKNeighborsClassifier(ClassifierMixin, BaseEstimator):
+    """
+    k-nearest neighbours classifier that oversamples by weighting rows instead of copying them.
+
+    Instead of adding duplicate minority rows like `RandomOverSampler`, each
+    distinct training row is stored once together with the number of times it
+    would appear in the oversampled training set, and the k voting slots are
+    filled by those counts. For the same `random_state` the predictions are the
+    ones a `KNeighborsClassifier` fitted on the `RandomOverSampler` output would
+    make, while memory use and query time depend on the number of distinct rows
+    only.
+
+    Note that in a pipeline the preceding preprocessor is fitted on the original
+    rows, whereas with `RandomOverSampler` placed before it, it would also see
+    the duplicates.
+
+    Parameters
+    ----------
+    n_neighbors : int, optional
+        Number of neighbours used for voting. Defaults to 5.
+    sampling_strategy : str, float, dict or None, optional
+        Oversampling target, as accepted by imblearn samplers; None disables
+        oversampling. Defaults to 'minority'.
+    multiplicity : {'sampled', 'expected'}, optional
+        Draw the counts like `RandomOverSampler` or use their expectation.
+        Defaults to 'sampled'.
+    random_state : int, RandomState or None, optional
+        Seed of the oversampling draw. Defaults to None.
+
+    Example
+    -------
+    >>> knn = CountWeightedKNeighborsClassifier(n_neighbors=9, random_state=123)
+    >>> pipe = make_pipeline(preprocessor, knn).fit(X_train, y_train)
+    >>> pipe.predict(X_test)
+    """
+
+    def __init__(self, n_neighbors=5, sampling_strategy='minority', multiplicity='sampled', random_state=None):
+        self.n_neighbors = n_neighbors
+        self.sampling_strategy = sampling_strategy
+        self.multiplicity = multiplicity
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        X, y = check_X_y(X, y)
+        self.classes_, y_encoded = np.unique(y, return_inverse=True)
+        self.n_features_in_ = X.shape[1]
+
+        if self.sampling_strategy is None:
+            counts = np.ones(len(y), dtype=np.intp)
+        else:
+            counts = oversampling_counts(y, self.sampling_strategy, self.random_state, self.multiplicity)
+
+        self._fit_X, self._y, self.sample_counts_ = compress_rows(X, y_encoded, counts)
+        self._tree = NearestNeighbors().fit(self._fit_X)
+        return self
+
+    def vote_counts(self, X, n_neighbors=None):
+        """
+        Number of the k voting slots held by each class, for one or several values of k.
+
+        Parameters
+        ----------
+        X : array-like of shape (n_queries, n_features)
+            Query rows.
+        n_neighbors : int or list of int, optional
+            Values of k; defaults to the fitted `n_neighbors`.
+
+        Returns
+        -------
+        np.ndarray or dict
+            The votes of shape (n_queries, n_classes) for a single k, or a dict
+            mapping each k to its votes when a list is given.
+        """
+        check_is_fitted(self, "_tree")
+        X = check_array(X)
+        many = n_neighbors is not None and not np.isscalar(n_neighbors)
+        ks = list(n_neighbors) if many else [self.n_neighbors if n_neighbors is None else n_neighbors]
+        k_max = max(ks)
+        if k_max > self.sample_counts_.sum():
+            raise ValueError(f"Expected n_neighbors <= n_samples_fit, but n_neighbors = {k_max}, "
+                             f"n_samples_fit = {self.sample_counts_.sum()}")
+
+        # Every distinct row holds at least one slot, so k distinct rows always cover k slots
+        neigh_ind = self._tree.kneighbors(X, n_neighbors=min(k_max, len(self._fit_X)), return_distance=False)
+        neigh_labels, neigh_counts = self._y[neigh_ind], self.sample_counts_[neigh_ind]
+        votes = {k: weighted_votes(neigh_labels, neigh_counts, len(self.classes_), k) for k in ks}
+        return votes if many else votes[ks[0]]
+
+    def predict_proba(self, X):
+        return self.vote_counts(X) / self.n_neighbors
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.vote_counts(X), axis=1)]
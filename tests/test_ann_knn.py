@@ -0,0 +1,73 @@
+import pytest
+import sys
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Import the approximate kNN functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.ann_knn import ApproximateKNeighborsClassifier, RandomProjectionTree, compare_to_exact
+
+# Test data: two overlapping classes with duplicated rows, as after oversampling
+rng = np.random.default_rng(11)
+X = rng.normal(size=(3000, 6))
+y = np.where(X[:, 0] + X[:, 1] + rng.normal(size=3000) > 1, 'disease', 'healthy')
+X = np.vstack([X, X[:200]])
+y = np.concatenate([y, y[:200]])
+X_query = rng.normal(size=(300, 6))
+
+
+# Test that every training row lands in exactly one leaf of at most leaf_size rows, and queries reach a leaf
+def test_random_projection_tree_leaves():
+    tree = RandomProjectionTree(X, leaf_size=40, rng=np.random.RandomState(0))
+    members = tree.leaves[tree.leaves >= 0]
+
+    assert sorted(members) == list(range(len(X)))
+    assert tree.leaves.shape[1] == 40 and (tree.leaves >= 0).sum(axis=1).min() >= 20
+    # A training row descends to the leaf that holds it, unless it lies on a splitting hyperplane
+    found = (tree.leaf_rows(X[:100]) == np.arange(100)[:, None]).any(axis=1)
+    assert found.mean() > 0.95
+
+
+# Test that enough trees find the exact neighbours and predictions, also with identical rows in the data
+def test_approximate_matches_exact():
+    exact = KNeighborsClassifier(n_neighbors=9).fit(X, y)
+    approx = ApproximateKNeighborsClassifier(n_neighbors=9, n_trees=30, leaf_size=64, random_state=0).fit(X, y)
+
+    distances, ind = approx.kneighbors(X_query)
+    exact_distances, _ = exact.kneighbors(X_query)
+    assert np.all(np.diff(distances, axis=1) >= 0)
+    np.testing.assert_allclose(distances, np.linalg.norm(X[ind] - X_query[:, None], axis=2))
+    assert np.isclose(distances, exact_distances).mean() > 0.97
+    assert np.mean(approx.predict(X_query) != exact.predict(X_query)) < 0.03
+    assert set(approx.predict(X_query)) <= set(approx.classes_)
+    np.testing.assert_allclose(approx.predict_proba(X_query).sum(axis=1), 1)
+
+
+# Test that small leaves fall back to the exact search and that the fitted model pickles
+def test_approximate_small_leaves():
+    approx = ApproximateKNeighborsClassifier(n_neighbors=9, n_trees=1, leaf_size=8, random_state=0).fit(X[:500], y[:500])
+    exact = KNeighborsClassifier(n_neighbors=9).fit(X[:500], y[:500])
+
+    np.testing.assert_allclose(approx.kneighbors(X_query)[0], exact.kneighbors(X_query)[0])
+    restored = pickle.loads(pickle.dumps(approx))
+    np.testing.assert_array_equal(restored.predict(X_query), approx.predict(X_query))
+    with pytest.raises(ValueError, match='n_neighbors'):
+        ApproximateKNeighborsClassifier(n_neighbors=20).fit(X[:10], y[:10])
+
+
+# Test that the comparison report describes a pipeline ending in the approximate model
+def test_compare_to_exact():
+    frame = pd.DataFrame(X, columns=[f'x{i}' for i in range(6)])
+    pipe = make_pipeline(StandardScaler(), ApproximateKNeighborsClassifier(n_neighbors=9, random_state=0)).fit(frame, y)
+    report = compare_to_exact(pipe, frame.head(300), y[:300])
+
+    assert len(report) == 1 and report['n_queries'][0] == 300
+    assert 0 <= report['disagreement'][0] <= 0.1
+    assert 0.8 <= report['neighbour_recall'][0] <= 1
+    exact = make_pipeline(StandardScaler(), KNeighborsClassifier(n_neighbors=9)).fit(frame, y)
+    assert report['exact_accuracy'][0] == np.mean(exact.predict(frame.head(300)) == y[:300])
@@ -0,0 +1,71 @@
+import pytest
+import sys
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the function from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.batch_score import score_csv
+
+# Test data and model for batch scoring
+rng = np.random.default_rng(5)
+records = pd.DataFrame({
+    'AGE': rng.integers(45, 63, 80),
+    'SBP': rng.integers(90, 200, 80),
+    'sex': rng.choice(['Female', 'Male'], 80)
+})
+labels = rng.choice([0, 1], 80)
+preprocessor = make_column_transformer(
+    (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), ['AGE', 'SBP']),
+    (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+)
+model = make_pipeline(preprocessor, KNeighborsClassifier(n_neighbors=5)).fit(records, labels)
+
+
+@pytest.fixture
+def model_and_input(tmp_path):
+    model_path = tmp_path / "model.pickle"
+    with open(model_path, 'wb') as f:
+        pickle.dump(model, f)
+    input_path = tmp_path / "records.csv"
+    records.to_csv(input_path, index=False)
+    return str(model_path), str(input_path)
+
+
+# Test that chunked scoring gives the same predictions as scoring everything at once
+@pytest.mark.parametrize("n_jobs", [None, 2])
+def test_score_csv_matches_predict(model_and_input, tmp_path, n_jobs):
+    model_path, input_path = model_and_input
+    output_path = str(tmp_path / "scores.csv")
+    n_rows = score_csv(model_path, input_path, output_path, chunksize=7, n_jobs=n_jobs)
+    scores = pd.read_csv(output_path)
+
+    assert n_rows == len(records), "Every record should be scored"
+    assert list(scores.columns) == ['prediction', 'probability_0', 'probability_1']
+    assert (scores['prediction'].values == model.predict(records)).all()
+    np.testing.assert_allclose(scores[['probability_0', 'probability_1']].values, model.predict_proba(records))
+
+
+# Test that an identifier column is carried over to the output
+def test_score_csv_id_column(model_and_input, tmp_path):
+    model_path, input_path = model_and_input
+    records.assign(patient_id=np.arange(80)).to_csv(input_path, index=False)
+    output_path = str(tmp_path / "scores.csv")
+    score_csv(model_path, input_path, output_path, chunksize=30, id_column='patient_id')
+    scores = pd.read_csv(output_path)
+    assert (scores['patient_id'] == np.arange(80)).all()
+
+
+# Test that an input without rows raises an error
+def test_score_csv_empty_input(model_and_input, tmp_path):
+    model_path, input_path = model_and_input
+    records.head(0).to_csv(input_path, index=False)
+    with pytest.raises(ValueError):
+        score_csv(model_path, input_path, str(tmp_path / "scores.csv"))
@@ -0,0 +1,72 @@
+import pytest
+import sys
+import os
+import copy
+import json
+
+# Import the benchmark functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.benchmark import BENCHMARKS, compare_results, load_results, run_benchmarks, run_startup_benchmarks, save_results
+
+
+# Test that the benchmarks measure each size, skip sizes above their limit and give JSON results
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks([300, 10 ** 5 + 1], names=['split_data', 'run_knn_analysis'], repeats=2,
+                             workdir=str(tmp_path))
+    entries = {(entry['benchmark'], entry['n_rows']): entry for entry in results['results']}
+
+    assert set(entries) == {('split_data', 300), ('run_knn_analysis', 300), ('split_data', 10 ** 5 + 1),
+                            ('run_knn_analysis', 10 ** 5 + 1)}
+    assert entries['run_knn_analysis', 10 ** 5 + 1]['status'] == 'skipped'
+    measured = entries['split_data', 300]
+    assert measured['status'] == 'ok' and len(measured['seconds']) == 2
+    assert measured['best_seconds'] == min(measured['seconds']) and measured['peak_memory_mb'] > 0
+    assert results['environment']['numpy']
+    assert os.listdir(tmp_path) == []
+    json.dumps(results)
+    with pytest.raises(ValueError, match='Unknown benchmarks'):
+        run_benchmarks([300], names=['knn'])
+
+
+# Test that every benchmark runs on a small cohort
+@pytest.mark.parametrize('name', [name for name in BENCHMARKS if name not in ('split_data', 'run_knn_analysis')])
+def test_each_benchmark_runs(name, tmp_path):
+    results = run_benchmarks([400], names=[name], repeats=1, memory=False, workdir=str(tmp_path))
+    assert results['results'][0]['status'] == 'ok' and results['results'][0]['peak_memory_mb'] is None
+
+
+# Test that a slower or larger run is flagged against the baseline and that results round-trip through JSON
+def test_compare_results(tmp_path):
+    baseline = {'format': 'cardiopredict-benchmarks/1', 'results': [
+        {'benchmark': 'split_data', 'n_rows': 1000, 'status': 'ok', 'best_seconds': 1.0, 'peak_memory_mb': 10.0},
+        {'benchmark': 'preprocessing', 'n_rows': 1000, 'status': 'ok', 'best_seconds': 1.0, 'peak_memory_mb': 10.0},
+        {'benchmark': 'batch_scoring', 'n_rows': 1000, 'status': 'ok', 'best_seconds': 1.0, 'peak_memory_mb': 10.0}]}
+    results = copy.deepcopy(baseline)
+    results['results'][0].update(best_seconds=1.1)
+    results['results'][1].update(best_seconds=0.5, peak_memory_mb=20.0)
+    results['results'][2].update(status='skipped')
+
+    comparison = compare_results(results, load_results(save_results(baseline, str(tmp_path / 'b' / 'baseline.json'))))
+    assert list(comparison['benchmark']) == ['split_data', 'preprocessing']
+    assert list(comparison['regression']) == [False, True]
+    assert comparison['time_ratio'].tolist() == pytest.approx([1.1, 0.5])
+    assert list(compare_results(results, baseline, tolerance=0.05)['regression']) == [True, True]
+
+    with open(tmp_path / 'other.json', 'w') as f:
+        json.dump({'results': []}, f)
+    with pytest.raises(ValueError, match='format'):
+        load_results(str(tmp_path / 'other.json'))
+
+
+# Test that the cold start of the commands is timed in a new process and checked against its budget
+def test_run_startup_benchmarks(tmp_path):
+    results = run_startup_benchmarks({'help': 60, 'score': 0}, repeats=2, workdir=str(tmp_path))
+    help_entry, score_entry = results['results']
+
+    assert help_entry['benchmark'] == 'startup.help' and len(help_entry['seconds']) == 2
+    assert help_entry['within_budget'] and not score_entry['within_budget']
+    assert score_entry['budget_seconds'] == 0 and score_entry['best_seconds'] == min(score_entry['seconds'])
+    assert os.listdir(tmp_path) == []
+    assert list(compare_results(results, results)['regression']) == [False, False]
+    with pytest.raises(ValueError, match='Unknown commands'):
+        run_startup_benchmarks({'train': 1}, workdir=str(tmp_path))
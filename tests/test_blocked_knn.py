@@ -0,0 +1,60 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import make_pipeline as make_imb_pipeline
+from sklearn.neighbors import KNeighborsClassifier, NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+# Import the blocked kNN functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.blocked_knn import BlockedKNeighborsClassifier, blocked_kneighbors, blocked_pipeline
+from src.run_knn_analysis import run_knn_analysis
+
+# Test data: continuous features, so that neighbour distances are not tied, far from the origin so that
+# float32 cancellation matters
+rng = np.random.default_rng(5)
+fit_X = rng.normal(1000, 1, size=(1500, 5))
+X = rng.normal(1000, 1, size=(200, 5))
+y = np.where(fit_X[:, 0] > 1000.3, 'disease', 'healthy')
+
+
+# Test that the blocked search gives the exact neighbours for any block size, precision and thread count
+@pytest.mark.parametrize('block_size, dtype, n_threads', [(1024, np.float32, None), (7, np.float32, 3),
+                                                          (64, np.float64, 2), (5000, np.float32, 1)])
+def test_blocked_kneighbors_exact(block_size, dtype, n_threads):
+    expected_distances, expected_ind = NearestNeighbors(n_neighbors=9, algorithm='brute').fit(fit_X).kneighbors(X)
+    distances, ind = blocked_kneighbors(fit_X, X, 9, block_size=block_size, dtype=dtype, n_threads=n_threads)
+
+    np.testing.assert_array_equal(ind, expected_ind)
+    np.testing.assert_allclose(np.sqrt(distances), expected_distances, rtol=1e-6)
+    assert blocked_kneighbors(fit_X, X[:0], 9)[1].shape == (0, 9)
+    with pytest.raises(ValueError, match='n_neighbors'):
+        blocked_kneighbors(fit_X[:5], X, 9)
+
+
+# Test that the blocked copy of a fitted pipeline predicts as the original
+def test_blocked_pipeline_matches_model():
+    pipe = make_imb_pipeline(RandomOverSampler(random_state=0), StandardScaler(), KNeighborsClassifier(n_neighbors=9))
+    pipe.fit(fit_X, y)
+    blocked = blocked_pipeline(pipe, block_size=100)
+
+    assert isinstance(blocked[-1], BlockedKNeighborsClassifier) and blocked[-1].n_neighbors == 9
+    np.testing.assert_array_equal(blocked.predict(X), pipe.predict(X))
+    np.testing.assert_allclose(blocked.predict_proba(X), pipe.predict_proba(X))
+    with pytest.raises(ValueError, match='KNeighborsClassifier'):
+        blocked_pipeline(make_imb_pipeline(StandardScaler(), KNeighborsClassifier(weights='distance')).fit(fit_X, y))
+
+
+# Test that the analysis gives the same scores with the blocked engine
+@pytest.mark.parametrize('sweep', [True, False])
+def test_run_knn_analysis_blocked_engine(sweep):
+    X_train, y_train = pd.DataFrame(fit_X[:300]), pd.Series(y[:300])
+    param_grid = {'n_neighbors': [1, 5, 9]}
+    expected = run_knn_analysis(X_train, y_train, param_grid, preprocessor=StandardScaler(), scoring='accuracy',
+                                sweep=sweep)
+    blocked = run_knn_analysis(X_train, y_train, param_grid, preprocessor=StandardScaler(), scoring='accuracy',
+                               sweep=sweep, engine=BlockedKNeighborsClassifier(block_size=32))
+    pd.testing.assert_frame_equal(blocked, expected)
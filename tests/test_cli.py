@@ -0,0 +1,76 @@
+import pytest
+import sys
+import os
+import subprocess
+import pandas as pd
+from click.testing import CliRunner
+
+# Import the command line interface from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.batch_score import score_csv
+from src.cli import cli
+from src.model_artifact import save_artifact
+from src.pipeline_steps import fit_knn, split_and_preprocess
+from src.synthetic_data import generate_cohort
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), '..')
+HEAVY_MODULES = ['sklearn', 'imblearn', 'altair', 'matplotlib']
+cohort = generate_cohort(600, random_state=3)
+split = split_and_preprocess(cohort, seed=3, transform=False)
+pipeline = fit_knn(split.X_train, split.y_train, split.preprocessor)
+
+
+def loaded_heavy_modules(args):
+    # Run the command in a new interpreter and list the heavy libraries it imported
+    code = ("import sys; from src.cli import cli; cli(sys.argv[1:], standalone_mode=False); "
+            f"print([name for name in {HEAVY_MODULES!r} if name in sys.modules])")
+    result = subprocess.run([sys.executable, '-c', code, *args], cwd=REPO_ROOT, capture_output=True, text=True,
+                            check=True)
+    return result.stdout.splitlines()[-1]
+
+
+@pytest.fixture
+def artifact_and_input(tmp_path):
+    artifact = str(tmp_path / 'artifact')
+    save_artifact(pipeline, artifact)
+    input_file = str(tmp_path / 'records.csv')
+    split.X_test.to_csv(input_file, index=False)
+    return artifact, input_file
+
+
+# Test that every subcommand is listed and that the help starts without the modelling and plotting libraries
+def test_help_is_lazy():
+    result = CliRunner().invoke(cli, ['--help'])
+    assert result.exit_code == 0
+    for command in ['download', 'split', 'eda', 'select', 'fit', 'evaluate', 'score']:
+        assert f"  {command}" in result.output
+    assert loaded_heavy_modules(['--help']) == '[]'
+    assert loaded_heavy_modules(['fit', '--help']) == '[]'
+
+
+# Test that scoring with a model artifact gives the predictions of score_csv without importing sklearn
+def test_score_with_artifact(artifact_and_input, tmp_path):
+    artifact, input_file = artifact_and_input
+    output_file = str(tmp_path / 'scores.csv')
+    result = CliRunner().invoke(cli, ['score', '--input-file', input_file, '--output-file', output_file,
+                                      '--trained_knn_model', artifact, '--chunksize', '50'])
+    assert result.exit_code == 0 and f"{len(split.X_test)} records scored" in result.output
+
+    score_csv(artifact, input_file, str(tmp_path / 'expected.csv'))
+    pd.testing.assert_frame_equal(pd.read_csv(output_file), pd.read_csv(tmp_path / 'expected.csv'))
+    assert loaded_heavy_modules(['score', '--input-file', input_file, '--output-file', output_file,
+                                 '--trained_knn_model', artifact]) == '[]'
+
+
+# Test that the split command writes the files the model commands read by default
+def test_split(tmp_path):
+    input_file = str(tmp_path / 'cohort.csv')
+    cohort.to_csv(input_file, index=False)
+    processed, models = str(tmp_path / 'processed'), str(tmp_path / 'models')
+    result = CliRunner().invoke(cli, ['split', '--input-file', input_file, '--split-dir', processed,
+                                      '--preprocess-dir', processed, '--preprocessor-to', models])
+    assert result.exit_code == 0, result.output
+    assert os.path.exists(tmp_path / 'cohort.split.npz')
+    for name in ['X_train.csv', 'y_test.csv', 'X_test_transformed.csv']:
+        assert os.path.exists(os.path.join(processed, name)), name
+    assert os.listdir(models) == ['preprocessor.pickle']
@@ -0,0 +1,101 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import (make_scorer, accuracy_score, precision_score, recall_score, f1_score,
+                             balanced_accuracy_score)
+from sklearn.model_selection import cross_validate
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.cv_metrics import ConfusionMatrixScorer, confusion_counts, metrics_from_counts
+from src.run_knn_analysis import run_knn_analysis
+
+# Test data for the metrics engine
+rng = np.random.default_rng(11)
+train_x = pd.DataFrame({
+    'AGE': rng.normal(52, 5, 120),
+    'SBP': rng.normal(140, 20, 120),
+    'sex': rng.choice(['Female', 'Male'], 120)
+})
+train_y = pd.Series(rng.choice([0, 1], 120, p=[0.7, 0.3]), name='disease')
+preprocessor = make_column_transformer(
+    (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), ['AGE', 'SBP']),
+    (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+)
+sklearn_scoring = {
+    'accuracy': make_scorer(accuracy_score),
+    'precision': make_scorer(precision_score, pos_label=1),
+    'recall': make_scorer(recall_score, pos_label=1),
+    'f1_score': make_scorer(f1_score, pos_label=1)
+}
+engine_scoring = ConfusionMatrixScorer({'accuracy': 'accuracy', 'precision': 'precision',
+                                        'recall': 'recall', 'f1_score': 'f1'})
+
+
+# Test that the metrics match sklearn's, including the zero-division cases
+@pytest.mark.parametrize("y_pred", [
+    rng.choice([0, 1], 50),
+    np.zeros(50, dtype=int),
+    np.ones(50, dtype=int)
+])
+def test_metrics_match_sklearn(y_pred):
+    y_true = rng.choice([0, 1], 50)
+    scores = metrics_from_counts(confusion_counts(y_true, y_pred),
+                                 {'accuracy': 'accuracy', 'precision': 'precision', 'recall': 'recall',
+                                  'f1': 'f1', 'balanced_accuracy': 'balanced_accuracy'})
+    assert scores['accuracy'] == pytest.approx(accuracy_score(y_true, y_pred))
+    assert scores['precision'] == pytest.approx(precision_score(y_true, y_pred, zero_division=0))
+    assert scores['recall'] == pytest.approx(recall_score(y_true, y_pred, zero_division=0))
+    assert scores['f1'] == pytest.approx(f1_score(y_true, y_pred, zero_division=0))
+    assert scores['balanced_accuracy'] == pytest.approx(balanced_accuracy_score(y_true, y_pred))
+
+
+# Test that stacked predictions give one set of counts per row
+def test_confusion_counts_stacked():
+    y_true = np.array([1, 0, 1, 1])
+    y_pred = np.array([[1, 0, 0, 1], [0, 0, 0, 0]])
+    tp, fp, fn, tn = confusion_counts(y_true, y_pred)
+    np.testing.assert_array_equal(tp, [2, 0])
+    np.testing.assert_array_equal(fn, [1, 3])
+    np.testing.assert_array_equal(tn, [1, 1])
+
+
+# Test that the scorer predicts once and works as a cross_validate multi-metric scoring
+def test_scorer_predicts_once():
+    class CountingKNN(KNeighborsClassifier):
+        calls = 0
+
+        def predict(self, X):
+            CountingKNN.calls += 1
+            return super().predict(X)
+
+    pipe = make_pipeline(preprocessor, CountingKNN(n_neighbors=3))
+    scores = cross_validate(pipe, train_x, train_y, scoring=engine_scoring, cv=4)
+    expected = cross_validate(make_pipeline(preprocessor, KNeighborsClassifier(n_neighbors=3)),
+                              train_x, train_y, scoring=sklearn_scoring, cv=4)
+    assert CountingKNN.calls == 4, "predict should run once per fold"
+    for name in sklearn_scoring:
+        np.testing.assert_allclose(scores[f'test_{name}'], expected[f'test_{name}'])
+
+
+# Test that the kNN analysis gives the same table with the engine in every mode, including a k larger than the folds
+@pytest.mark.parametrize("mode, n_neighbors", [(dict(), [1, 3, 200]), (dict(sweep=True), [1, 3, 200]),
+                                               (dict(n_jobs=1), [1, 3, 5])])
+def test_knn_analysis_with_engine(mode, n_neighbors):
+    grid = {"n_neighbors": n_neighbors}
+    expected = run_knn_analysis(train_x, train_y, grid, preprocessor=preprocessor, scoring=sklearn_scoring, **mode)
+    result = run_knn_analysis(train_x, train_y, grid, preprocessor=preprocessor, scoring=engine_scoring, **mode)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+# Test that unknown metric names are rejected
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        ConfusionMatrixScorer(['accuracy', 'auc'])
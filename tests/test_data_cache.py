@@ -0,0 +1,59 @@
+import pytest
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Import the cache functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.data_cache import cache_dir, load_frame, save_frame
+
+# Test data with the Framingham column types, including missing values
+frame = pd.DataFrame({
+    'AGE': [45, 61, 52, 38],
+    'FRW': [101.5, np.nan, 130.0, 88.2],
+    'sex': ['Male', 'Female', np.nan, 'Male'],
+    'disease': [0, 1, 0, 1],
+})
+
+
+# Test that the cached frame equals the CSV and memory-maps the numeric columns
+def test_save_and_load_frame(tmp_path):
+    path = str(tmp_path / 'train_data.csv')
+    save_frame(frame, path)
+    loaded = load_frame(path)
+
+    assert os.path.isdir(cache_dir(path))
+    pd.testing.assert_frame_equal(loaded, pd.read_csv(path))
+    assert isinstance(loaded['FRW'].values, np.memmap)
+    assert not isinstance(load_frame(path, mmap=False)['FRW'].values, np.memmap)
+
+
+# Test that a Series round-trips and is squeezed back to a Series
+def test_load_frame_squeeze(tmp_path):
+    path = str(tmp_path / 'y_train.csv')
+    save_frame(frame['disease'], path)
+    pd.testing.assert_series_equal(load_frame(path, squeeze=True), pd.read_csv(path).squeeze())
+    assert isinstance(load_frame(path), pd.DataFrame)
+
+
+# Test that the CSV is read when there is no cache or it is older than the CSV
+def test_load_frame_falls_back_to_csv(tmp_path):
+    path = str(tmp_path / 'X_train.csv')
+    frame.to_csv(path, index=False)
+    assert not isinstance(load_frame(path)['FRW'].values, np.memmap)
+
+    save_frame(frame, path)
+    time.sleep(0.01)
+    frame.assign(AGE=frame['AGE'] + 1).to_csv(path, index=False)
+    assert list(load_frame(path)['AGE']) == [46, 62, 53, 39]
+
+
+# Test that columns of unsupported types leave only the CSV
+def test_save_frame_unsupported_column(tmp_path):
+    path = str(tmp_path / 'mixed.csv')
+    save_frame(frame, path)
+    assert save_frame(frame.assign(visit=pd.to_datetime(['2020-01-01'] * 4)), path) is None
+    assert not os.path.exists(cache_dir(path)), "The older cache and the columns before the datetime one are removed"
+    pd.testing.assert_frame_equal(load_frame(path), pd.read_csv(path))
@@ -0,0 +1,98 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import make_pipeline as make_imb_pipeline
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the class from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.fast_predictor import FastKNNPredictor
+from src.knn_votes import nearest_rows
+from src.weighted_knn import CountWeightedKNeighborsClassifier
+
+# Test data for the compiled predictor
+rng = np.random.default_rng(6)
+X = pd.DataFrame({
+    'AGE': rng.integers(45, 63, 120).astype(float),
+    'sex': rng.choice(['Female', 'Male'], 120),
+    'SBP': rng.normal(140, 25, 120),
+    'CHOL': rng.normal(230, 40, 120)
+})
+X.loc[rng.choice(120, 10, replace=False), 'CHOL'] = np.nan
+y = rng.choice([0, 1], 120, p=[0.8, 0.2])
+X_new = X.sample(30, random_state=1).reset_index(drop=True)
+X_new.loc[[0, 5], 'SBP'] = np.nan
+
+
+def make_preprocessor():
+    return make_column_transformer(
+        (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), ['AGE', 'SBP', 'CHOL']),
+        (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+    )
+
+
+pipelines = [
+    make_imb_pipeline(RandomOverSampler(random_state=0), make_preprocessor(), KNeighborsClassifier(n_neighbors=7)),
+    make_pipeline(make_preprocessor(), CountWeightedKNeighborsClassifier(n_neighbors=7, random_state=0)),
+    make_pipeline(make_preprocessor(), KNeighborsClassifier(n_neighbors=1))
+]
+
+
+# Test that the compiled predictor reproduces the pipeline on dict and sequence rows
+@pytest.mark.parametrize("pipeline", pipelines)
+def test_fast_predictor_matches_pipeline(pipeline):
+    fitted = pipeline.fit(X, y)
+    fast = FastKNNPredictor.from_pipeline(fitted)
+    expected_proba = fitted.predict_proba(X_new)
+    expected = fitted.predict(X_new)
+    for i, record in enumerate(X_new.to_dict('records')):
+        np.testing.assert_allclose(fast.predict_proba(record), expected_proba[i])
+        assert fast.predict(list(X_new.iloc[i])) == expected[i]
+
+
+# Test that missing dict keys are imputed and unknown categories are rejected
+def test_fast_predictor_missing_and_unknown():
+    fitted = pipelines[0].fit(X, y)
+    fast = FastKNNPredictor.from_pipeline(fitted)
+    record = {'AGE': 50.0, 'sex': 'Male', 'SBP': 150.0}
+    expected = fitted.predict_proba(pd.DataFrame([{**record, 'CHOL': np.nan}]))[0]
+    np.testing.assert_allclose(fast.predict_proba(record), expected)
+    with pytest.raises(ValueError):
+        fast.predict({**record, 'sex': 'Unknown'})
+
+
+# Test that a saved predictor gives the same output after loading
+def test_fast_predictor_save_load(tmp_path):
+    fast = FastKNNPredictor.from_pipeline(pipelines[1].fit(X, y))
+    path = str(tmp_path / "fast.pickle")
+    fast.save(path)
+    loaded = FastKNNPredictor.load(path)
+    record = X_new.iloc[3].to_dict()
+    np.testing.assert_array_equal(loaded.predict_proba(record), fast.predict_proba(record))
+
+
+# Test that unsupported pipelines are rejected
+def test_fast_predictor_unsupported():
+    with pytest.raises(ValueError):
+        FastKNNPredictor.from_pipeline(make_pipeline(make_preprocessor(), KNeighborsClassifier(weights='distance')).fit(X, y))
+
+
+# Test that the blocked neighbour search gives the brute-force neighbours for any block sizes
+@pytest.mark.parametrize("block_size, fit_block_size", [(256, 4096), (7, 5), (1, 1)])
+def test_nearest_rows_blocks(block_size, fit_block_size):
+    fit_X, queries = rng.normal(size=(40, 3)), rng.normal(size=(13, 3))
+    fit_X[10] = fit_X[3]
+    squared = ((queries[:, None, :] - fit_X[None, :, :]) ** 2).sum(axis=2)
+    expected = np.lexsort((np.broadcast_to(np.arange(40), squared.shape), squared), axis=1)[:, :6]
+
+    distances, indices = nearest_rows(fit_X, queries, 6, block_size=block_size, fit_block_size=fit_block_size)
+    np.testing.assert_array_equal(indices, expected)
+    np.testing.assert_allclose(distances, np.take_along_axis(squared, expected, axis=1))
+    assert nearest_rows(fit_X[:4], queries, 6)[1].shape == (13, 4)
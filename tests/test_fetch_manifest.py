@@ -0,0 +1,125 @@
+import pytest
+import sys
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+
+# Import the fetch functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.fetch_manifest import REPORT_COLUMNS, fetch_manifest, read_manifest
+
+# Test data: one small CSV shard per region
+SHARDS = {f'/region{i}.csv': f"AGE,SBP\n{40 + i},{120 + i}\n{50 + i},{130 + i}\n".encode() for i in range(6)}
+
+
+class ShardHandler(BaseHTTPRequestHandler):
+    '''Serves the shards slowly, counting concurrent requests; paths in `server.failures` answer 503 first.'''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.requests.append(self.path)
+            fail = server.failures.get(self.path, 0)
+            if fail:
+                server.failures[self.path] = fail - 1
+        time.sleep(0.05)
+        if fail or self.path not in SHARDS:
+            self.send_response(503 if fail else 404)
+            body = b''
+        else:
+            self.send_response(200)
+            body = SHARDS[self.path]
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ShardHandler)
+    httpd.lock = threading.Lock()
+    httpd.active = httpd.peak = 0
+    httpd.requests = []
+    httpd.failures = {}
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.url = f'http://127.0.0.1:{httpd.server_address[1]}'
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def manifest_entries(server, tmp_path, paths):
+    return [{'url': server.url + path, 'filepath': str(tmp_path / 'raw' / path.strip('/'))} for path in paths]
+
+
+# Test that the shards are downloaded concurrently within the limit and reported in manifest order
+def test_fetch_manifest_concurrent(server, tmp_path):
+    entries = manifest_entries(server, tmp_path, SHARDS)
+    report = fetch_manifest(entries, max_workers=3, report_path=str(tmp_path / 'report.csv'))
+
+    assert list(report.columns) == REPORT_COLUMNS
+    assert list(report['url']) == [entry['url'] for entry in entries]
+    assert (report['status'] == 'ok').all()
+    assert 1 < server.peak <= 3
+    for entry in entries:
+        with open(entry['filepath'], 'rb') as f:
+            assert f.read() == SHARDS['/' + os.path.basename(entry['filepath'])]
+    assert len(pd.read_csv(tmp_path / 'report.csv')) == len(SHARDS)
+
+
+# Test that transient server errors are retried and permanent ones are reported without stopping the rest
+def test_fetch_manifest_retries(server, tmp_path):
+    server.failures = {'/region0.csv': 2, '/region1.csv': 5}
+    entries = manifest_entries(server, tmp_path, ['/region0.csv', '/region1.csv', '/missing.csv', '/region2.csv'])
+    report = fetch_manifest(entries, max_workers=2, retries=2, backoff=0.01).set_index('url')
+
+    retried, exhausted, missing, plain = (report.loc[entry['url']] for entry in entries)
+    assert retried['status'] == 'ok' and retried['attempts'] == 3
+    assert exhausted['status'] == 'failed' and exhausted['attempts'] == 3 and '503' in exhausted['error']
+    assert missing['status'] == 'failed' and missing['attempts'] == 1 and 'inaccessible' in missing['error']
+    assert plain['status'] == 'ok' and plain['attempts'] == 1 and plain['bytes'] == len(SHARDS['/region2.csv'])
+
+
+# Test that an invalid URL and an unwritable filepath fail at once without stopping the other shards
+def test_fetch_manifest_invalid_entries(server, tmp_path):
+    (tmp_path / 'blocked').write_text('a file, not a directory')
+    entries = manifest_entries(server, tmp_path, ['/region0.csv', '/region1.csv'])
+    entries += [{'url': 'region2.csv', 'filepath': str(tmp_path / 'raw' / 'region2.csv')},
+                {'url': server.url + '/region3.csv', 'filepath': str(tmp_path / 'blocked' / 'region3.csv')}]
+    report = fetch_manifest(entries, max_workers=2, retries=2, backoff=0.01,
+                            report_path=str(tmp_path / 'report.csv'))
+
+    assert list(report['status']) == ['ok', 'ok', 'failed', 'failed']
+    assert list(report['attempts']) == [1, 1, 1, 1]
+    assert 'MissingSchema' in report.loc[2, 'error']
+    assert 'FileExistsError' in report.loc[3, 'error']
+    assert len(pd.read_csv(tmp_path / 'report.csv')) == 4
+
+
+# Test that a manifest CSV is read with optional checksums
+def test_read_manifest(tmp_path):
+    pd.DataFrame({'url': ['http://a/x.csv', 'http://a/y.csv'], 'filepath': ['x.csv', 'y.csv'],
+                  'sha256': ['ab' * 32, None]}).to_csv(tmp_path / 'manifest.csv', index=False)
+    entries = read_manifest(str(tmp_path / 'manifest.csv'))
+    assert entries[0]['sha256'] == 'ab' * 32 and entries[1]['sha256'] is None
+
+    pd.DataFrame({'url': ['http://a/x.csv']}).to_csv(tmp_path / 'bad.csv', index=False)
+    with pytest.raises(ValueError, match='filepath'):
+        read_manifest(str(tmp_path / 'bad.csv'))
+
+    # Two rows downloading to the same file are rejected
+    pd.DataFrame({'url': ['http://a/x.csv', 'http://b/x.csv'],
+                  'filepath': ['x.csv', './x.csv']}).to_csv(tmp_path / 'duplicate.csv', index=False)
+    with pytest.raises(ValueError, match='both downloaded'):
+        read_manifest(str(tmp_path / 'duplicate.csv'))
@@ -0,0 +1,110 @@
+import pytest
+import sys
+import os
+import pickle
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.fold_cache import FoldTransformCache
+from src.run_knn_analysis import run_knn_analysis
+from src.run_hyperparameter_knn import run_hyperparameter_knn
+from src.logistic_regression_evaluation import evaluate_logistic_regression
+
+# Test data for the cached sweeps
+rng = np.random.default_rng(10)
+train_x = pd.DataFrame({
+    'AGE': rng.normal(52, 5, 100),
+    'SBP': rng.normal(140, 20, 100),
+    'sex': rng.choice(['Female', 'Male'], 100)
+})
+train_y = pd.Series(rng.choice([0, 1], 100, p=[0.7, 0.3]), name='disease')
+
+preprocessor = make_column_transformer(
+    (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), ['AGE', 'SBP']),
+    (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+)
+scoring = {'accuracy': 'accuracy', 'recall': 'recall'}
+param_grid = {"n_neighbors": [1, 3, 5]}
+
+
+# Test that caching the fold transforms does not change the kNN analysis
+@pytest.mark.parametrize("sweep", [False, True])
+def test_knn_analysis_cached_matches_uncached(sweep):
+    cache = FoldTransformCache()
+    expected = run_knn_analysis(train_x, train_y, param_grid, preprocessor=preprocessor, scoring=scoring, sweep=sweep)
+    cached = run_knn_analysis(train_x, train_y, param_grid, preprocessor=preprocessor, scoring=scoring,
+                              sweep=sweep, cache=cache)
+    pd.testing.assert_frame_equal(cached, expected)
+    assert cache.misses > 0, "Every fold should be fitted once"
+    if not sweep:
+        assert cache.hits > 0, "Later values of k should reuse the fold transforms"
+
+
+# Test that the hyperparameter search fits each fold's preprocessor once
+def test_hyperparameter_knn_reuses_folds():
+    cache = FoldTransformCache()
+    expected = run_hyperparameter_knn(train_x, train_y, param_grid, preprocessor)
+    cached = run_hyperparameter_knn(train_x, train_y, param_grid, preprocessor, cache=cache)
+    pd.testing.assert_frame_equal(cached, expected)
+    assert cache.misses == 5, "One preprocessor fit per fold is expected"
+    assert cache.hits == 5 * (len(param_grid["n_neighbors"]) - 1)
+
+
+# Test that the logistic regression grid search gives the same results with the cache
+def test_logistic_regression_cached():
+    X = train_x.assign(DBP=rng.normal(80, 10, 100))
+    expected = evaluate_logistic_regression(X, train_y, X, train_y, ['AGE', 'SBP', 'DBP'], ['sex'])
+    cached = evaluate_logistic_regression(X, train_y, X, train_y, ['AGE', 'SBP', 'DBP'], ['sex'],
+                                          cache=FoldTransformCache())
+    pd.testing.assert_frame_equal(cached['grid_search_results'], expected['grid_search_results'])
+    assert (cached['confusion_matrix'] == expected['confusion_matrix']).all()
+
+
+# Test that the cache stays within its memory budget
+def test_cache_eviction():
+    cache = FoldTransformCache(max_bytes=4000)
+    folds = [(np.arange(0, 80), np.arange(80, 100)), (np.arange(20, 100), np.arange(0, 20))]
+    for train, test in folds:
+        cache.transform(preprocessor, train_x, train_y, train, test)
+    assert cache.nbytes <= cache.max_bytes, "The cache should evict entries above its budget"
+    assert len(cache) == 1, "Only the most recently used fold fits in this budget"
+    cache.transform(preprocessor, train_x, train_y, *folds[1])
+    assert cache.hits == 1
+
+
+# Test that an analysis hashes the data once rather than on every cache lookup
+def test_cache_hashes_data_once(monkeypatch):
+    hashed = []
+    joblib_hash = joblib.hash
+    monkeypatch.setattr(joblib, 'hash', lambda obj, *args, **kwargs: (
+        hashed.append(isinstance(obj, pd.DataFrame)), joblib_hash(obj, *args, **kwargs))[1])
+    cache = FoldTransformCache()
+    run_hyperparameter_knn(train_x, train_y, {'n_neighbors': [1, 3, 5]}, preprocessor, cache=cache)
+    assert cache.hits == 10 and cache.misses == 5
+    assert sum(hashed) == 1, "The data should be fingerprinted once per analysis"
+
+
+# Test that pickling a cache inside the same process gives back the same cache
+def test_cache_pickles_to_same_instance():
+    cache = FoldTransformCache()
+    assert pickle.loads(pickle.dumps(cache)) is cache
+
+
+# Test that the cache is keyed on the content of the data, not on the object passed in
+def test_cache_keys_on_data_content():
+    cache = FoldTransformCache()
+    X = train_x.copy()
+    train, test = np.arange(0, 80), np.arange(80, 100)
+    cache.transform(preprocessor, X, train_y, train, test)
+    cache.transform(preprocessor, X.copy(), train_y, train, test)
+    assert cache.hits == 1, "An equal copy of the data should reuse the fit"
+    X.loc[0, 'AGE'] += 1
+    cache.transform(preprocessor, X, train_y, train, test)
+    assert cache.misses == 2, "Changing the data in place should not reuse a stale fit"
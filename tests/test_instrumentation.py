@@ -0,0 +1,109 @@
+import pytest
+import sys
+import os
+import json
+import click
+import numpy as np
+import pandas as pd
+from click.testing import CliRunner
+from sklearn.neighbors import KNeighborsClassifier
+
+# Import the instrumentation functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.instrumentation import TRACE_DIR_VARIABLE, PROFILE_VARIABLE, instrumented, span, trace_run
+from src.run_knn_analysis import run_knn_analysis
+
+X = pd.DataFrame({'feature1': np.arange(40, dtype=float), 'feature2': np.arange(40, dtype=float) % 7})
+y = pd.Series([0, 1] * 20)
+
+
+# Test that spans nest, record their timings and are summarised per name
+def test_trace_run_records_nested_spans():
+    with trace_run('run') as tracer:
+        with span('outer', size=3):
+            for _ in range(2):
+                with span('inner'):
+                    sum(range(10000))
+    outer, inner = tracer.spans[1], tracer.spans[2]
+
+    assert [record['name'] for record in tracer.spans] == ['run', 'outer', 'inner', 'inner']
+    assert outer['parent'] == 0 and inner['parent'] == outer['id'] and inner['depth'] == 2
+    assert outer['attributes'] == {'size': 3}
+    assert outer['wall_seconds'] >= inner['wall_seconds'] > 0 and outer['peak_rss_mb'] > 0
+    summary = tracer.summary().set_index('span')
+    assert summary.loc['inner', 'count'] == 2 and summary.loc['run', 'share_of_run'] == 1
+    assert summary.loc['inner', 'wall_seconds'] == pytest.approx(inner['wall_seconds'] + tracer.spans[3]['wall_seconds'])
+
+
+# Test that spans are still recorded without the resource module, as on Windows, with no memory figures
+def test_trace_run_without_resource(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, 'resource', None)
+    with trace_run('run') as tracer:
+        with span('inner'):
+            sum(range(10000))
+    assert tracer.spans[1]['peak_rss_mb'] is None and tracer.spans[1]['rss_growth_mb'] is None
+    summary = tracer.summary().set_index('span')
+    assert summary.loc['inner', 'count'] == 1 and np.isnan(summary.loc['inner', 'peak_rss_mb'])
+    trace_path, _ = tracer.write(str(tmp_path))
+    with open(trace_path) as f:
+        assert json.load(f)['spans'][1]['peak_rss_mb'] is None
+
+
+# Test that spans outside a run are not recorded and that a failing span records its error
+def test_span_without_run_and_errors():
+    with span('untraced') as record:
+        assert record is None
+
+    with pytest.raises(ValueError):
+        with trace_run('run') as tracer:
+            with span('failing'):
+                raise ValueError
+    assert tracer.spans[1]['error'] == 'ValueError' and 'wall_seconds' in tracer.spans[1]
+    with span('after') as record:
+        assert record is None
+
+
+# Test that the cross-validation records one fit and one predict span per fold
+def test_cross_validation_spans():
+    with trace_run('cv') as tracer:
+        run_knn_analysis(X, y, {'n_neighbors': [1, 3]}, n_jobs=1)
+    counts = tracer.summary().set_index('span')['count']
+    assert counts['fold.fit'] == counts['fold.predict'] == 2 * 2 * 20
+
+    with trace_run('sweep') as tracer:
+        run_knn_analysis(X, y, {'n_neighbors': [1, 3]}, sweep=True)
+    counts = tracer.summary().set_index('span')['count']
+    assert counts['fold.preprocess'] == counts['fold.predict'] == 2 * 20
+
+
+# Test that tasks run in worker processes are traced as one run_tasks span with their number of jobs
+def test_parallel_tasks_span():
+    with trace_run('parallel') as tracer:
+        run_knn_analysis(X, y, {'n_neighbors': [1, 3]}, n_jobs=2)
+    pool = [record for record in tracer.spans if record['name'] == 'run_tasks']
+    assert len(pool) == 1
+    assert pool[0]['attributes'] == {'func': 'fit_and_score', 'n_tasks': 2 * 2 * 20, 'n_jobs': 2}
+    assert 'fold.fit' not in {record['name'] for record in tracer.spans}
+
+
+# Test that an instrumented command writes its trace, summary and profile only when asked to
+def test_instrumented_command(tmp_path):
+    @click.command()
+    @click.option('--n', type=int, default=3)
+    @instrumented('command')
+    def main(n):
+        with span('work', n=n):
+            KNeighborsClassifier(n_neighbors=n).fit(X, y).predict(X)
+
+    runner = CliRunner()
+    assert runner.invoke(main, ['--n', '5']).exit_code == 0
+
+    result = runner.invoke(main, ['--n', '5'], env={TRACE_DIR_VARIABLE: str(tmp_path), PROFILE_VARIABLE: '1'})
+    assert result.exit_code == 0 and 'Trace written to' in result.output
+    files = sorted(os.listdir(tmp_path))
+    assert [os.path.splitext(name)[1] for name in files] == ['.prof', '.csv', '.json']
+    with open(tmp_path / files[2]) as f:
+        trace = json.load(f)
+    assert trace['format'] == 'cardiopredict-trace/1' and trace['run'] == 'command'
+    assert trace['spans'][1]['name'] == 'work' and trace['spans'][1]['attributes'] == {'n': 5}
+    assert list(pd.read_csv(tmp_path / files[1])['span']) == ['command', 'work']
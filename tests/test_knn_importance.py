@@ -0,0 +1,71 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import make_pipeline as make_imb_pipeline
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.inspection import permutation_importance
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the function from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.knn_importance import knn_permutation_importance, permutation_indices
+from src.weighted_knn import CountWeightedKNeighborsClassifier
+
+# Test data for the permutation importance
+rng = np.random.default_rng(9)
+X = pd.DataFrame({
+    'AGE': rng.integers(45, 63, 150).astype(float),
+    'SBP': rng.normal(140, 25, 150),
+    'sex': rng.choice(['Female', 'Male'], 150),
+    'CHOL': rng.normal(230, 40, 150)
+})
+X.loc[rng.choice(150, 8, replace=False), 'SBP'] = np.nan
+y = ((X['AGE'] - 54) / 5 + rng.normal(0, 1, 150) > 0.5).astype(int)
+
+
+def make_preprocessor():
+    return make_column_transformer(
+        (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), ['AGE', 'SBP', 'CHOL']),
+        (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+    )
+
+
+# Test that the importances equal sklearn's for the same random state
+@pytest.mark.parametrize("pipeline, scoring", [
+    (make_imb_pipeline(RandomOverSampler(random_state=0), make_preprocessor(), KNeighborsClassifier(n_neighbors=9)), None),
+    (make_pipeline(make_preprocessor(), KNeighborsClassifier(n_neighbors=3)), 'recall'),
+    (make_pipeline(make_preprocessor(), CountWeightedKNeighborsClassifier(n_neighbors=5, random_state=0)), None)
+])
+def test_knn_permutation_importance_matches_sklearn(pipeline, scoring):
+    fitted = pipeline.fit(X, y)
+    expected = permutation_importance(fitted, X, y, scoring=scoring, n_repeats=12, random_state=123)
+    result = knn_permutation_importance(fitted, X, y, scoring=scoring, n_repeats=12, random_state=123,
+                                        repeats_per_task=5)
+    np.testing.assert_allclose(result.importances, expected.importances)
+    np.testing.assert_allclose(result.importances_mean, expected.importances_mean)
+
+
+# Test that the result does not depend on the number of workers
+def test_knn_permutation_importance_n_jobs():
+    fitted = make_pipeline(make_preprocessor(), KNeighborsClassifier(n_neighbors=5)).fit(X, y)
+    serial = knn_permutation_importance(fitted, X, y, n_repeats=4, random_state=1)
+    parallel = knn_permutation_importance(fitted, X, y, n_repeats=4, random_state=1, n_jobs=2, repeats_per_task=2)
+    np.testing.assert_array_equal(serial.importances, parallel.importances)
+
+
+# Test that the row orders compose the shuffles like sklearn does
+def test_permutation_indices():
+    orders = permutation_indices(10, 3, 42)
+    random_state = np.random.RandomState(42)
+    column = np.arange(10)
+    shuffling_idx = np.arange(10)
+    for order in orders:
+        random_state.shuffle(shuffling_idx)
+        column = column[shuffling_idx]
+        np.testing.assert_array_equal(order, column)
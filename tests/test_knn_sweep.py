@@ -0,0 +1,57 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the sweep and analysis functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.knn_sweep import sweep_knn_cv
+from src.run_knn_analysis import run_knn_analysis
+
+# Test data with continuous features so that neighbour distances are not tied
+rng = np.random.default_rng(2023)
+train_x = pd.DataFrame({
+    'AGE': rng.normal(52, 5, 120),
+    'SBP': rng.normal(140, 20, 120),
+    'CHOL': rng.normal(230, 40, 120),
+    'sex': rng.choice(['Female', 'Male'], 120)
+})
+train_y = pd.Series(rng.choice([0, 1], 120, p=[0.75, 0.25]), name='disease')
+
+preprocessor = make_column_transformer(
+    (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), ['AGE', 'SBP', 'CHOL']),
+    (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+)
+scoring = {'accuracy': 'accuracy', 'recall': 'recall', 'f1_score': 'f1'}
+param_grid = {"n_neighbors": np.arange(1, 16, 2)}
+
+
+# Test that the sweep reproduces one cross_validate run per k
+def test_sweep_matches_cross_validate():
+    expected = run_knn_analysis(train_x, train_y, param_grid, preprocessor=preprocessor, scoring=scoring)
+    swept = run_knn_analysis(train_x, train_y, param_grid, preprocessor=preprocessor, scoring=scoring, sweep=True)
+    assert list(swept.columns) == list(expected.columns), "Sweep mode should return the same columns"
+    assert swept.shape == expected.shape, "Sweep mode should return one row per k and model"
+    pd.testing.assert_frame_equal(swept, expected)
+
+
+# Test the per-fold output of the sweep
+def test_sweep_fold_scores():
+    scores = sweep_knn_cv(train_x, train_y, [1, 3, 5], preprocessor=preprocessor, scoring=scoring, cv=5)
+    assert set(scores.keys()) == {1, 3, 5}, "Every k should appear in the sweep results"
+    for k_scores in scores.values():
+        assert set(k_scores.keys()) == {'test_accuracy', 'test_recall', 'test_f1_score'}
+        assert all(len(fold_scores) == 5 for fold_scores in k_scores.values()), "One score per fold is expected"
+        assert all(0 <= score <= 1 for score in k_scores['test_accuracy'])
+
+
+# Test that a k larger than the training fold is reported as missing rather than raising
+def test_sweep_k_larger_than_fold():
+    scores = sweep_knn_cv(train_x, train_y, [1, 200], preprocessor=preprocessor, cv=5)
+    assert np.isnan(scores[200]['test_score']).all(), "k above the fold size should give NaN scores"
+    assert not np.isnan(scores[1]['test_score']).any()
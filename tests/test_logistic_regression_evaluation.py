@@ -14,6 +14,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 # import module
 from src.logistic_regression_evaluation import evaluate_logistic_regression
+from src.logistic_path import LogisticRegressionPathCV
 
 
 # Test data for 'evaluate_logistic_regression'
@@ -121,3 +122,34 @@ def test_evaluate_logistic_regression_grid_search_results():
     for col in ['std_train_score', 'std_test_score']:
         assert (gs_res[col] >= 0).all(), f"Standard deviations in column {col} should be non-negative"
 
+
+# Test that the warm-started path mode returns the same result structure
+def test_evaluate_logistic_regression_path_mode():
+    results = evaluate_logistic_regression(
+        X_train, y_train, X_test, y_test, numeric_features, categorical_features, path=True
+    )
+    path = results['grid_search_object']
+    gs_res = results['grid_search_results']
+
+    assert isinstance(path, LogisticRegressionPathCV), "path=True should return a LogisticRegressionPathCV object"
+    assert results['confusion_matrix'].shape == (2, 2)
+    assert 'recall' in results['classification_report']
+    assert hasattr(path.best_estimator_.named_steps['logisticregression'], 'coef_')
+    assert len(gs_res) == 10
+    assert (gs_res['rank_test_score'] == sorted(gs_res['rank_test_score'])).all()
+    assert path.best_params_['logisticregression__C'] == gs_res['param_logisticregression__C'].iloc[0]
+
+
+# Test that the warm-started scores agree with independent fits up to the solver tolerance
+def test_logistic_path_matches_grid_search():
+    Cs = 10.0 ** np.arange(-3, 3, 1)
+    grid = evaluate_logistic_regression(
+        X_train, y_train, X_test, y_test, numeric_features, categorical_features, Cs=Cs
+    )['grid_search_object']
+    path = evaluate_logistic_regression(
+        X_train, y_train, X_test, y_test, numeric_features, categorical_features, path=True, Cs=Cs
+    )['grid_search_object']
+
+    for key in ['mean_train_score', 'mean_test_score']:
+        np.testing.assert_allclose(path.cv_results_[key], grid.cv_results_[key], atol=0.05)
+    assert path.n_splits_ == grid.n_splits_
@@ -0,0 +1,78 @@
+import pytest
+import sys
+import os
+import json
+import pickle
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import RandomOverSampler
+from imblearn.pipeline import make_pipeline as make_imb_pipeline
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.model_artifact import METADATA_FILE, load_artifact, load_model, save_artifact
+
+# Test data and model for the artifact format
+rng = np.random.default_rng(8)
+X = pd.DataFrame({
+    'AGE': rng.integers(45, 63, 100).astype(float),
+    'CHOL': rng.normal(230, 40, 100),
+    'sex': rng.choice(['Female', 'Male'], 100)
+})
+X.loc[[3, 7], 'CHOL'] = np.nan
+y = rng.choice([0, 1], 100, p=[0.75, 0.25])
+preprocessor = make_column_transformer(
+    (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), ['AGE', 'CHOL']),
+    (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+)
+model = make_imb_pipeline(RandomOverSampler(random_state=1), preprocessor, KNeighborsClassifier(n_neighbors=5)).fit(X, y)
+
+
+# Test that the memory-mapped artifact predicts like the pipeline it was saved from
+@pytest.mark.parametrize("mmap", [True, False])
+def test_artifact_round_trip(tmp_path, mmap):
+    directory = str(tmp_path / "artifact")
+    save_artifact(model, directory)
+    loaded = load_artifact(directory, mmap=mmap)
+
+    np.testing.assert_allclose(loaded.predict_proba(X), model.predict_proba(X))
+    assert (loaded.predict(X) == model.predict(X)).all()
+    # Memory-mapped arrays are opened read-only
+    assert loaded.fit_X.flags.writeable != mmap
+
+
+# Test that the metadata is small JSON and the arrays are raw .npy files
+def test_artifact_layout(tmp_path):
+    directory = str(tmp_path / "artifact")
+    save_artifact(model, directory)
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    assert metadata['classes'] == [0, 1] and metadata['n_neighbors'] == 5
+    assert sorted(os.listdir(directory)) == ['counts.npy', 'fit_X.npy', METADATA_FILE, 'y.npy']
+
+
+# Test that load_model reads both pickles and artifact directories
+def test_load_model_formats(tmp_path):
+    pickle_path = str(tmp_path / "model.pickle")
+    with open(pickle_path, 'wb') as f:
+        pickle.dump(model, f)
+    directory = str(tmp_path / "artifact")
+    save_artifact(model, directory)
+
+    from_pickle, from_artifact = load_model(pickle_path), load_model(directory)
+    assert (from_pickle.predict(X) == from_artifact.predict(X)).all()
+
+
+# Test that an unknown artifact format is rejected
+def test_artifact_format_check(tmp_path):
+    directory = str(tmp_path / "artifact")
+    save_artifact(model, directory)
+    with open(os.path.join(directory, METADATA_FILE), 'w') as f:
+        json.dump({"format": "other"}, f)
+    with pytest.raises(ValueError):
+        load_artifact(directory)
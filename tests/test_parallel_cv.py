@@ -0,0 +1,105 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sklearn.compose import make_column_transformer
+from sklearn.exceptions import FitFailedWarning
+from sklearn.impute import SimpleImputer
+from sklearn.model_selection import StratifiedKFold, cross_validate
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.fold_cache import FoldTransformCache
+from src.parallel_cv import fit_and_score, run_tasks, shareable, stack_fold_scores
+from src.run_knn_analysis import run_knn_analysis
+from src.run_hyperparameter_knn import run_hyperparameter_knn
+
+# Test data for the parallel sweeps
+rng = np.random.default_rng(522)
+train_x = pd.DataFrame({
+    'AGE': rng.normal(52, 5, 100),
+    'SBP': rng.normal(140, 20, 100),
+    'sex': rng.choice(['Female', 'Male'], 100)
+})
+train_y = pd.Series(rng.choice([0, 1], 100, p=[0.7, 0.3]), name='disease')
+
+preprocessor = make_column_transformer(
+    (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), ['AGE', 'SBP']),
+    (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+)
+scoring = {'accuracy': 'accuracy', 'recall': 'recall'}
+param_grid = {"n_neighbors": [1, 3, 5]}
+
+
+class FailingScaler(StandardScaler):
+    # Fails on every fold whose training part holds the oldest patient
+    def fit(self, X, y=None, sample_weight=None):
+        if (np.asarray(X)[:, 0] == train_x['AGE'].max()).any():
+            raise ValueError("The oldest patient is in the training part.")
+        return super().fit(X, y, sample_weight)
+
+
+# Test that the parallel kNN analysis gives the same results as the serial one
+@pytest.mark.parametrize("sweep", [False, True])
+def test_knn_analysis_parallel_matches_serial(sweep):
+    serial = run_knn_analysis(train_x, train_y, param_grid, preprocessor=preprocessor, scoring=scoring, sweep=sweep)
+    parallel = run_knn_analysis(train_x, train_y, param_grid, preprocessor=preprocessor, scoring=scoring,
+                                sweep=sweep, n_jobs=2)
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+# Test that the parallel hyperparameter search gives the same results as the serial one
+def test_hyperparameter_knn_parallel_matches_serial():
+    serial = run_hyperparameter_knn(train_x, train_y, param_grid, preprocessor)
+    parallel = run_hyperparameter_knn(train_x, train_y, param_grid, preprocessor, n_jobs=2)
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+# Test that string columns are stored as categoricals before being shared
+def test_shareable_converts_object_columns():
+    shared = shareable(train_x)
+    assert isinstance(shared['sex'].dtype, pd.CategoricalDtype), "Object columns should become categoricals"
+    assert shared['AGE'].dtype == train_x['AGE'].dtype, "Numeric columns should be left untouched"
+    assert (shared['sex'].astype(str) == train_x['sex']).all()
+
+
+# Test that a failed fit scores NaN with the warning of cross_validate, serially and in parallel
+@pytest.mark.parametrize("n_jobs", [None, 2])
+def test_failed_fit_scores_nan(n_jobs):
+    failing = make_column_transformer((FailingScaler(), ['AGE', 'SBP']),
+                                      (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex']))
+    with pytest.warns(FitFailedWarning, match="4 fits failed out of a total of 5"):
+        results = run_hyperparameter_knn(train_x, train_y, param_grid, failing, n_jobs=n_jobs)
+    assert results['mean_cv_score'].isna().all() and results['mean_train_score'].isna().all()
+
+    folds = list(StratifiedKFold(5).split(train_x, train_y))
+    with pytest.warns(FitFailedWarning, match="4 fits failed out of a total of 5"):
+        expected = cross_validate(make_pipeline(failing, KNeighborsClassifier()), train_x, train_y, cv=folds)
+    tasks = [(KNeighborsClassifier(), train_x, train_y, train, test, None, False, failing) for train, test in folds]
+    with pytest.warns(FitFailedWarning, match="4 fits failed out of a total of 5"):
+        scores = stack_fold_scores(run_tasks(fit_and_score, tasks, n_jobs=n_jobs))
+    np.testing.assert_array_equal(scores['test_score'], expected['test_score'])
+
+
+# Test that a k larger than the training part scores NaN like the serial run, in parallel and with the cache
+@pytest.mark.parametrize("options", [{"n_jobs": 1}, {"cache": FoldTransformCache()}])
+def test_failed_scoring_matches_serial(options):
+    # 95 training rows per fold: k=100 fails without oversampling and works on the oversampled rows
+    grid = {"n_neighbors": [1, 100]}
+    with pytest.warns(UserWarning, match="Scoring failed"):
+        serial = run_knn_analysis(train_x, train_y, grid, preprocessor=preprocessor, scoring=scoring)
+    with pytest.warns(UserWarning, match="Scoring failed"):
+        results = run_knn_analysis(train_x, train_y, grid, preprocessor=preprocessor, scoring=scoring, **options)
+    pd.testing.assert_frame_equal(results, serial)
+    assert results['mean_accuracy'].isna().sum() == 1
+
+    grid = {"n_neighbors": [1, 90]}
+    serial = run_hyperparameter_knn(train_x, train_y, grid, preprocessor)
+    with pytest.warns(UserWarning, match="Scoring failed"):
+        results = run_hyperparameter_knn(train_x, train_y, grid, preprocessor, **options)
+    pd.testing.assert_frame_equal(results, serial)
+    assert results['mean_cv_score'].isna().tolist() == [False, True]
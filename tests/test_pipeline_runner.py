@@ -0,0 +1,115 @@
+import pytest
+import sys
+import os
+
+# Import the pipeline runner functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.pipeline_runner import Stage, code_files, pipeline_stages, run_pipeline, stage_dependencies
+
+# Copies its input to its output after a pause, and appends its name to runs.log
+STAGE_SCRIPT = """import sys, time
+from src.helper import PAUSE
+name, source, target = sys.argv[1:]
+with open('runs.log', 'a') as f:
+    f.write(f"{name} start {time.time()}\\n")
+time.sleep(PAUSE)
+if source == 'fail':
+    sys.exit(1)
+with open(source) as f, open(target, 'w') as g:
+    g.write(f.read().upper())
+with open('runs.log', 'a') as f:
+    f.write(f"{name} end {time.time()}\\n")
+"""
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def runs(root):
+    if not os.path.exists(root / 'runs.log'):
+        return []
+    with open(root / 'runs.log') as f:
+        return [line.split()[0] for line in f if ' start ' in line]
+
+
+@pytest.fixture
+def root(tmp_path):
+    os.makedirs(tmp_path / 'src')
+    write(tmp_path / 'src' / 'helper.py', "PAUSE = 0.5\n")
+    write(tmp_path / 'stage.py', STAGE_SCRIPT)
+    write(tmp_path / 'raw.txt', "raw data")
+    return tmp_path
+
+
+def stages(second='b.txt'):
+    return [Stage('split', ['stage.py', 'split', 'raw.txt', 'a.txt'], ['raw.txt'], ['a.txt']),
+            Stage('left', ['stage.py', 'left', 'a.txt', second], ['a.txt'], [second]),
+            Stage('right', ['stage.py', 'right', 'a.txt', 'c.txt'], ['a.txt'], ['c.txt'])]
+
+
+def run(root, **kwargs):
+    report = run_pipeline(kwargs.pop('stages', stages()), root=str(root), **kwargs)
+    return dict(zip(report['stage'], report['status']))
+
+
+# Test that the Makefile stages form a DAG in which EDA, selection and fitting only wait for the split
+def test_pipeline_stages_dag():
+    dependencies = stage_dependencies(pipeline_stages())
+    assert dependencies['split_preprocess'] == ['download']
+    for name in ('eda', 'select_knn_model', 'fit_knn_model'):
+        assert dependencies[name] == ['split_preprocess']
+    assert dependencies['knn_eval'] == ['fit_knn_model', 'split_preprocess']
+    assert {'scripts/fit_knn_model.py', 'src/knn_importance.py', 'src/fast_predictor.py'} <= set(
+        code_files('scripts/fit_knn_model.py'))
+
+    with pytest.raises(ValueError, match='cycle'):
+        stage_dependencies([Stage('a', ['a.py'], ['y'], ['x']), Stage('b', ['b.py'], ['x'], ['y'])])
+    with pytest.raises(ValueError, match='written by both'):
+        stage_dependencies([Stage('a', ['a.py'], [], ['x']), Stage('b', ['b.py'], [], ['x'])])
+
+
+# Test that independent stages run concurrently and that a second run skips every stage
+def test_run_pipeline_runs_then_skips(root):
+    assert run(root) == {'split': 'ran', 'left': 'ran', 'right': 'ran'}
+    with open(root / 'c.txt') as f:
+        assert f.read() == 'RAW DATA'
+    with open(root / 'runs.log') as f:
+        events = {tuple(line.split()[:2]): float(line.split()[2]) for line in f}
+    assert events['left', 'start'] < events['right', 'end'] and events['right', 'start'] < events['left', 'end']
+
+    assert run(root) == {'split': 'up to date', 'left': 'up to date', 'right': 'up to date'}
+    assert sorted(runs(root)) == ['left', 'right', 'split']
+
+
+# Test that touching an input does not rerun anything, while changing its content, code or arguments does
+def test_run_pipeline_reruns_on_content_changes(root):
+    run(root)
+    stat = os.stat(root / 'raw.txt')
+    os.utime(root / 'raw.txt', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert set(run(root).values()) == {'up to date'}
+
+    write(root / 'raw.txt', "new data")
+    assert set(run(root).values()) == {'ran'}
+
+    write(root / 'src' / 'helper.py', "PAUSE = 0.01\n")
+    assert set(run(root).values()) == {'ran'}
+
+    assert run(root, stages=stages(second='d.txt')) == {'split': 'up to date', 'left': 'ran', 'right': 'up to date'}
+
+    # An output changed by hand is rebuilt
+    write(root / 'c.txt', "edited")
+    assert run(root, dry_run=True, targets=['right']) == {'split': 'up to date', 'right': 'would run'}
+    assert run(root, targets=['right']) == {'split': 'up to date', 'right': 'ran'}
+
+
+# Test that the stages after a failed one are not run and that a dry run runs nothing
+def test_run_pipeline_failure_and_dry_run(root):
+    assert run(root, dry_run=True) == {'split': 'would run', 'left': 'would run', 'right': 'would run'}
+    assert runs(root) == [] and not os.path.exists(root / '.pipeline_state.json')
+
+    failing = [Stage('split', ['stage.py', 'split', 'fail', 'a.txt'], ['raw.txt'], ['a.txt'])] + stages()[1:]
+    assert run(root, stages=failing) == {'split': 'failed', 'left': 'not run', 'right': 'not run'}
+    with pytest.raises(ValueError, match='Unknown stages'):
+        run(root, targets=['plot'])
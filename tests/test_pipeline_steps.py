@@ -0,0 +1,71 @@
+import pytest
+import sys
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+# Import the pipeline step functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.data_cache import load_frame
+from src.pipeline_figures import plot_confusion_matrix, plot_feature_importance
+from src.pipeline_steps import evaluate_knn, fit_knn, knn_feature_importance, save_split, split_and_preprocess
+from src.run_full_pipeline import run_full_pipeline
+from src.schema import FRAMINGHAM_SCHEMA
+
+RAW_FILE = "data/raw/framingham.csv"
+raw = load_frame(RAW_FILE, schema=FRAMINGHAM_SCHEMA)
+
+
+# Test that the split gives the frames the split script saves, renumbered and with an unfitted preprocessor
+def test_split_and_preprocess(tmp_path):
+    split = split_and_preprocess(raw, seed=123)
+
+    assert len(split.train) + len(split.test) == len(raw) and len(split.test) == pytest.approx(0.2 * len(raw), abs=1)
+    assert split.X_train.index.equals(pd.RangeIndex(len(split.train))) and 'disease' not in split.X_train
+    assert not hasattr(split.preprocessor, 'transformers_') and hasattr(split.fitted_preprocessor, 'transformers_')
+    assert list(split.X_train_transformed.columns) == list(split.fitted_preprocessor.get_feature_names_out())
+    np.testing.assert_allclose(split.X_train_transformed.filter(like='AGE').mean(), 0, atol=1e-6)
+    pd.testing.assert_frame_equal(split_and_preprocess(raw, seed=123).train, split.train)
+    assert split_and_preprocess(raw, seed=123, transform=False).X_test_transformed is None
+
+    save_split(split, str(tmp_path / 'split'), str(tmp_path / 'processed'))
+    pd.testing.assert_frame_equal(load_frame(str(tmp_path / 'split' / 'X_test.csv')), split.X_test)
+    assert os.path.exists(tmp_path / 'processed' / 'X_train_transformed.csv')
+
+
+# Test that the fitted pipeline is scored and its feature importances are scaled to at most 1
+def test_fit_and_evaluate_knn(tmp_path):
+    split = split_and_preprocess(raw.iloc[:1500], seed=1)
+    pipeline = fit_knn(split.X_train, split.y_train, clone(split.preprocessor))
+    importances = knn_feature_importance(pipeline, split.X_train, split.y_train, n_repeats=2)
+    evaluation = evaluate_knn(pipeline, split.X_test, split.y_test)
+
+    assert list(importances['Feature']) == [name.split('__')[-1] for name in pipeline[-2].get_feature_names_out()]
+    assert importances['Importance'].max() == 1
+    assert evaluation.confusion_matrix.sum() == len(split.X_test) and evaluation.agreement is None
+    assert evaluation.report.loc['accuracy', 'precision'] == pytest.approx(np.mean(evaluation.y_pred == split.y_test))
+    with pytest.raises(ValueError, match='approximate'):
+        fit_knn(split.X_train, split.y_train, split.preprocessor, oversampling='weighted', neighbours='approximate')
+
+    plot_feature_importance(importances, str(tmp_path))
+    plot_confusion_matrix(evaluation.confusion_matrix, str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['knn_test_data_confusion_matrix.png', 'radar_feature_importance.png']
+
+
+# Test that the in-process run writes the files of the stage scripts and returns the in-memory results
+def test_run_full_pipeline(tmp_path):
+    raw_file = str(tmp_path / 'raw' / 'framingham.csv')
+    os.makedirs(os.path.dirname(raw_file))
+    shutil.copy(RAW_FILE, raw_file)
+
+    results = run_full_pipeline(raw_file, str(tmp_path / 'processed'), str(tmp_path / 'results'), plots=False)
+    assert os.path.exists(tmp_path / 'raw' / 'framingham.split.npz')
+    for path in ['processed/X_train.csv', 'processed/X_test_transformed.csv', 'results/models/preprocessor.pickle',
+                 'results/models/imb_knn_pipeline.pickle', 'results/tables/result_knn.csv',
+                 'results/tables/knn_test_data_classification_report.csv']:
+        assert os.path.exists(tmp_path / path), path
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'results' / 'tables' / 'result_knn.csv'), results.cv_results,
+                                  check_dtype=False)
+    assert len(results.cv_results) == 40 and results.evaluation.confusion_matrix.sum() == len(results.split.test)
@@ -0,0 +1,93 @@
+import pytest
+import sys
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from sklearn.compose import make_column_transformer
+from sklearn.preprocessing import MinMaxScaler
+
+# Import the preprocessor functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.preprocessor import (QuantileSketch, RunningMoments, build_preprocessor, fit_in_chunks,
+                              transform_csv)
+
+# Test data with the Framingham schema, missing values, and a category that only appears late
+rng = np.random.default_rng(17)
+n = 500
+X = pd.DataFrame({'AGE': rng.integers(30, 70, n).astype(float), 'SBP': rng.normal(135, 20, n).round(),
+                  'CHOL': rng.normal(230, 40, n)})
+X.loc[rng.random(n) < 0.1, 'SBP'] = np.nan
+X.loc[:60, 'CHOL'] = np.nan
+X['sex'] = np.where(np.arange(n) < 100, 'Female', rng.choice(['Female', 'Male'], n))
+numeric_features = ['AGE', 'SBP', 'CHOL']
+
+
+def chunked(frame, size):
+    return (frame.iloc[start:start + size] for start in range(0, len(frame), size))
+
+
+# Test that the sketch gives np.median exactly, also when merged from parts
+def test_quantile_sketch_exact():
+    values = X['SBP'].to_numpy()
+    left, right = QuantileSketch().update(values[:123]), QuantileSketch().update(values[123:])
+    assert left.merge(right).median() == np.nanmedian(values)
+    assert left.exact
+    assert QuantileSketch().update([4.0, 1.0, 3.0, 2.0]).median() == 2.5
+    assert np.isnan(QuantileSketch().update([np.nan]).median())
+
+
+# Test that a compacted sketch stays within its size and close to the median
+def test_quantile_sketch_compacted():
+    values = rng.normal(0, 1, 20000)
+    sketch = QuantileSketch(max_size=256)
+    for chunk in np.array_split(values, 20):
+        sketch.update(chunk)
+    assert len(sketch.values) <= 256 and not sketch.exact
+    assert sketch.n == len(values)
+    assert abs(sketch.median() - np.median(values)) < 0.02
+
+
+# Test that running moments merge to the mean and variance of all values
+def test_running_moments():
+    values = X['CHOL'].to_numpy()
+    moments = RunningMoments()
+    for chunk in np.array_split(values, 7):
+        moments.update(chunk)
+    assert moments.n == np.isfinite(values).sum()
+    np.testing.assert_allclose([moments.mean, moments.var], [np.nanmean(values), np.nanvar(values)])
+
+
+# Test that the chunked fit matches the in-memory fit for any chunk size
+@pytest.mark.parametrize('chunksize', [1, 40, 1000])
+def test_fit_in_chunks_matches_fit(chunksize):
+    expected = build_preprocessor(numeric_features).fit(X)
+    fitted = fit_in_chunks(build_preprocessor(numeric_features), lambda: chunked(X, chunksize))
+
+    np.testing.assert_allclose(fitted.transform(X), expected.transform(X), atol=1e-12)
+    assert list(fitted.get_feature_names_out()) == list(expected.get_feature_names_out())
+    imputer, scaler = fitted.named_transformers_['pipeline']
+    np.testing.assert_array_equal(imputer.statistics_, expected.named_transformers_['pipeline'][0].statistics_)
+    assert scaler.n_samples_seen_ == n
+    np.testing.assert_allclose(pickle.loads(pickle.dumps(fitted)).transform(X.head()), expected.transform(X.head()))
+
+
+# Test that transformers the chunked fit cannot reproduce are rejected
+def test_fit_in_chunks_unsupported():
+    with pytest.raises(ValueError, match='Cannot fit'):
+        fit_in_chunks(make_column_transformer((MinMaxScaler(), numeric_features)), lambda: chunked(X, 100))
+    with pytest.raises(ValueError, match='No training data'):
+        fit_in_chunks(build_preprocessor(numeric_features), lambda: [])
+
+
+# Test that a CSV is transformed chunk by chunk into the same values as in memory
+def test_transform_csv(tmp_path):
+    X.assign(disease=0).to_csv(tmp_path / 'train_data.csv', index=False)
+    fitted = build_preprocessor(numeric_features).fit(X)
+    n_rows = transform_csv(fitted, str(tmp_path / 'train_data.csv'), str(tmp_path / 'out' / 'X_transformed.csv'),
+                           chunksize=64, drop_columns=['disease'])
+
+    transformed = pd.read_csv(tmp_path / 'out' / 'X_transformed.csv')
+    assert n_rows == n
+    assert list(transformed.columns) == list(fitted.get_feature_names_out())
+    np.testing.assert_allclose(transformed.to_numpy(), fitted.transform(X), atol=1e-12)
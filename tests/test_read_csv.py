@@ -0,0 +1,161 @@
+import pytest
+import sys
+import os
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+# Import the download function from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.read_csv import download_data, validate_csv_head
+
+# Test data: a CSV large enough to span several download chunks
+CSV = ("AGE,SBP,sex\n" + "".join(f"{40 + i % 30},{110 + i % 50},{'Male' if i % 2 else 'Female'}\n"
+                                 for i in range(2000))).encode()
+CSV_SHA256 = hashlib.sha256(CSV).hexdigest()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    '''Serves the files of `server.files` with Range support; `server.cut_after` drops the connection early.'''
+
+    def do_GET(self):
+        if self.path not in self.server.files:
+            self.send_error(404)
+            return
+        content_type, body = self.server.files[self.path]
+        start = 0
+        match = re.match(r'bytes=(\d+)-', self.headers.get('Range', ''))
+        if match and self.server.ranges:
+            start = int(match.group(1))
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(body)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.server.requested_ranges.append(start)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        payload = body[start:]
+        if self.server.cut_after is not None:
+            payload = payload[:self.server.cut_after]
+            self.server.cut_after = None
+        self.wfile.write(payload)
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    httpd.files = {
+        '/data.csv': ('text/csv', CSV),
+        '/page.html': ('text/html', b'<html></html>'),
+        '/empty.csv': ('text/csv', b''),
+        '/header.csv': ('text/csv', b'AGE,SBP,sex\n'),
+    }
+    httpd.ranges = True
+    httpd.cut_after = None
+    httpd.requested_ranges = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f'http://127.0.0.1:{httpd.server_address[1]}'
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+# Test that the file is streamed in chunks, checked against its SHA-256 and saved
+def test_download_data(server, tmp_path):
+    filepath = str(tmp_path / 'raw' / 'data.csv')
+    digest = download_data(server.url + '/data.csv', filepath, sha256=CSV_SHA256, chunk_size=1024)
+
+    assert digest == CSV_SHA256
+    with open(filepath, 'rb') as f:
+        assert f.read() == CSV
+    assert not os.path.exists(filepath + '.part')
+
+
+# Test that an interrupted download is resumed with a Range request
+def test_download_data_resumes(server, tmp_path):
+    filepath = str(tmp_path / 'data.csv')
+    server.cut_after = 5000
+    with pytest.raises((requests.exceptions.RequestException, ValueError)):
+        download_data(server.url + '/data.csv', filepath, chunk_size=1024)
+    # Chunks received in full before the connection dropped are kept
+    received = os.path.getsize(filepath + '.part')
+    assert 0 < received <= 5000
+
+    download_data(server.url + '/data.csv', filepath, sha256=CSV_SHA256, chunk_size=1024)
+    assert server.requested_ranges == [0, received]
+    with open(filepath, 'rb') as f:
+        assert f.read() == CSV
+
+
+# Test that a complete partial file and a server without Range support both give the full file
+def test_download_data_complete_part_and_no_ranges(server, tmp_path):
+    filepath = str(tmp_path / 'data.csv')
+    with open(filepath + '.part', 'wb') as f:
+        f.write(CSV)
+    assert download_data(server.url + '/data.csv', filepath) == CSV_SHA256
+
+    server.ranges = False
+    with open(filepath + '.part', 'wb') as f:
+        f.write(CSV[:3000])
+    assert download_data(server.url + '/data.csv', filepath, sha256=CSV_SHA256) == CSV_SHA256
+    with open(filepath, 'rb') as f:
+        assert f.read() == CSV
+
+
+# Test that a wrong checksum, a non-CSV URL, a missing file and empty files are rejected
+def test_download_data_errors(server, tmp_path):
+    filepath = str(tmp_path / 'data.csv')
+    with pytest.raises(ValueError, match='SHA-256'):
+        download_data(server.url + '/data.csv', filepath, sha256='0' * 64)
+    assert not os.path.exists(filepath) and not os.path.exists(filepath + '.part')
+
+    with pytest.raises(ValueError, match='valid CSV'):
+        download_data(server.url + '/page.html', filepath)
+    with pytest.raises(ValueError, match='inaccessible'):
+        download_data(server.url + '/missing.csv', filepath)
+    with pytest.raises(ValueError, match='empty'):
+        download_data(server.url + '/empty.csv', filepath)
+    with pytest.raises(ValueError, match='no data rows'):
+        download_data(server.url + '/header.csv', filepath)
+    assert not os.path.exists(filepath)
+
+
+# Test that chunks smaller than the first lines do not change the validation of the file
+@pytest.mark.parametrize('chunk_size', [16, 64])
+def test_download_data_small_chunks(server, tmp_path, chunk_size):
+    server.files['/short.csv'] = ('text/csv', b'AGE,SBP,sex\n50,120,Male\n')
+    server.files['/ragged.csv'] = ('text/csv', b'AGE,SBP,sex\n50,120\n' + CSV[12:])
+    filepath = str(tmp_path / 'data.csv')
+    assert download_data(server.url + '/data.csv', filepath, chunk_size=chunk_size) == CSV_SHA256
+    download_data(server.url + '/short.csv', filepath, chunk_size=chunk_size)
+    with open(filepath, 'rb') as f:
+        assert f.read() == b'AGE,SBP,sex\n50,120,Male\n'
+
+    with pytest.raises(ValueError, match='fields'):
+        download_data(server.url + '/ragged.csv', filepath, chunk_size=chunk_size)
+    with pytest.raises(ValueError, match='no data rows'):
+        download_data(server.url + '/header.csv', filepath, chunk_size=chunk_size)
+    assert not os.path.exists(filepath + '.part')
+
+
+# Test that the first chunk is validated without its cut-off last line
+def test_validate_csv_head():
+    assert validate_csv_head(CSV[:1000]) == ['AGE', 'SBP', 'sex']
+    with pytest.raises(ValueError, match='fields'):
+        validate_csv_head(b'AGE,SBP,sex\n50,120\n')
+    with pytest.raises(ValueError, match='fields'):
+        validate_csv_head(b'AGE,SBP,sex\n50,120', complete=True)
@@ -0,0 +1,56 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Import the schema functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.schema import FRAMINGHAM_SCHEMA, SchemaError, apply_schema, csv_dtypes, validate_frame
+from src.data_cache import load_frame, save_frame
+
+# Test data: valid Framingham rows with missing FRW and CIG values
+data = pd.DataFrame({'AGE': [48, 63, 41, 55], 'FRW': [100.0, np.nan, 121.0, 98.0], 'SBP': [138, 160, 114, 122],
+                     'DBP': [80, 92, 74, 78], 'CHOL': [210, 250, 190, 232], 'CIG': [0.0, 20.0, np.nan, 5.0],
+                     'sex': ['Female', 'Male', 'Male', 'Female'], 'disease': [0, 1, 0, 0]})
+
+
+# Test that valid data converts to the compact dtypes and keeps its values
+def test_apply_schema_dtypes():
+    compact = apply_schema(data)
+
+    assert validate_frame(data) == []
+    assert compact.dtypes.astype(str).tolist() == ['uint8', 'float32', 'int16', 'int16', 'int16', 'float32',
+                                                  'category', 'int8']
+    pd.testing.assert_frame_equal(compact, data, check_dtype=False, check_categorical=False)
+    assert compact.memory_usage(deep=True).sum() < data.memory_usage(deep=True).sum()
+    assert apply_schema(compact) is compact
+    assert apply_schema(data['disease']).dtype == np.int8
+
+
+# Test that every violated rule is reported before any conversion
+def test_validate_frame_problems():
+    bad = data.assign(AGE=[48, 200, 41, np.nan], SBP=[138.5, 160, 114, 122], sex=['Female', 'M', 'Male', 'Female'])
+
+    problems = validate_frame(bad)
+    assert problems == ["AGE: 1 missing values", "AGE: 1 values outside [0, 120]",
+                        "SBP: 1 non-integer values in an integer column",
+                        "sex: 1 values outside ['Female', 'Male'], e.g. ['M']"]
+    with pytest.raises(SchemaError) as error:
+        apply_schema(bad)
+    assert error.value.problems == problems
+    assert validate_frame(data.assign(CHOL=['210', 'high', '190', '232'])) == ["CHOL: 1 non-numeric values"]
+    assert validate_frame(data.drop(columns=['disease', 'sex'])) == []
+
+
+# Test that load_frame applies the schema on both the CSV and the cache path
+def test_load_frame_schema(tmp_path):
+    csv_path = str(tmp_path / 'framingham.csv')
+    data.to_csv(csv_path, index=False)
+    from_csv = load_frame(csv_path, schema=FRAMINGHAM_SCHEMA)
+    assert set(csv_dtypes()) == {'FRW', 'CIG', 'sex'}
+
+    save_frame(from_csv, csv_path)
+    from_cache = load_frame(csv_path, schema=FRAMINGHAM_SCHEMA)
+    pd.testing.assert_frame_equal(from_cache, from_csv)
+    assert from_cache['sex'].dtype == 'category' and from_cache['SBP'].dtype == np.int16
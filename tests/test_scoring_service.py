@@ -0,0 +1,118 @@
+import pytest
+import sys
+import os
+import asyncio
+import numpy as np
+import pandas as pd
+from sklearn.compose import make_column_transformer
+from sklearn.impute import SimpleImputer
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+# Import the service from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.scoring_service import FEATURES, NUMERIC_FEATURES, MicroBatcher, ScoringService, request_json, validate_record
+
+# Test data and model with the Framingham schema
+rng = np.random.default_rng(7)
+X = pd.DataFrame({name: rng.normal(100, 20, 60) for name in NUMERIC_FEATURES})
+X['sex'] = rng.choice(['Female', 'Male'], 60)
+y = rng.choice([0, 1], 60)
+preprocessor = make_column_transformer(
+    (make_pipeline(SimpleImputer(strategy="median"), StandardScaler()), NUMERIC_FEATURES),
+    (OneHotEncoder(drop="if_binary", sparse_output=False), ['sex'])
+)
+model = make_pipeline(preprocessor, KNeighborsClassifier(n_neighbors=5)).fit(X, y)
+records = X.head(20).to_dict('records')
+records[0]['FRW'] = None
+
+
+async def serve_and_call(calls, **kwargs):
+    '''Start a service on a free port, run `calls(port)` and stop it again.'''
+    service = ScoringService(model, port=0, **kwargs)
+    await service.start()
+    try:
+        return await calls(service.port)
+    finally:
+        await service.stop()
+
+
+async def post_concurrently(port):
+    async def one(record):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            return await request_json(reader, writer, 'POST', '/predict', record)
+        finally:
+            writer.close()
+
+    responses = await asyncio.gather(*(one(record) for record in records))
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    _, metrics = await request_json(reader, writer, 'GET', '/metrics')
+    writer.close()
+    return responses, metrics
+
+
+# Test that concurrent requests are batched and answered with the pipeline's predictions
+def test_service_matches_pipeline():
+    responses, metrics = asyncio.run(serve_and_call(post_concurrently, max_batch_size=8, max_wait=0.05))
+    expected = model.predict_proba(pd.DataFrame(records, columns=FEATURES))
+
+    assert all(status == 200 for status, _ in responses)
+    for (_, body), proba in zip(responses, expected):
+        assert body['prediction'] == int(np.argmax(proba))
+        np.testing.assert_allclose([body['probability']['0'], body['probability']['1']], proba)
+    assert metrics['requests'] == len(records)
+    assert metrics['batches'] < len(records), "Concurrent requests should share batches"
+    assert metrics['mean_batch_size'] <= 8
+
+
+# Test that a list of records is scored in one request and invalid input is rejected
+def test_service_list_and_errors():
+    async def calls(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            listed = await request_json(reader, writer, 'POST', '/predict', records[:3])
+            invalid = await request_json(reader, writer, 'POST', '/predict', {'AGE': 50})
+            category = await request_json(reader, writer, 'POST', '/predict', {**records[1], 'sex': 'Other'})
+            unknown = await request_json(reader, writer, 'GET', '/unknown')
+            return listed, invalid, category, unknown
+        finally:
+            writer.close()
+
+    (status, body), (invalid_status, _), (category_status, category_body), (unknown_status, _) = asyncio.run(
+        serve_and_call(calls))
+    assert status == 200 and len(body) == 3
+    assert invalid_status == 400
+    assert category_status == 400 and 'Female, Male' in category_body['error']
+    assert unknown_status == 404
+
+
+# Test the record validation
+def test_validate_record():
+    record = validate_record({**records[1], 'CIG': None, 'extra': 1})
+    assert np.isnan(record['CIG']) and 'extra' not in record
+    with pytest.raises(ValueError):
+        validate_record({**records[1], 'AGE': 'old'})
+    with pytest.raises(ValueError):
+        validate_record([records[1]])
+    with pytest.raises(ValueError, match='sex'):
+        validate_record({**records[1], 'sex': 'Other'})
+
+
+# Test that a record the model rejects fails alone and not the other records of its batch
+def test_batch_failure_is_isolated():
+    async def score():
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait=0.05)
+        await batcher.start()
+        try:
+            # The bad record bypasses validate_record, so the model itself rejects it
+            batch = [records[1], {**records[2], 'sex': 'Other'}, records[3]]
+            return await asyncio.gather(*(batcher.predict([record]) for record in batch), return_exceptions=True)
+        finally:
+            await batcher.stop()
+
+    good, bad, other = asyncio.run(score())
+    assert isinstance(bad, ValueError)
+    expected = model.predict_proba(pd.DataFrame([records[1], records[3]], columns=FEATURES))
+    np.testing.assert_allclose([good[0][1]['0'], other[0][1]['0']], expected[:, 0])
@@ -12,7 +12,8 @@ from sklearn.preprocessing import StandardScaler, OneHotEncoder
 import re
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from src.run_split import split_data
+from src.run_split import split_data, stream_split
+import numpy as np
 
 # Paths for the test data and output files
 TEST_INPUT_FILE = "data/toy/test_framingham.csv"
@@ -60,5 +61,49 @@ def test_empty_input_path():
     assert str(custom_string.value), "Please provide an input file"
 
 
+# Larger data for the streaming split, with an imbalanced target and missing values
+rng = np.random.default_rng(11)
+big_df = pd.DataFrame({'id': np.arange(1000), 'AGE': rng.integers(30, 70, 1000),
+                       'FRW': np.where(rng.random(1000) < 0.1, np.nan, rng.normal(120, 20, 1000).round(1)),
+                       'disease': rng.choice([0, 1], 1000, p=[0.8, 0.2])})
+
+# Test that the streaming split writes exact, stratified and reproducible train/test files chunk by chunk
+def test_stream_split(tmp_path):
+    input_file = str(tmp_path / 'registry.csv')
+    big_df.to_csv(input_file, index=False)
+    train_file, test_file = str(tmp_path / 'train.csv'), str(tmp_path / 'test.csv')
+
+    n_train, n_test = stream_split(input_file, train_file, test_file, test_size=0.25, random_state=1,
+                                   stratify='disease', chunksize=64)
+    train_df, test_df = pd.read_csv(train_file), pd.read_csv(test_file)
+
+    assert (n_train, n_test) == (len(train_df), len(test_df)) == (750, 250)
+    assert sorted(pd.concat([train_df, test_df])['id']) == list(range(1000))
+    assert train_df['id'].is_monotonic_increasing, "Rows should keep their input order."
+    expected = big_df['disease'].value_counts() * 0.25
+    assert (test_df['disease'].value_counts() - expected).abs().max() <= 1
+    pd.testing.assert_frame_equal(pd.concat([train_df, test_df]).sort_values('id').reset_index(drop=True), big_df)
+
+    # Same seed and chunk size, same split; another seed, another split
+    stream_split(input_file, train_file, test_file, test_size=0.25, random_state=1, stratify='disease', chunksize=64)
+    assert list(pd.read_csv(test_file)['id']) == list(test_df['id'])
+    stream_split(input_file, train_file, test_file, test_size=0.25, random_state=2, stratify='disease', chunksize=64)
+    assert list(pd.read_csv(test_file)['id']) != list(test_df['id'])
+
+# Test that a key-based split keeps each row's assignment when the file is reordered
+def test_stream_split_key(tmp_path):
+    input_file, shuffled_file = str(tmp_path / 'registry.csv'), str(tmp_path / 'shuffled.csv')
+    big_df.to_csv(input_file, index=False)
+    big_df.sample(frac=1, random_state=0).to_csv(shuffled_file, index=False)
+
+    _, n_test = stream_split(input_file, str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv'), key='id', chunksize=100)
+    stream_split(shuffled_file, str(tmp_path / 'c.csv'), str(tmp_path / 'd.csv'), key='id', chunksize=300)
+
+    assert abs(n_test - 200) < 50
+    assert sorted(pd.read_csv(tmp_path / 'b.csv')['id']) == sorted(pd.read_csv(tmp_path / 'd.csv')['id'])
+    with pytest.raises(ValueError):
+        stream_split(input_file, str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv'), key='id', stratify='disease')
+
+
 if __name__ == "__main__":
     test_split_data()
\ No newline at end of file
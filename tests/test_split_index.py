@@ -0,0 +1,97 @@
+import pytest
+import sys
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+# Import the split index functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.split_index import (fold_splits, index_path_for, load_split, load_split_index, make_split_index,
+                             save_split_index)
+from src.run_split import split_data
+
+TEST_INPUT_FILE = "data/toy/test_framingham.csv"
+
+# Test data: a larger frame with the Framingham columns
+rng = np.random.default_rng(3)
+data = pd.DataFrame({'AGE': rng.integers(30, 70, 200), 'SBP': rng.normal(130, 20, 200).round(),
+                     'sex': rng.choice(['Female', 'Male'], 200), 'disease': rng.choice([0, 1], 200, p=[0.8, 0.2])})
+
+
+# Test that the index selects the same rows as splitting the frame with the same seed
+def test_make_split_index_matches_train_test_split():
+    index = make_split_index(len(data), test_size=0.2, random_state=123)
+    train_df, test_df = train_test_split(data, test_size=0.2, random_state=123)
+
+    pd.testing.assert_frame_equal(data.iloc[index['train']], train_df)
+    pd.testing.assert_frame_equal(data.iloc[index['test']], test_df)
+    assert index['train'].dtype == np.uint8
+
+
+# Test that the folds partition the training rows and keep the class balance when stratified
+def test_split_index_folds():
+    index = make_split_index(len(data), random_state=0, stratify=data['disease'], n_folds=4)
+    folds = fold_splits(index)
+    y_train = data['disease'].to_numpy()[index['train']]
+
+    assert len(folds) == 4
+    assert sorted(np.concatenate([validation for _, validation in folds])) == list(range(len(index['train'])))
+    for train, validation in folds:
+        assert len(np.intersect1d(train, validation)) == 0
+        assert abs(y_train[validation].mean() - y_train.mean()) < 0.05
+    with pytest.raises(ValueError, match='no fold'):
+        fold_splits(make_split_index(len(data), random_state=0))
+
+
+# Test that the saved index rebuilds X and y next to a raw file and detects a changed raw file
+def test_save_and_load_split(tmp_path):
+    raw_path = str(tmp_path / 'framingham.csv')
+    data.to_csv(raw_path, index=False)
+    index = make_split_index(len(data), random_state=5, n_folds=3)
+    index_path = save_split_index(index, raw_path)
+    assert index_path == index_path_for(raw_path) == str(tmp_path / 'framingham.split.npz')
+
+    X_test, y_test = load_split(index_path, 'test', schema=None)
+    pd.testing.assert_frame_equal(X_test, data.iloc[index['test']].drop(columns='disease'))
+    pd.testing.assert_series_equal(y_test, data['disease'].iloc[index['test']])
+    # By default the rows come with the compact dtypes of the Framingham schema
+    X_test, y_test = load_split(index_path, 'test')
+    assert X_test['SBP'].dtype == np.int16 and X_test['sex'].dtype == 'category' and y_test.dtype == np.int8
+    np.testing.assert_array_equal(load_split_index(index_path)['fold'], index['fold'])
+
+    # A copy of the raw data and its index still loads
+    copy_dir = tmp_path / 'copy'
+    copy_dir.mkdir()
+    shutil.copy(raw_path, copy_dir / 'framingham.csv')
+    shutil.copy(index_path, copy_dir / 'framingham.split.npz')
+    assert len(load_split(str(copy_dir / 'framingham.split.npz'))[0]) == len(index['train'])
+
+    data.head(150).to_csv(raw_path, index=False)
+    with pytest.raises(ValueError, match='changed'):
+        load_split(index_path)
+
+    # A change in the middle of the file that keeps its size is detected as well
+    shutil.copy(copy_dir / 'framingham.csv', raw_path)
+    with open(raw_path, 'r+b') as f:
+        f.seek(os.path.getsize(raw_path) // 2)
+        digit = f.read(1)
+        f.seek(-1, os.SEEK_CUR)
+        f.write(b'7' if digit != b'7' else b'8')
+    with pytest.raises(ValueError, match='changed'):
+        load_split(index_path)
+    with pytest.raises(ValueError, match='part'):
+        load_split(index_path, 'validation')
+
+
+# Test that split_data can store only the index and gives the same split as the CSV copies
+def test_split_data_index_only(tmp_path):
+    index_path = str(tmp_path / 'toy.split.npz')
+    train_df, test_df = split_data(TEST_INPUT_FILE, None, None, test_size=0.2, random_state=123,
+                                   index_path=index_path)
+
+    assert sorted(os.listdir(tmp_path)) == ['toy.split.npz']
+    X_train, y_train = load_split(index_path, 'train', schema=None)
+    pd.testing.assert_frame_equal(X_train, train_df.drop(columns='disease'))
+    pd.testing.assert_series_equal(y_train, train_df['disease'])
@@ -0,0 +1,48 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Import the synthetic data functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.synthetic_data import FRAMINGHAM_COHORT, CohortModel, generate_cohort, write_cohort_csv
+from src.schema import FRAMINGHAM_SCHEMA, validate_frame
+
+RAW_FILE = "data/raw/framingham.csv"
+
+
+# Test that a cohort has the Framingham schema, its class imbalance and its correlations
+def test_generate_cohort_resembles_framingham():
+    cohort = generate_cohort(100000, random_state=1)
+    raw = pd.read_csv(RAW_FILE)
+
+    assert list(cohort.columns) == list(raw.columns)
+    assert validate_frame(cohort, FRAMINGHAM_SCHEMA) == []
+    assert cohort['disease'].dtype == np.int8 and cohort['sex'].dtype == 'category'
+    assert abs(cohort['disease'].mean() - raw['disease'].mean()) < 0.01
+    assert abs(cohort['SBP'].corr(cohort['DBP']) - raw['SBP'].corr(raw['DBP'])) < 0.05
+    assert 0 < cohort['FRW'].isna().mean() < 0.02
+    np.testing.assert_allclose(cohort[['AGE', 'SBP', 'CHOL']].mean(), raw[['AGE', 'SBP', 'CHOL']].mean(), rtol=0.02)
+
+
+# Test that the rows depend on the seed only, not on the chunk size, and that the prevalence can be set
+def test_generate_cohort_chunks_and_prevalence(tmp_path):
+    cohort = generate_cohort(70000, random_state=2)
+    chunks = list(generate_cohort(70000, random_state=2, chunksize=30000))
+
+    assert [len(chunk) for chunk in chunks] == [30000, 30000, 10000]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), cohort)
+    assert not generate_cohort(1000, random_state=3).equals(generate_cohort(1000, random_state=4))
+    assert len(generate_cohort(0)) == 0
+    assert abs(generate_cohort(50000, prevalence=0.05)['disease'].mean() - 0.05) < 0.01
+
+    path = write_cohort_csv(str(tmp_path / 'cohort.csv'), 5000, random_state=2)
+    expected = generate_cohort(5000, random_state=2).astype({'sex': object})
+    pd.testing.assert_frame_equal(pd.read_csv(path), expected, check_dtype=False)
+
+
+# Test that the built-in model is the one estimated from the raw data
+def test_cohort_model_from_frame():
+    model = CohortModel.from_frame(pd.read_csv(RAW_FILE))
+    for name, value in vars(FRAMINGHAM_COHORT).items():
+        assert getattr(model, name) == value, name
@@ -0,0 +1,72 @@
+import pytest
+import sys
+import os
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import RandomOverSampler
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Import the functions from the src folder
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from src.weighted_knn import CountWeightedKNeighborsClassifier, oversampling_counts
+from src.run_knn_analysis import run_knn_analysis
+
+# Imbalanced test data with continuous features
+rng = np.random.default_rng(4)
+X = rng.normal(size=(150, 4))
+y = (X[:, 0] + rng.normal(scale=1.5, size=150) > 1.2).astype(int)
+X_query = rng.normal(size=(60, 4))
+
+
+# Test that the counts describe the same training set RandomOverSampler builds
+def test_oversampling_counts_match_random_oversampler():
+    counts = oversampling_counts(y, random_state=7)
+    sampler = RandomOverSampler(sampling_strategy='minority', random_state=7).fit(X, y)
+    _, y_resampled = sampler.fit_resample(X, y)
+    assert counts.sum() == len(y_resampled), "Counts should add up to the oversampled size"
+    assert (np.bincount(sampler.sample_indices_, minlength=len(y)) == counts).all()
+
+
+# Test the expected counts balance the classes
+def test_expected_counts_balance_classes():
+    counts = oversampling_counts(y, multiplicity='expected')
+    assert counts[y == 0].sum() == pytest.approx(counts[y == 1].sum())
+    assert (counts[y == 0] == 1).all(), "Majority rows should keep a count of one"
+
+
+# Test that weighted voting reproduces kNN on the duplicated rows
+@pytest.mark.parametrize("k", [1, 4, 9, 25])
+def test_weighted_knn_matches_duplicated_rows(k):
+    X_resampled, y_resampled = RandomOverSampler(sampling_strategy='minority', random_state=3).fit_resample(X, y)
+    expected = KNeighborsClassifier(n_neighbors=k).fit(X_resampled, y_resampled)
+    weighted = CountWeightedKNeighborsClassifier(n_neighbors=k, random_state=3).fit(X, y)
+    assert len(weighted.sample_counts_) == len(X), "Each distinct row should be stored once"
+    assert (weighted.predict(X_query) == expected.predict(X_query)).all()
+    np.testing.assert_allclose(weighted.predict_proba(X_query), expected.predict_proba(X_query))
+
+
+# Test that identical rows are merged into one entry
+def test_duplicate_rows_are_compressed():
+    X_dup = np.vstack([X, X[:10]])
+    y_dup = np.concatenate([y, y[:10]])
+    knn = CountWeightedKNeighborsClassifier(sampling_strategy=None).fit(X_dup, y_dup)
+    assert len(knn.sample_counts_) == len(X)
+    assert knn.sample_counts_.sum() == len(X_dup)
+
+
+# Test the weighted mode of the kNN analysis in both sweep and refit mode
+def test_knn_analysis_weighted_sweep_matches_refit():
+    param_grid = {"n_neighbors": [1, 3, 5]}
+    X_df = pd.DataFrame(X, columns=['a', 'b', 'c', 'd'])
+    refit = run_knn_analysis(X_df, y, param_grid, preprocessor=StandardScaler(), scoring={'recall': 'recall'},
+                             oversampling="weighted")
+    swept = run_knn_analysis(X_df, y, param_grid, preprocessor=StandardScaler(), scoring={'recall': 'recall'},
+                             oversampling="weighted", sweep=True)
+    pd.testing.assert_frame_equal(swept, refit)
+
+
+# Test that an unknown oversampling mode raises an error
+def test_knn_analysis_invalid_oversampling():
+    with pytest.raises(ValueError):
+        run_knn_analysis(pd.DataFrame(X), y, {"n_neighbors": [1]}, oversampling="smote")